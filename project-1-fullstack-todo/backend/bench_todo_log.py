@@ -0,0 +1,120 @@
+"""
+Benchmark for the persistent todo log.
+
+    python bench_todo_log.py [todos] [tail]
+
+1. Group commit: many concurrent writers, each waiting for its own fsync.
+2. Startup: time to rebuild the store from a snapshot of `todos` items
+   (default 1M) plus a log tail of `tail` records.
+3. Restart check: changes made through main.py's helpers (logged before they
+   are applied) across several snapshots must all come back after a restart.
+"""
+import asyncio
+import os
+import sys
+import tempfile
+import time
+import uuid
+
+import main as app_main
+from main import TodoItem
+from todo_log import TodoLog
+from todo_store import TodoStore
+
+
+def make_item(todo_id: str, task: str, completed: bool) -> TodoItem:
+    return TodoItem(id=todo_id, task=task, completed=completed)
+
+
+def open_log(data_dir: str, store: TodoStore, snapshot_every: int) -> TodoLog:
+    log = TodoLog(
+        data_dir,
+        dump_state=lambda: [(t.id, t.task, t.completed, store.seq(t.id)) for t in store],
+        snapshot_every=snapshot_every,
+    )
+    log.load(store, make_item)
+    return log
+
+
+async def bench_group_commit(data_dir: str, writers: int = 2000) -> None:
+    store: TodoStore[TodoItem] = TodoStore()
+    log = open_log(data_dir, store, snapshot_every=10**9)
+
+    async def writer(i: int) -> None:
+        todo_id = str(uuid.uuid4())
+        store.add(todo_id, make_item(todo_id, f"task {i}", False))
+        log.append(["c", todo_id, f"task {i}"])
+        await log.commit()
+
+    start = time.perf_counter()
+    await asyncio.gather(*(writer(i) for i in range(writers)))
+    elapsed = time.perf_counter() - start
+    await log.close()
+    print(f"group commit: {writers} concurrent durable creates in {elapsed:.3f}s "
+          f"({writers / elapsed:,.0f} writes/s)")
+
+
+async def build_state(data_dir: str, todos: int, tail: int) -> None:
+    store: TodoStore[TodoItem] = TodoStore()
+    log = open_log(data_dir, store, snapshot_every=todos)
+    for i in range(todos):
+        todo_id = str(uuid.uuid4())
+        store.add(todo_id, make_item(todo_id, f"task {i}", False))
+        log.append(["c", todo_id, f"task {i}"])
+    await log.commit() # Starts the snapshot: the threshold was reached
+    for todo in list(store)[:tail]:
+        todo.completed = not todo.completed
+        log.append(["t", todo.id])
+    await log.close()
+
+
+async def restart_check(data_dir: str, snapshot_every: int = 3, changes: int = 20) -> None:
+    app_main.TODO_DATA_DIR, app_main.TODO_SNAPSHOT_EVERY = data_dir, snapshot_every
+    app_main.todo_db = TodoStore()
+    app_main.open_todo_log()
+    for i in range(changes):
+        todo = app_main.create_todo_item(f"t{i}")
+        await app_main.commit_changes()
+        if i % 4 == 1:
+            app_main.toggle_todo_item(todo.id)
+            await app_main.commit_changes()
+        if i % 5 == 2:
+            app_main.delete_todo_item(todo.id)
+            await app_main.commit_changes()
+    expected = app_main.todo_log._dump_state()
+    await app_main.close_todo_log()
+
+    app_main.todo_db = TodoStore()
+    app_main.open_todo_log()
+    restored = app_main.todo_log._dump_state()
+    await app_main.close_todo_log()
+    snapshots = "snapshot.json" in os.listdir(data_dir)
+    assert restored == expected, f"restart lost changes: {restored} != {expected}"
+    print(f"restart: {len(restored)} todos restored intact (snapshot every {snapshot_every}, snapshot written: {snapshots})")
+
+
+def main() -> None:
+    todos = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+    tail = int(sys.argv[2]) if len(sys.argv) > 2 else 10_000
+
+    with tempfile.TemporaryDirectory() as data_dir:
+        asyncio.run(bench_group_commit(data_dir))
+
+    with tempfile.TemporaryDirectory() as data_dir:
+        start = time.perf_counter()
+        asyncio.run(build_state(data_dir, todos, tail))
+        print(f"built {todos:,} todos + {tail:,} log records in {time.perf_counter() - start:.2f}s")
+
+        store: TodoStore[TodoItem] = TodoStore()
+        start = time.perf_counter()
+        log = open_log(data_dir, store, snapshot_every=10**9)
+        elapsed = time.perf_counter() - start
+        asyncio.run(log.close())
+        print(f"startup: loaded {len(store):,} todos (snapshot + {tail:,}-record tail) in {elapsed:.2f}s")
+
+    with tempfile.TemporaryDirectory() as data_dir:
+        asyncio.run(restart_check(data_dir))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,11 +1,23 @@
+import os
 import uuid
-from fastapi import FastAPI, HTTPException
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, HTTPException, Query, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
-from pydantic import BaseModel
-from typing import List
+from fastapi.responses import JSONResponse
+from pydantic import BaseModel, Field
+from typing import List, Literal, Optional
+
+from todo_log import TodoLog, TodoLogError
+from todo_store import TodoStore
 
 # --- App Configuration ---
-app = FastAPI()
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    open_todo_log()
+    yield
+    await close_todo_log()
+
+app = FastAPI(lifespan=lifespan)
 
 # --- CORS Configuration ---
 # This allows your Next.js frontend (running on http://localhost:3000)
@@ -21,6 +33,7 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"], # Allows all methods (GET, POST, etc.)
     allow_headers=["*"], # Allows all headers
+    expose_headers=["X-Next-Cursor"], # Lets the frontend read the pagination cursor
 )
 
 
@@ -36,51 +49,157 @@ class TodoCreate(BaseModel):
 class TodoUpdate(BaseModel):
     task: str
 
+# One create/update/toggle/delete step of a batch request
+class TodoOperation(BaseModel):
+    op: Literal["create", "update", "toggle", "delete"]
+    id: Optional[str] = None   # Required for update, toggle and delete
+    task: Optional[str] = None # Required for create and update
+
+class TodoBatchRequest(BaseModel):
+    operations: List[TodoOperation] = Field(max_length=50_000)
+
+class TodoOperationResult(BaseModel):
+    status: int # HTTP-style status of this single operation (201, 200, 204, 400, 404)
+    todo: Optional[TodoItem] = None
+    detail: Optional[str] = None
+
+class TodoBatchResponse(BaseModel):
+    results: List[TodoOperationResult]
 
-# --- In-Memory Database (a simple Python list) ---
-# This list will act as our database. It will reset when the server restarts.
-fake_todo_db: List[TodoItem] = []
+
+# --- In-Memory Database (an ordered, id-indexed store) ---
+# This store will act as our database. It will reset when the server restarts.
+# Lookups, toggles and deletes by id are O(1); iteration keeps insertion order.
+todo_db: TodoStore[TodoItem] = TodoStore()
+
+
+# --- Persistence (optional) ---
+# Set TODO_DATA_DIR to keep todos across restarts: every change is written to an
+# append-only log there (fsynced in groups) and periodically compacted into a
+# snapshot. Without it the app stays purely in-memory.
+TODO_DATA_DIR = os.getenv("TODO_DATA_DIR")
+TODO_SNAPSHOT_EVERY = int(os.getenv("TODO_SNAPSHOT_EVERY", "100000"))
+todo_log: Optional[TodoLog] = None
+
+def open_todo_log() -> None:
+    global todo_log
+    if not TODO_DATA_DIR or todo_log is not None:
+        return
+    todo_log = TodoLog(
+        TODO_DATA_DIR,
+        dump_state=lambda: [(todo.id, todo.task, todo.completed, todo_db.seq(todo.id)) for todo in todo_db],
+        snapshot_every=TODO_SNAPSHOT_EVERY,
+    )
+    todo_log.load(
+        todo_db,
+        make_item=lambda todo_id, task, completed: TodoItem(
+            id=todo_id, task=task, completed=completed
+        ),
+    )
+
+async def close_todo_log() -> None:
+    global todo_log
+    if todo_log is not None:
+        await todo_log.close()
+        todo_log = None
+
+@app.exception_handler(TodoLogError)
+async def todo_log_error_handler(request: Request, exc: TodoLogError):
+    # The log stopped after a failed write; changes are refused until a restart
+    return JSONResponse(status_code=503, content={"detail": "Todo storage is unavailable"})
+
+def log_change(record: list) -> None:
+    if todo_log is not None:
+        todo_log.append(record)
+
+async def commit_changes() -> None:
+    """Waits until logged changes are on disk (returns at once in memory-only mode)."""
+    if todo_log is not None:
+        await todo_log.commit()
+
+
+# --- Store Operations ---
+# All mutations go through these helpers, so single-item endpoints and the
+# batch endpoint share exactly the same behaviour. Each change is logged before
+# it is applied, so a change the log refuses is not applied either.
+
+def create_todo_item(task: str) -> TodoItem:
+    new_todo = TodoItem(
+        id=str(uuid.uuid4()), # Generate a unique ID
+        task=task,
+        completed=False
+    )
+    log_change(["c", new_todo.id, task])
+    todo_db.add(new_todo.id, new_todo)
+    return new_todo
+
+def update_todo_item(todo_id: str, task: str) -> Optional[TodoItem]:
+    todo = todo_db.get(todo_id)
+    if todo is not None:
+        log_change(["u", todo_id, task])
+        todo.task = task
+    return todo
+
+def toggle_todo_item(todo_id: str) -> Optional[TodoItem]:
+    todo = todo_db.get(todo_id)
+    if todo is not None:
+        log_change(["t", todo_id])
+        todo.completed = not todo.completed
+    return todo
+
+def delete_todo_item(todo_id: str) -> bool:
+    if todo_id not in todo_db:
+        return False
+    log_change(["d", todo_id])
+    todo_db.remove(todo_id)
+    return True
 
 
 # --- API Endpoints ---
 
 @app.get("/api/todos", response_model=List[TodoItem])
-async def get_all_todos():
-    """Returns all items in the to-do list."""
-    return fake_todo_db
+async def get_all_todos(
+    response: Response,
+    after: Optional[str] = None,
+    limit: Optional[int] = Query(default=None, ge=1, le=1000),
+):
+    """
+    Returns items in the to-do list, in creation order.
+    Pass `limit` to page through the list; the `X-Next-Cursor` header holds the
+    value to send as `after` for the next page. A cursor stays valid even if
+    the todo it was taken from is deleted in the meantime.
+    """
+    try:
+        cursor = None if after is None else int(after)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    todos, next_cursor = todo_db.page(cursor, limit)
+    if next_cursor is not None:
+        response.headers["X-Next-Cursor"] = str(next_cursor)
+    return todos
 
 @app.post("/api/todos", response_model=TodoItem, status_code=201)
 async def create_todo(todo_data: TodoCreate):
     """Creates a new to-do item."""
-    new_todo = TodoItem(
-        id=str(uuid.uuid4()), # Generate a unique ID
-        task=todo_data.task,
-        completed=False
-    )
-    fake_todo_db.append(new_todo)
+    new_todo = create_todo_item(todo_data.task)
+    await commit_changes()
     return new_todo
 
 @app.patch("/api/todos/{todo_id}", response_model=TodoItem)
 async def update_todo_status(todo_id: str):
     """Toggles the 'completed' status of a to-do item."""
-    for todo in fake_todo_db:
-        if todo.id == todo_id:
-            todo.completed = not todo.completed
-            return todo
-    raise HTTPException(status_code=404, detail="Todo not found")
+    todo = toggle_todo_item(todo_id)
+    if todo is None:
+        raise HTTPException(status_code=404, detail="Todo not found")
+    await commit_changes()
+    return todo
 
 @app.delete("/api/todos/{todo_id}", status_code=204)
 async def delete_todo(todo_id: str):
     """Deletes a to-do item."""
-    todo_to_delete = None
-    for todo in fake_todo_db:
-        if todo.id == todo_id:
-            todo_to_delete = todo
-            break
-    if not todo_to_delete:
+    if not delete_todo_item(todo_id):
         raise HTTPException(status_code=404, detail="Todo not found")
-
-    fake_todo_db.remove(todo_to_delete)
+    await commit_changes()
     # No content is returned for a 204 response
     return
 
@@ -92,9 +211,50 @@ async def root():
 @app.put("/api/todos/{todo_id}", response_model=TodoItem)
 async def update_todo(todo_id: str, todo_data: TodoUpdate):
     """Updates the task text of a to-do item."""
-    for todo in fake_todo_db:
-        if todo.id == todo_id:
-            todo.task = todo_data.task
-            return todo
-    raise HTTPException(status_code=404, detail="Todo not found")
+    todo = update_todo_item(todo_id, todo_data.task)
+    if todo is None:
+        raise HTTPException(status_code=404, detail="Todo not found")
+    await commit_changes()
+    return todo
+
+@app.post("/api/todos:batch", response_model=TodoBatchResponse)
+async def batch_todos(batch: TodoBatchRequest):
+    """
+    Applies a list of create/update/toggle/delete operations in order, in one pass.
+    A failing operation does not abort the batch: each one gets its own result.
+    """
+    results = []
+    for operation in batch.operations:
+        if operation.op == "create":
+            if operation.task is None:
+                results.append({"status": 400, "detail": "Field 'task' is required"})
+                continue
+            results.append({"status": 201, "todo": create_todo_item(operation.task).model_copy()})
+            continue
+
+        if operation.id is None:
+            results.append({"status": 400, "detail": "Field 'id' is required"})
+            continue
+
+        if operation.op == "delete":
+            if delete_todo_item(operation.id):
+                results.append({"status": 204})
+            else:
+                results.append({"status": 404, "detail": "Todo not found"})
+            continue
+
+        if operation.op == "update":
+            if operation.task is None:
+                results.append({"status": 400, "detail": "Field 'task' is required"})
+                continue
+            todo = update_todo_item(operation.id, operation.task)
+        else:
+            todo = toggle_todo_item(operation.id)
+        if todo is None:
+            results.append({"status": 404, "detail": "Todo not found"})
+        else:
+            # A copy: later operations in the batch may change the same todo
+            results.append({"status": 200, "todo": todo.model_copy()})
+    await commit_changes() # One fsync for the whole batch
+    return {"results": results}
 
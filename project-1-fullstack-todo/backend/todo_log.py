@@ -0,0 +1,242 @@
+import asyncio
+import json
+import os
+from typing import Any, Callable, List, Optional, Tuple
+
+from todo_store import TodoStore
+
+# A snapshot row: (id, task, completed, seq)
+TodoRow = Tuple[str, str, bool, int]
+
+SNAPSHOT_FILE = "snapshot.json"
+SEGMENT_PREFIX = "wal-"
+SEGMENT_SUFFIX = ".log"
+
+
+class TodoLogError(Exception):
+    """The log could not be written; it refuses further changes until restart."""
+
+
+def _segment_name(number: int) -> str:
+    return f"{SEGMENT_PREFIX}{number:08d}{SEGMENT_SUFFIX}"
+
+
+def _fsync_dir(path: str) -> None:
+    """Makes a rename/create/unlink inside `path` durable (no-op where unsupported)."""
+    try:
+        fd = os.open(path, os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
+
+
+# --- Write-Ahead Log with Snapshot Compaction ---
+# Every mutation is appended to the current log segment as one JSON line:
+#   ["c", id, task] create   ["u", id, task] update
+#   ["t", id]       toggle   ["d", id]       delete
+# Writers call commit() and wait for the fsync that covers their lines. While
+# one fsync is running, new lines pile up and are all synced by the next one
+# (group commit), so N concurrent requests cost one fsync, not N.
+# If a write fails, the log stops accepting changes (TodoLogError) instead of
+# retrying: part of the batch may already be on disk, and writing later records
+# after a lost one would leave a log that no longer replays to a valid state.
+# The state on disk stays consistent up to the failure; restart to recover.
+# Once `snapshot_every` lines have been committed the log rotates to a new
+# segment and the current state is written to snapshot.json in the background,
+# together with each item's sequence number and the store's next_seq, so
+# pagination cursors handed out before a restart still point at the same
+# place; once the snapshot is
+# durable the segments it covers are deleted. Startup then loads the snapshot
+# and replays only the short tail of newer segments.
+class TodoLog:
+    def __init__(
+        self,
+        data_dir: str,
+        dump_state: Callable[[], List[TodoRow]],
+        snapshot_every: int = 100_000,
+    ) -> None:
+        self.data_dir = data_dir
+        self.snapshot_every = snapshot_every
+        self._dump_state = dump_state
+        self._segment = 0
+        self._segment_lines = 0
+        self._file: Optional[Any] = None
+        self._store: Optional[TodoStore] = None
+        self._error: Optional[TodoLogError] = None
+        # Encoded lines (bytes) interleaved with rotation markers (int): a segment
+        # number means "close the current segment and continue in this one".
+        self._pending: List[Any] = []
+        self._waiters: List[asyncio.Future] = []
+        self._flush_task: Optional[asyncio.Task] = None
+        self._snapshot_task: Optional[asyncio.Future] = None
+        os.makedirs(data_dir, exist_ok=True)
+
+    # --- Startup ---
+
+    def _segments(self) -> List[int]:
+        numbers = []
+        for name in os.listdir(self.data_dir):
+            if name.startswith(SEGMENT_PREFIX) and name.endswith(SEGMENT_SUFFIX):
+                numbers.append(int(name[len(SEGMENT_PREFIX):-len(SEGMENT_SUFFIX)]))
+        return sorted(numbers)
+
+    def load(self, store: TodoStore, make_item: Callable[[str, str, bool], Any]) -> None:
+        """Rebuilds `store` from the snapshot plus the log tail, then opens a new segment."""
+        covered = 0
+        snapshot_path = os.path.join(self.data_dir, SNAPSHOT_FILE)
+        if os.path.exists(snapshot_path):
+            with open(snapshot_path, "rb") as f:
+                snapshot = json.load(f)
+            covered = snapshot["segment"]
+            for row in snapshot["todos"]:
+                todo_id, task, completed = row[:3]
+                # Snapshots written before sequence numbers existed have 3-item rows
+                store.add(todo_id, make_item(todo_id, task, completed), row[3] if len(row) > 3 else None)
+            store.next_seq = max(store.next_seq, snapshot.get("next_seq", 0))
+
+        segments = self._segments()
+        for number in segments:
+            if number > covered:
+                self._replay(os.path.join(self.data_dir, _segment_name(number)), store, make_item)
+
+        self._store = store
+        self._segment = max([covered] + segments) + 1
+        self._file = open(os.path.join(self.data_dir, _segment_name(self._segment)), "ab")
+        _fsync_dir(self.data_dir)
+
+    @staticmethod
+    def _replay(path: str, store: TodoStore, make_item: Callable[[str, str, bool], Any]) -> None:
+        with open(path, "rb") as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    break # Torn write at the end of a segment: nothing after it was acknowledged
+                op, todo_id = record[0], record[1]
+                if op == "c":
+                    store.add(todo_id, make_item(todo_id, record[2], False))
+                elif op == "u":
+                    todo = store.get(todo_id)
+                    if todo is not None:
+                        todo.task = record[2]
+                elif op == "t":
+                    todo = store.get(todo_id)
+                    if todo is not None:
+                        todo.completed = not todo.completed
+                elif op == "d":
+                    store.remove(todo_id)
+
+    # --- Writing ---
+
+    def append(self, record: list) -> None:
+        """
+        Queues one record. It becomes durable with the next commit().
+        Raises TodoLogError once a write has failed; call it before applying
+        the change, so a refused change is not applied either.
+        """
+        if self._error is not None:
+            raise self._error
+        self._pending.append(json.dumps(record, ensure_ascii=False).encode() + b"\n")
+        self._segment_lines += 1
+
+    async def commit(self) -> None:
+        """
+        Waits until every record appended so far has been fsynced. Call it only
+        after the appended changes have been applied to the store.
+        """
+        if self._error is not None:
+            raise self._error
+        # The snapshot starts here rather than in append(): there the record that
+        # crosses the threshold is not applied yet, and the snapshot would miss it
+        # while its segment still gets deleted
+        if self._segment_lines >= self.snapshot_every and self._snapshot_task is None:
+            self._start_snapshot()
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        if self._flush_task is None:
+            self._flush_task = asyncio.create_task(self._flush_loop())
+        await waiter
+
+    async def _flush_loop(self) -> None:
+        try:
+            while self._waiters:
+                batch, self._pending = self._pending, []
+                waiters, self._waiters = self._waiters, []
+                try:
+                    await asyncio.to_thread(self._write_batch, batch)
+                except Exception as e:
+                    self._error = TodoLogError(f"Todo log write failed: {e}")
+                    # Records queued meanwhile can never be written after the lost ones
+                    self._pending = []
+                    waiters += self._waiters
+                    self._waiters = []
+                    for waiter in waiters:
+                        if not waiter.done():
+                            waiter.set_exception(self._error)
+                    break
+                for waiter in waiters:
+                    waiter.set_result(None)
+        finally:
+            self._flush_task = None
+
+    def _write_batch(self, batch: List[Any]) -> None:
+        for item in batch:
+            if isinstance(item, int):
+                self._file.flush()
+                os.fsync(self._file.fileno())
+                self._file.close()
+                self._file = open(os.path.join(self.data_dir, _segment_name(item)), "ab")
+            else:
+                self._file.write(item)
+        self._file.flush()
+        os.fsync(self._file.fileno())
+
+    # --- Compaction ---
+
+    def _start_snapshot(self) -> None:
+        # Rotation and state capture happen together, with no await in between,
+        # so the snapshot holds exactly the records of segments <= covered (all
+        # of them are applied by the time commit() runs).
+        covered = self._segment
+        self._segment += 1
+        self._segment_lines = 0
+        self._pending.append(self._segment)
+        rows = self._dump_state()
+        next_seq = self._store.next_seq
+        loop = asyncio.get_running_loop()
+        self._snapshot_task = loop.run_in_executor(None, self._write_snapshot, covered, rows, next_seq)
+        self._snapshot_task.add_done_callback(self._snapshot_done)
+
+    def _snapshot_done(self, future: asyncio.Future) -> None:
+        self._snapshot_task = None
+        if future.exception() is not None:
+            print(f"Error writing todo snapshot: {future.exception()}")
+
+    def _write_snapshot(self, covered: int, rows: List[TodoRow], next_seq: int) -> None:
+        snapshot_path = os.path.join(self.data_dir, SNAPSHOT_FILE)
+        tmp_path = snapshot_path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"segment": covered, "next_seq": next_seq, "todos": rows}, f, ensure_ascii=False, separators=(",", ":"))
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, snapshot_path)
+        _fsync_dir(self.data_dir)
+        # The snapshot is durable, so the segments it covers are no longer needed
+        for number in self._segments():
+            if number <= covered:
+                os.remove(os.path.join(self.data_dir, _segment_name(number)))
+
+    async def close(self) -> None:
+        """Flushes outstanding records and waits for a running snapshot."""
+        if self._pending and self._error is None:
+            await self.commit()
+        if self._snapshot_task is not None:
+            await self._snapshot_task
+        if self._file is not None:
+            self._file.close()
+            self._file = None
@@ -0,0 +1,103 @@
+from bisect import bisect_left, bisect_right
+from typing import Dict, Generic, Iterator, List, Optional, Tuple, TypeVar
+
+T = TypeVar("T")
+
+# Deleted slots are compacted away once they make up half of the order list
+COMPACT_MIN_HOLES = 64
+
+
+# --- Ordered In-Memory Store ---
+# Items are kept in a dict keyed by id (O(1) lookup and toggle). Every item also
+# gets a sequence number that only ever grows, and the order list holds the ids
+# sorted by it. Deleting an item just blanks its slot (found by bisect), so
+# insertion order is kept and a page can start right after any sequence number,
+# including the number of an item that has been deleted in the meantime.
+class TodoStore(Generic[T]):
+    def __init__(self) -> None:
+        self._items: Dict[str, T] = {}
+        self._seq: Dict[str, int] = {}
+        self._ids: List[Optional[str]] = [] # Insertion order; None marks a deleted slot
+        self._seqs: List[int] = []          # Sequence number of each slot, strictly increasing
+        self._holes = 0
+        self.next_seq = 0
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+    def __contains__(self, item_id: str) -> bool:
+        return item_id in self._items
+
+    def __iter__(self) -> Iterator[T]:
+        """Iterates over the items in insertion order."""
+        for item_id in self._ids:
+            if item_id is not None:
+                yield self._items[item_id]
+
+    def get(self, item_id: str) -> Optional[T]:
+        return self._items.get(item_id)
+
+    def seq(self, item_id: str) -> int:
+        return self._seq[item_id]
+
+    def add(self, item_id: str, item: T, seq: Optional[int] = None) -> T:
+        """
+        Appends a new item at the end of the list. `seq` restores a known
+        sequence number (when loading saved state); it must be >= next_seq.
+        """
+        if item_id in self._items:
+            raise KeyError(f"Duplicate id: {item_id}")
+        if seq is None:
+            seq = self.next_seq
+        elif seq < self.next_seq:
+            raise ValueError(f"Sequence number {seq} is not after {self.next_seq - 1}")
+        self.next_seq = seq + 1
+        self._items[item_id] = item
+        self._seq[item_id] = seq
+        self._ids.append(item_id)
+        self._seqs.append(seq)
+        return item
+
+    def remove(self, item_id: str) -> Optional[T]:
+        """Unlinks an item and returns it, or None if the id is unknown."""
+        item = self._items.pop(item_id, None)
+        if item is None:
+            return None
+        self._ids[bisect_left(self._seqs, self._seq.pop(item_id))] = None
+        self._holes += 1
+        if self._holes >= COMPACT_MIN_HOLES and self._holes * 2 >= len(self._ids):
+            self._compact()
+        return item
+
+    def _compact(self) -> None:
+        self._ids = [item_id for item_id in self._ids if item_id is not None]
+        self._seqs = [self._seq[item_id] for item_id in self._ids]
+        self._holes = 0
+
+    def clear(self) -> None:
+        self._items.clear()
+        self._seq.clear()
+        self._ids.clear()
+        self._seqs.clear()
+        self._holes = 0
+
+    def page(
+        self, after: Optional[int] = None, limit: Optional[int] = None
+    ) -> Tuple[List[T], Optional[int]]:
+        """
+        Returns up to `limit` items added after sequence number `after`, plus the
+        cursor for the next page (None when this is the last page). The cursor
+        stays valid even if its item is deleted before the next request.
+        """
+        position = 0 if after is None else bisect_right(self._seqs, after)
+        result: List[T] = []
+        last_seq: Optional[int] = None
+        while position < len(self._ids):
+            item_id = self._ids[position]
+            if item_id is not None:
+                if limit is not None and len(result) >= limit:
+                    return result, last_seq
+                result.append(self._items[item_id])
+                last_seq = self._seqs[position]
+            position += 1
+        return result, None
@@ -0,0 +1,62 @@
+"""
+Бенчмарк хранилища постов на диске.
+
+    python bench_content_store.py [posts]
+
+Создает `posts` файлов (по умолчанию 50 000) во временном каталоге и замеряет:
+время индексации front-matter при старте, первое чтение поста с диска,
+повторное чтение из LRU-кэша и пересканирование без изменений.
+"""
+import os
+import random
+import sys
+import tempfile
+import time
+
+from content_store import ContentStore
+from main import PostFull
+
+BODY = "Пример текста поста о веб-разработке на FastAPI и Next.js. " * 40
+
+
+def generate(content_dir: str, posts: int) -> None:
+    for i in range(posts):
+        with open(os.path.join(content_dir, f"post-{i}.md"), "w", encoding="utf-8") as f:
+            f.write(
+                f"---\nslug: post-{i}\ntitle: Пост номер {i}\nauthor: Автор {i % 100}\n"
+                f"date: 2023-10-{i % 28 + 1:02d}\n---\n{BODY}\n"
+            )
+
+
+def main() -> None:
+    posts = int(sys.argv[1]) if len(sys.argv) > 1 else 50_000
+    with tempfile.TemporaryDirectory() as content_dir:
+        generate(content_dir, posts)
+        store = ContentStore(content_dir, post_model=PostFull, max_cache_bytes=16 * 1024 * 1024)
+
+        start = time.perf_counter()
+        store.scan()
+        print(f"startup index: {len(store):,} posts in {time.perf_counter() - start:.3f}s")
+
+        start = time.perf_counter()
+        store.list_response()
+        print(f"list response: built in {(time.perf_counter() - start) * 1000:.1f}ms")
+
+        slugs = [f"post-{i}" for i in random.sample(range(posts), 1000)]
+        start = time.perf_counter()
+        for slug in slugs:
+            store.get_post(slug)
+        cold = (time.perf_counter() - start) / len(slugs)
+        start = time.perf_counter()
+        for slug in slugs:
+            store.get_post(slug)
+        warm = (time.perf_counter() - start) / len(slugs)
+        print(f"get_post: cold {cold * 1e6:.0f}us, cached {warm * 1e6:.0f}us (incl. mtime check)")
+
+        start = time.perf_counter()
+        store.scan()
+        print(f"rescan without changes: {time.perf_counter() - start:.3f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,66 @@
+"""
+Бенчмарк поискового индекса.
+
+    python bench_search_index.py [posts]
+
+Строит индекс по синтетическому корпусу из `posts` постов (по умолчанию 100 000)
+на русском словаре с распределением Ципфа и замеряет задержку запросов.
+"""
+import random
+import statistics
+import sys
+import time
+
+from search_index import SearchIndex
+
+STEMS = [
+    "веб", "разработк", "питон", "фреймворк", "сервер", "клиент", "данн", "запрос",
+    "ответ", "кэш", "индекс", "поиск", "стек", "асинхронн", "рендеринг", "база",
+    "модел", "маршрут", "шаблон", "компонент", "состояни", "хранилищ", "очеред",
+    "поток", "процесс", "памят", "диск", "сет", "протокол", "безопасност",
+]
+ENDINGS = ["", "а", "ы", "е", "ов", "ам", "ами", "ах", "ой", "ий", "ая", "ое"]
+
+
+def make_vocabulary(size: int = 20_000) -> list:
+    rng = random.Random(1)
+    words = {stem + ending for stem in STEMS for ending in ENDINGS}
+    letters = "абвгдежзиклмнопрстуфхцчшщэюя"
+    while len(words) < size:
+        words.add("".join(rng.choice(letters) for _ in range(rng.randint(3, 10))))
+    return sorted(words)
+
+
+def main() -> None:
+    posts = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    rng = random.Random(42)
+    vocabulary = make_vocabulary()
+    weights = [1 / (rank + 1) for rank in range(len(vocabulary))]  # Закон Ципфа
+
+    index = SearchIndex()
+    start = time.perf_counter()
+    for i in range(posts):
+        title = " ".join(rng.choices(vocabulary, weights, k=6))
+        content = " ".join(rng.choices(vocabulary, weights, k=150))
+        index.add(f"post-{i}", title, content)
+    print(f"build: {posts:,} posts in {time.perf_counter() - start:.1f}s")
+
+    start = time.perf_counter()
+    for i in range(1000):
+        index.add(f"post-{i}", "обновленный заголовок", "новый текст поста про кэш")
+    print(f"incremental update: {(time.perf_counter() - start) / 1000 * 1e6:.0f}us per post")
+
+    for label, pool in (("common", vocabulary[:50]), ("medium", vocabulary[50:2000]), ("rare", vocabulary[2000:])):
+        latencies = []
+        for _ in range(200):
+            query = " ".join(rng.sample(pool, 2))
+            start = time.perf_counter()
+            index.search(query, 10)
+            latencies.append((time.perf_counter() - start) * 1000)
+        latencies.sort()
+        print(f"query ({label} words, top-10): p50 {statistics.median(latencies):.2f}ms, "
+              f"p99 {latencies[int(len(latencies) * 0.99) - 1]:.2f}ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,301 @@
+import asyncio
+import json
+import os
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Callable, Dict, List, Optional, Tuple
+
+from http_cache import make_etag
+
+FRONT_MATTER_MARKER = b"---"
+POST_EXTENSION = ".md"
+HEAD_CHUNK = 4096
+# Сколько изменений пересканирования применяется за один шаг цикла событий
+APPLY_BATCH = 200
+
+
+@dataclass(slots=True)
+class PostMeta:
+    """Данные из front-matter и положение тела поста в файле"""
+    slug: str
+    title: str
+    author: str
+    date: str
+    path: str
+    mtime_ns: int
+    size: int
+    body_offset: int
+
+
+# Изменение индекса: (путь, старая запись, новая запись, текст нового поста)
+Change = Tuple[str, Optional[PostMeta], Optional[PostMeta], Optional[str]]
+
+
+def read_front_matter(path: str, mtime_ns: int, size: int) -> Optional[PostMeta]:
+    """
+    Читает только заголовок файла вида:
+        ---
+        slug: first-post
+        title: Мой первый пост
+        author: Иван Иванов
+        date: 2023-10-01
+        ---
+        Текст поста...
+    Возвращает None, если front-matter нет или он не закрыт.
+    """
+    # os.read без буферизованного файла: при индексации тысяч файлов это заметно быстрее
+    fd = os.open(path, os.O_RDONLY)
+    try:
+        head = os.read(fd, HEAD_CHUNK)
+        if not head.startswith(FRONT_MATTER_MARKER):
+            return None
+        end = head.find(b"\n" + FRONT_MATTER_MARKER, len(FRONT_MATTER_MARKER))
+        while end == -1:
+            chunk = os.read(fd, HEAD_CHUNK)
+            if not chunk:
+                return None
+            head += chunk
+            end = head.find(b"\n" + FRONT_MATTER_MARKER, len(FRONT_MATTER_MARKER))
+    finally:
+        os.close(fd)
+
+    fields: Dict[str, str] = {}
+    for line in head[len(FRONT_MATTER_MARKER):end].decode("utf-8").splitlines():
+        key, sep, value = line.partition(":")
+        if sep:
+            fields[key.strip()] = value.strip()
+
+    body_offset = end + 1 + len(FRONT_MATTER_MARKER)
+    newline = head.find(b"\n", body_offset)
+    body_offset = newline + 1 if newline != -1 else len(head)
+
+    slug = fields.get("slug") or os.path.splitext(os.path.basename(path))[0]
+    return PostMeta(
+        slug=slug,
+        title=fields.get("title", slug),
+        author=fields.get("author", ""),
+        date=fields.get("date", ""),
+        path=path,
+        mtime_ns=mtime_ns,
+        size=size,
+        body_offset=body_offset,
+    )
+
+
+# --- Хранилище постов на диске ---
+# При старте индексируется только front-matter (slug, title, author, date) всех
+# файлов *.md в каталоге. Тело поста читается с диска при первом запросе,
+# и готовый JSON-ответ кладется в LRU-кэш, ограниченный суммарным размером.
+# Каждое обращение сверяет mtime/размер файла, поэтому измененный пост
+# перечитывается, а новые и удаленные файлы подхватываются при пересканировании
+# каталога (не чаще, чем раз в rescan_interval секунд). Пересканирование идет в
+# потоке вместе с чтением измененных текстов, запрос его не ждет: в цикле событий
+# только применяются найденные изменения, пачками по APPLY_BATCH.
+class ContentStore:
+    def __init__(
+        self,
+        content_dir: str,
+        post_model: type,
+        max_cache_bytes: int = 64 * 1024 * 1024,
+        rescan_interval: float = 5.0,
+    ) -> None:
+        self.content_dir = content_dir
+        self.post_model = post_model
+        self.max_cache_bytes = max_cache_bytes
+        self.rescan_interval = rescan_interval
+        self._by_slug: Dict[str, PostMeta] = {}
+        self._by_path: Dict[str, PostMeta] = {}
+        self._last_scan = 0.0
+        self._scan_task: Optional[asyncio.Task] = None
+        self._list_response: Optional[Tuple[bytes, str]] = None
+        # slug -> (JSON-байты, ETag, mtime_ns файла, из которого они собраны)
+        self._cache: "OrderedDict[str, Tuple[bytes, str, int]]" = OrderedDict()
+        self._cache_bytes = 0
+        # Вызывается как on_change(старая запись, новая запись, текст новой) при
+        # любом изменении индекса; None означает, что поста раньше не было / больше
+        # нет. Текст уже прочитан (при пересканировании — в потоке), хуку не нужно
+        # читать файл в цикле событий
+        self.on_change: Optional[Callable[[Optional[PostMeta], Optional[PostMeta], Optional[str]], None]] = None
+
+    def __len__(self) -> int:
+        return len(self._by_slug)
+
+    def get_meta(self, slug: str) -> Optional[PostMeta]:
+        return self._by_slug.get(slug)
+
+    def all_meta(self) -> List[PostMeta]:
+        return list(self._by_slug.values())
+
+    # --- Индекс ---
+
+    def _read(self, path: str, mtime_ns: int, size: int) -> Tuple[Optional[PostMeta], Optional[str]]:
+        """Front-matter и, если кто-то подписан на изменения, текст поста"""
+        meta = read_front_matter(path, mtime_ns, size)
+        if meta is None or self.on_change is None:
+            return meta, None
+        return meta, self.read_content(meta)
+
+    def _collect(self, known: Dict[str, PostMeta]) -> List[Change]:
+        """
+        Сравнивает каталог с `known` (копией индекса) и возвращает изменения
+        (путь, старая запись, новая запись, текст новой). Индекс не трогает,
+        поэтому может выполняться в потоке.
+        """
+        changes = []
+        seen = set()
+        try:
+            entries = list(os.scandir(self.content_dir))
+        except FileNotFoundError:
+            entries = []
+        for entry in entries:
+            if not entry.name.endswith(POST_EXTENSION) or not entry.is_file():
+                continue
+            seen.add(entry.path)
+            st = entry.stat()
+            meta = known.get(entry.path)
+            if meta is not None and meta.mtime_ns == st.st_mtime_ns and meta.size == st.st_size:
+                continue
+            try:
+                changes.append((entry.path, meta, *self._read(entry.path, st.st_mtime_ns, st.st_size)))
+            except FileNotFoundError:
+                seen.discard(entry.path)  # Удален, пока шло сканирование
+        for path, meta in known.items():
+            if path not in seen:
+                changes.append((path, meta, None, None))
+        return changes
+
+    def _apply(self, changes: List[Change]) -> bool:
+        changed = False
+        for path, old, new, content in changes:
+            # Пока шло сканирование, _check мог обновить запись сам — она свежее
+            if self._by_path.get(path) is not old:
+                continue
+            self._reindex(path, new, content)
+            changed = True
+        return changed
+
+    def scan(self) -> bool:
+        """Синхронизирует индекс с каталогом сразу (при старте). Возвращает True, если что-то изменилось."""
+        self._last_scan = time.monotonic()
+        return self._apply(self._collect(dict(self._by_path)))
+
+    def refresh_if_stale(self) -> None:
+        """Не чаще раза в rescan_interval запускает пересканирование в фоне"""
+        if self._scan_task is not None or time.monotonic() - self._last_scan < self.rescan_interval:
+            return
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            self.scan()  # Вне цикла событий (скрипты, бенчмарки) — как раньше, сразу
+            return
+        self._last_scan = time.monotonic()
+        self._scan_task = loop.create_task(self._rescan())
+
+    async def _rescan(self) -> None:
+        try:
+            # Копия индекса снимается здесь, в цикле событий; в потоке — только чтение каталога
+            changes = await asyncio.to_thread(self._collect, dict(self._by_path))
+            for start in range(0, len(changes), APPLY_BATCH):
+                if start:
+                    await asyncio.sleep(0)  # Отдаем управление обработчикам запросов
+                self._apply(changes[start:start + APPLY_BATCH])
+        except Exception as e:
+            print(f"Ошибка при пересканировании каталога {self.content_dir}: {e}")
+        finally:
+            self._scan_task = None
+
+    def _reindex(self, path: str, meta: Optional[PostMeta], content: Optional[str] = None) -> None:
+        """Заменяет (или удаляет, если meta is None) запись о файле; content — текст нового поста для on_change"""
+        old = self._by_path.pop(path, None)
+        if old is not None:
+            self._evict(old.slug)
+            if self._by_slug.get(old.slug) is old:
+                del self._by_slug[old.slug]
+        if meta is not None:
+            self._by_path[path] = meta
+            self._by_slug[meta.slug] = meta
+        self._list_response = None
+        if self.on_change is not None and (old is not None or meta is not None):
+            self.on_change(old, meta, content)
+
+    def _check(self, meta: PostMeta) -> Optional[PostMeta]:
+        """Сверяет mtime файла с индексом; перечитывает front-matter, если файл изменился"""
+        try:
+            st = os.stat(meta.path)
+        except FileNotFoundError:
+            self._reindex(meta.path, None)
+            return None
+        if st.st_mtime_ns == meta.mtime_ns and st.st_size == meta.size:
+            return meta
+        try:
+            fresh, content = self._read(meta.path, st.st_mtime_ns, st.st_size)
+        except FileNotFoundError:
+            fresh, content = None, None
+        self._reindex(meta.path, fresh, content)
+        return fresh if fresh is not None and fresh.slug == meta.slug else None
+
+    # --- Ответы ---
+
+    def list_response(self) -> Tuple[bytes, str]:
+        """JSON-список (slug, title), отсортированный по дате; собирается заново только после изменений"""
+        if self._list_response is None:
+            posts = sorted(self._by_slug.values(), key=lambda meta: (meta.date, meta.slug))
+            body = json.dumps(
+                [{"slug": meta.slug, "title": meta.title} for meta in posts],
+                ensure_ascii=False,
+                separators=(",", ":"),
+            ).encode("utf-8")
+            self._list_response = (body, make_etag(body))
+        return self._list_response
+
+    def read_content(self, meta: PostMeta) -> str:
+        with open(meta.path, "rb") as f:
+            f.seek(meta.body_offset)
+            return f.read().decode("utf-8").strip()
+
+    def get_post(self, slug: str) -> Optional[Tuple[bytes, str]]:
+        """(JSON-байты, ETag) полного поста или None"""
+        meta = self._by_slug.get(slug)
+        if meta is None:
+            self.refresh_if_stale()
+            meta = self._by_slug.get(slug)
+            if meta is None:
+                return None
+        meta = self._check(meta)
+        if meta is None:
+            return None
+
+        cached = self._cache.get(slug)
+        if cached is not None and cached[2] == meta.mtime_ns:
+            self._cache.move_to_end(slug)
+            return cached[0], cached[1]
+
+        post = self.post_model(
+            slug=meta.slug,
+            title=meta.title,
+            content=self.read_content(meta),
+            author=meta.author,
+            date=meta.date,
+        )
+        body = post.model_dump_json().encode("utf-8")
+        etag = make_etag(body)
+        self._store(slug, (body, etag, meta.mtime_ns))
+        return body, etag
+
+    # --- LRU ---
+
+    def _store(self, slug: str, entry: Tuple[bytes, str, int]) -> None:
+        self._evict(slug)
+        if len(entry[0]) > self.max_cache_bytes:
+            return
+        self._cache[slug] = entry
+        self._cache_bytes += len(entry[0])
+        while self._cache_bytes > self.max_cache_bytes:
+            _, (body, _, _) = self._cache.popitem(last=False)
+            self._cache_bytes -= len(body)
+
+    def _evict(self, slug: str) -> None:
+        entry = self._cache.pop(slug, None)
+        if entry is not None:
+            self._cache_bytes -= len(entry[0])
@@ -0,0 +1,23 @@
+import hashlib
+from typing import Optional
+
+
+def make_etag(body: bytes) -> str:
+    """Сильный ETag: хеш от байтов ответа"""
+    return '"' + hashlib.sha256(body).hexdigest()[:32] + '"'
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """Проверяет заголовок If-None-Match (список ETag через запятую или '*')"""
+    if not if_none_match:
+        return False
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip()
+        if candidate == "*":
+            return True
+        # Для If-None-Match используется слабое сравнение: префикс W/ не учитывается
+        if candidate.startswith("W/"):
+            candidate = candidate[2:]
+        if candidate == etag:
+            return True
+    return False
@@ -1,10 +1,24 @@
-from fastapi import FastAPI, HTTPException
+import asyncio
+import os
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, Header, HTTPException, Query, Response
 from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel
-from typing import List
+from typing import List, Optional
+
+from content_store import ContentStore, PostMeta
+from http_cache import etag_matches
+from search_index import SearchIndex
 
 # --- Конфигурация приложения ---
-app = FastAPI()
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Поисковый индекс строится в фоне, чтобы не задерживать старт сервера
+    build_task = asyncio.create_task(build_search_index())
+    yield
+    build_task.cancel()
+
+app = FastAPI(lifespan=lifespan)
 
 # --- Настройка CORS ---
 origins = [
@@ -29,45 +43,81 @@ class PostFull(PostBase):
     author: str
     date: str
 
-# --- База данных в памяти (простой список Python) ---
-fake_posts_db: List[PostFull] = [
-    PostFull(
-        slug="first-post",
-        title="Мой первый пост",
-        content="Это содержимое моего первого поста. Здесь много интересного текста о веб-разработке!",
-        author="Иван Иванов",
-        date="2023-10-01"
-    ),
-    PostFull(
-        slug="fastapi-and-nextjs",
-        title="FastAPI + Next.js = ❤️",
-        content="Сочетание FastAPI для бэкенда и Next.js для фронтенда - это мощный и современный стек. Асинхронность FastAPI и рендеринг Next.js творят чудеса.",
-        author="Мария Петрова",
-        date="2023-10-05"
-    ),
-    PostFull(
-        slug="why-i-love-python",
-        title="Почему я люблю Python",
-        content="Python - это язык с простым синтаксисом и огромной экосистемой. Он отлично подходит для бэкенда, анализа данных и многого другого.",
-        author="Алексей Смирнов",
-        date="2023-10-10"
-    )
-]
+class SearchResult(PostBase):
+    score: float
+
+# --- Хранилище постов (файлы *.md в каталоге content) ---
+# При старте читается только front-matter; текст поста подгружается при первом
+# запросе и кэшируется. Каталог можно переопределить через BLOG_CONTENT_DIR.
+CONTENT_DIR = os.getenv("BLOG_CONTENT_DIR", os.path.join(os.path.dirname(__file__), "content"))
+CONTENT_CACHE_BYTES = int(os.getenv("BLOG_CONTENT_CACHE_BYTES", str(64 * 1024 * 1024)))
+
+content_store = ContentStore(CONTENT_DIR, post_model=PostFull, max_cache_bytes=CONTENT_CACHE_BYTES)
+content_store.scan()
+
+
+# --- Полнотекстовый поиск ---
+# Инвертированный индекс по заголовку и тексту. После первичного построения
+# обновляется инкрементально: ContentStore сообщает о каждом измененном посте.
+search_index = SearchIndex()
+
+def index_post_change(old: Optional[PostMeta], new: Optional[PostMeta], content: Optional[str]):
+    # Текст уже прочитан хранилищем (при пересканировании — в потоке)
+    if old is not None:
+        search_index.remove(old.slug)
+    if new is not None:
+        search_index.add(new.slug, new.title, content)
+
+content_store.on_change = index_post_change
+
+async def build_search_index():
+    for i, meta in enumerate(content_store.all_meta()):
+        if meta.slug in search_index:
+            continue  # Уже проиндексирован через on_change
+        try:
+            search_index.add(meta.slug, meta.title, content_store.read_content(meta))
+        except FileNotFoundError:
+            continue
+        if i % 200 == 0:
+            await asyncio.sleep(0)  # Отдаем управление обработчикам запросов
+
+
+def cached_json_response(body: bytes, etag: str, if_none_match: Optional[str]) -> Response:
+    """Отдает готовые байты с ETag или 304, если у клиента уже актуальная версия"""
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    if etag_matches(if_none_match, etag):
+        return Response(status_code=304, headers=headers)
+    return Response(content=body, media_type="application/json", headers=headers)
+
 
 # --- Эндпоинты API ---
 
 # Отдает краткий список всех постов (slug и title)
 @app.get("/api/posts", response_model=List[PostBase])
-async def get_all_posts():
-    return fake_posts_db
+async def get_all_posts(if_none_match: Optional[str] = Header(default=None)):
+    content_store.refresh_if_stale()
+    body, etag = content_store.list_response()
+    return cached_json_response(body, etag, if_none_match)
+
+# Полнотекстовый поиск по заголовкам и текстам постов (BM25, top-k)
+# Объявлен до /api/posts/{slug}, иначе "search" будет принят за slug
+@app.get("/api/posts/search", response_model=List[SearchResult])
+async def search_posts(q: str = Query(min_length=1), limit: int = Query(default=10, ge=1, le=100)):
+    results = []
+    for slug, score in search_index.search(q, limit):
+        meta = content_store.get_meta(slug)
+        if meta is not None:
+            results.append({"slug": slug, "title": meta.title, "score": round(score, 4)})
+    return results
 
 # Отдает полную информацию о конкретном посте по его slug
 @app.get("/api/posts/{slug}", response_model=PostFull)
-async def get_post_by_slug(slug: str):
-    for post in fake_posts_db:
-        if post.slug == slug:
-            return post
-    raise HTTPException(status_code=404, detail="Post not found")
+async def get_post_by_slug(slug: str, if_none_match: Optional[str] = Header(default=None)):
+    cached = content_store.get_post(slug)
+    if cached is None:
+        raise HTTPException(status_code=404, detail="Post not found")
+    body, etag = cached
+    return cached_json_response(body, etag, if_none_match)
 
 @app.get("/")
 async def root():
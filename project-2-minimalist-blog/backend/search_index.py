@@ -0,0 +1,97 @@
+import heapq
+import math
+import re
+from collections import Counter
+from typing import Dict, List, Tuple
+
+# \w в Python 3 понимает Unicode, поэтому кириллица разбивается на слова так же, как латиница
+TOKEN_RE = re.compile(r"\w+")
+
+
+def tokenize(text: str) -> List[str]:
+    """Разбивает текст на слова в нижнем регистре; «ё» приравнивается к «е»"""
+    return TOKEN_RE.findall(text.casefold().replace("ё", "е"))
+
+
+# --- Инвертированный индекс с ранжированием BM25 ---
+# Для каждого слова хранится словарь {номер документа: вес}, где вес - число
+# вхождений в тексте плюс title_weight за каждое вхождение в заголовке.
+# Документы добавляются и удаляются по одному, поэтому индекс обновляется
+# инкрементально, без перестройки.
+class SearchIndex:
+    def __init__(self, k1: float = 1.2, b: float = 0.75, title_weight: int = 3) -> None:
+        self.k1 = k1
+        self.b = b
+        self.title_weight = title_weight
+        self._postings: Dict[str, Dict[int, int]] = {}
+        self._doc_ids: Dict[str, int] = {}     # slug -> номер документа
+        self._slugs: Dict[int, str] = {}       # номер документа -> slug
+        self._doc_terms: Dict[int, List[str]] = {}
+        self._doc_len: Dict[int, int] = {}
+        self._total_len = 0
+        self._next_id = 0
+
+    def __len__(self) -> int:
+        return len(self._doc_ids)
+
+    def __contains__(self, slug: str) -> bool:
+        return slug in self._doc_ids
+
+    def add(self, slug: str, title: str, content: str) -> None:
+        """Индексирует документ (заменяет старую версию, если она была)"""
+        self.remove(slug)
+        doc = self._next_id
+        self._next_id += 1
+
+        weights = Counter(tokenize(content))
+        for token in tokenize(title):
+            weights[token] += self.title_weight
+
+        for token, weight in weights.items():
+            postings = self._postings.get(token)
+            if postings is None:
+                postings = self._postings[token] = {}
+            postings[doc] = weight
+
+        length = sum(weights.values())
+        self._doc_ids[slug] = doc
+        self._slugs[doc] = slug
+        self._doc_terms[doc] = list(weights)
+        self._doc_len[doc] = length
+        self._total_len += length
+
+    def remove(self, slug: str) -> None:
+        doc = self._doc_ids.pop(slug, None)
+        if doc is None:
+            return
+        del self._slugs[doc]
+        for token in self._doc_terms.pop(doc):
+            postings = self._postings[token]
+            del postings[doc]
+            if not postings:
+                del self._postings[token]
+        self._total_len -= self._doc_len.pop(doc)
+
+    def search(self, query: str, limit: int = 10) -> List[Tuple[str, float]]:
+        """Возвращает до `limit` пар (slug, score) по убыванию релевантности"""
+        total_docs = len(self._doc_ids)
+        if not total_docs:
+            return []
+        # Постоянные части формулы BM25 вынесены из цикла по документам
+        k1 = self.k1
+        base_norm = k1 * (1 - self.b)
+        len_norm = k1 * self.b * total_docs / max(self._total_len, 1)
+        doc_len = self._doc_len
+
+        scores: Dict[int, float] = {}
+        for token in set(tokenize(query)):
+            postings = self._postings.get(token)
+            if not postings:
+                continue
+            df = len(postings)
+            weight = math.log(1 + (total_docs - df + 0.5) / (df + 0.5)) * (k1 + 1)
+            for doc, tf in postings.items():
+                scores[doc] = scores.get(doc, 0.0) + weight * tf / (tf + base_norm + len_norm * doc_len[doc])
+
+        top = heapq.nlargest(limit, scores.items(), key=lambda item: item[1])
+        return [(self._slugs[doc], score) for doc, score in top]
@@ -0,0 +1,96 @@
+"""
+Tail latency of /api/weather/{city} during an upstream brownout, with and
+without the circuit breaker + stale fallback.
+
+    python bench_brownout.py [phase_seconds]
+
+The app runs in-process against stub_upstream.py in a child process. Each run
+goes through three phases: healthy, brownout (half of the upstream calls fail
+with 500, the other half hang past the client timeout) and recovery. The cache
+TTL is 1s and background revalidation is off, so requests keep reaching the
+upstream and stale data is only served when it fails.
+"""
+import asyncio
+import os
+import random
+import statistics
+import sys
+import time
+
+import httpx
+
+import stub_upstream
+
+CITIES = [f"City{i}" for i in range(30)]
+CONCURRENCY = 20
+BROWNOUT = {"error_rate": 0.5, "slow_rate": 0.5, "slow_ms": 4000}
+HEALTHY = {"error_rate": 0, "slow_rate": 0, "slow_ms": 0}
+
+
+async def load(client: httpx.AsyncClient, seconds: float) -> list:
+    samples = []
+    deadline = time.monotonic() + seconds
+
+    async def worker() -> None:
+        while time.monotonic() < deadline:
+            start = time.perf_counter()
+            response = await client.get(f"/api/weather/{random.choice(CITIES)}")
+            stale = response.status_code == 200 and response.json().get("stale", False)
+            samples.append(((time.perf_counter() - start) * 1000, response.status_code, stale))
+
+    await asyncio.gather(*(worker() for _ in range(CONCURRENCY)))
+    return samples
+
+
+def report(phase: str, samples: list) -> None:
+    latencies = sorted(latency for latency, _, _ in samples)
+    errors = sum(1 for _, status, _ in samples if status != 200)
+    stale = sum(1 for _, _, is_stale in samples if is_stale)
+    print(f"  {phase:<9} {len(samples):6} req  errors {errors / len(samples):6.1%}  stale {stale / len(samples):6.1%}  "
+          f"p50 {statistics.median(latencies):7.1f}ms  p99 {latencies[int(len(latencies) * 0.99) - 1]:7.1f}ms  "
+          f"max {latencies[-1]:7.1f}ms")
+
+
+async def run(label: str, stub_url: str, protected: bool, seconds: float) -> None:
+    import main
+    from upstream import upstream_breaker
+    from weather_cache import TTLCache
+
+    upstream_breaker.enabled = protected
+    upstream_breaker.state = upstream_breaker.CLOSED
+    main.weather_cache = TTLCache(
+        stale_ttl=main.WEATHER_STALE_TTL if protected else 0,
+        revalidate_window=0,  # Only stale-if-error, so healthy traffic really reaches the upstream
+        serve_stale_on=main.is_upstream_failure if protected else None,
+        stale_after=main.WEATHER_STALE_AFTER if protected else None,
+    )
+
+    print(label)
+    async with httpx.AsyncClient() as control, main.lifespan(main.app):
+        transport = httpx.ASGITransport(app=main.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://app", timeout=60) as client:
+            stub_root = stub_url.rsplit("/data/", 1)[0]
+            for phase, faults in (("healthy", HEALTHY), ("brownout", BROWNOUT), ("recovery", HEALTHY)):
+                await control.post(f"{stub_root}/_faults", json=faults)
+                report(phase, await load(client, seconds))
+    if protected:
+        print(f"  breaker: {upstream_breaker.stats()}")
+
+
+def main() -> None:
+    seconds = float(sys.argv[1]) if len(sys.argv) > 1 else 10.0
+    with stub_upstream.serve_in_subprocess(STUB_LATENCY_MS="20") as stub_url:
+        os.environ.update({
+            "WEATHER_API_URL": stub_url,
+            "OPENWEATHER_API_KEY": "stub",
+            "WEATHER_CACHE_TTL": "1",
+            "UPSTREAM_TIMEOUT": "2",
+            "WEATHER_STALE_AFTER": "0.25",
+            "BREAKER_OPEN_SECONDS": str(max(seconds / 4, 1)),
+        })
+        asyncio.run(run("no breaker, no stale fallback:", stub_url, protected=False, seconds=seconds))
+        asyncio.run(run("circuit breaker + stale fallback:", stub_url, protected=True, seconds=seconds))
+
+
+if __name__ == "__main__":
+    main()
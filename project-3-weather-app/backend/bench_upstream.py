@@ -0,0 +1,67 @@
+"""
+Compares a new httpx.AsyncClient per request (the old handlers) with the shared,
+pooled client from upstream.py, against the local stub upstream.
+
+    python bench_upstream.py [--tls] [requests] [concurrency]
+
+--tls serves the stub over HTTPS with a self-signed certificate, so every new
+connection pays for a TLS handshake like it does against the real API.
+"""
+import asyncio
+import statistics
+import sys
+import time
+
+import httpx
+
+import stub_upstream
+from upstream import create_upstream_client
+
+
+async def timed_get(client: httpx.AsyncClient, url: str, latencies: list) -> None:
+    start = time.perf_counter()
+    response = await client.get(url, params={"q": "Almaty", "appid": "stub"})
+    response.raise_for_status()
+    latencies.append((time.perf_counter() - start) * 1000)
+
+
+async def run(label: str, url: str, requests: int, concurrency: int, shared: bool, verify: bool) -> None:
+    latencies: list = []
+    semaphore = asyncio.Semaphore(concurrency)
+    client = create_upstream_client(verify=verify) if shared else None
+
+    async def one() -> None:
+        async with semaphore:
+            if shared:
+                await timed_get(client, url, latencies)
+            else:
+                async with httpx.AsyncClient(verify=verify) as own_client:
+                    await timed_get(own_client, url, latencies)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one() for _ in range(requests)))
+    elapsed = time.perf_counter() - start
+    if client is not None:
+        await client.aclose()
+
+    latencies.sort()
+    print(f"{label:<24} {requests / elapsed:8.0f} req/s   "
+          f"p50 {statistics.median(latencies):7.1f}ms   p99 {latencies[int(len(latencies) * 0.99) - 1]:7.1f}ms")
+
+
+def main() -> None:
+    args = [arg for arg in sys.argv[1:] if arg != "--tls"]
+    tls = "--tls" in sys.argv
+    requests = int(args[0]) if args else 500
+    concurrency = int(args[1]) if len(args) > 1 else 20
+
+    with stub_upstream.serve_in_subprocess(tls=tls) as base_url:
+        url = f"{base_url}/weather"
+        print(f"{requests} requests, concurrency {concurrency}, stub latency "
+              f"{stub_upstream.STUB_LATENCY_MS:.0f}ms, {'HTTPS' if tls else 'HTTP'}")
+        asyncio.run(run("client per request", url, requests, concurrency, shared=False, verify=not tls))
+        asyncio.run(run("shared pooled client", url, requests, concurrency, shared=True, verify=not tls))
+
+
+if __name__ == "__main__":
+    main()
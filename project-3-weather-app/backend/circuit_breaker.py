@@ -0,0 +1,107 @@
+import time
+from collections import deque
+from typing import Deque
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling the upstream while the circuit is open."""
+
+
+class CircuitBreaker:
+    """
+    Rolling-window circuit breaker.
+
+    closed:    calls go through; the outcome of the last `window` calls is kept.
+               Once at least `min_calls` are recorded and the share of failed
+               or slow (> slow_call_seconds) calls reaches `failure_rate`, it opens.
+    open:      calls are rejected at once for `open_seconds`.
+    half_open: up to `probe_calls` calls are let through as probes. If they all
+               succeed the circuit closes, any failure opens it again.
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(
+        self,
+        window: int = 20,
+        min_calls: int = 10,
+        failure_rate: float = 0.5,
+        slow_call_seconds: float = 2.0,
+        open_seconds: float = 15.0,
+        probe_calls: int = 2,
+        enabled: bool = True,
+    ) -> None:
+        self.window = window
+        self.min_calls = min_calls
+        self.failure_rate = failure_rate
+        self.slow_call_seconds = slow_call_seconds
+        self.open_seconds = open_seconds
+        self.probe_calls = probe_calls
+        self.enabled = enabled
+        self.state = self.CLOSED
+        self._outcomes: Deque[bool] = deque(maxlen=window)  # True = failed or slow
+        self._opened_at = 0.0
+        self._probing_since = 0.0
+        self._probes_started = 0
+        self._probes_succeeded = 0
+        self.rejected = 0
+        self.times_opened = 0
+
+    def before_call(self) -> None:
+        """Raises CircuitOpenError if the call must not go to the upstream."""
+        if not self.enabled:
+            return
+        if self.state == self.OPEN:
+            if time.monotonic() - self._opened_at < self.open_seconds:
+                self.rejected += 1
+                raise CircuitOpenError()
+            self._start_probing()
+        if self.state == self.HALF_OPEN:
+            if self._probes_started >= self.probe_calls and time.monotonic() - self._probing_since > self.open_seconds:
+                self._start_probing()  # Probes that never reported back (e.g. cancelled) must not block forever
+            if self._probes_started >= self.probe_calls:
+                self.rejected += 1
+                raise CircuitOpenError()
+            self._probes_started += 1
+
+    def _start_probing(self) -> None:
+        self.state = self.HALF_OPEN
+        self._probes_started = 0
+        self._probes_succeeded = 0
+        self._probing_since = time.monotonic()
+
+    def record(self, ok: bool, duration: float) -> None:
+        if not self.enabled:
+            return
+        failed = not ok or duration > self.slow_call_seconds
+        if self.state == self.HALF_OPEN:
+            if failed:
+                self._open()
+                return
+            self._probes_succeeded += 1
+            if self._probes_succeeded >= self.probe_calls:
+                self.state = self.CLOSED
+                self._outcomes.clear()
+            return
+        if self.state == self.OPEN:
+            return  # A call started before the circuit opened; its outcome no longer matters
+        self._outcomes.append(failed)
+        if len(self._outcomes) >= self.min_calls and sum(self._outcomes) / len(self._outcomes) >= self.failure_rate:
+            self._open()
+
+    def _open(self) -> None:
+        self.state = self.OPEN
+        self._opened_at = time.monotonic()
+        self._outcomes.clear()
+        self.times_opened += 1
+
+    def stats(self) -> dict:
+        return {
+            "state": self.state,
+            "enabled": self.enabled,
+            "recent_failure_rate": round(sum(self._outcomes) / len(self._outcomes), 3) if self._outcomes else 0.0,
+            "rejected": self.rejected,
+            "times_opened": self.times_opened,
+        }
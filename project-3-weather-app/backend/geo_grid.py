@@ -0,0 +1,81 @@
+import math
+from typing import Tuple
+
+GEOHASH_ALPHABET = "0123456789bcdefghjkmnpqrstuvwxyz"
+EARTH_RADIUS_KM = 6371.0
+
+# (cell key, cell center latitude, cell center longitude)
+Cell = Tuple[str, float, float]
+
+
+def geohash_encode(lat: float, lon: float, precision: int) -> str:
+    lat_range = [-90.0, 90.0]
+    lon_range = [-180.0, 180.0]
+    chars = []
+    bits = 0
+    value = 0
+    even = True  # Geohash interleaves bits: longitude first
+    while len(chars) < precision:
+        rng, coord = (lon_range, lon) if even else (lat_range, lat)
+        mid = (rng[0] + rng[1]) / 2
+        value <<= 1
+        if coord >= mid:
+            value |= 1
+            rng[0] = mid
+        else:
+            rng[1] = mid
+        even = not even
+        bits += 1
+        if bits == 5:
+            chars.append(GEOHASH_ALPHABET[value])
+            bits = 0
+            value = 0
+    return "".join(chars)
+
+
+def geohash_center(geohash: str) -> Tuple[float, float]:
+    lat_range = [-90.0, 90.0]
+    lon_range = [-180.0, 180.0]
+    even = True
+    for char in geohash:
+        value = GEOHASH_ALPHABET.index(char)
+        for shift in range(4, -1, -1):
+            rng = lon_range if even else lat_range
+            mid = (rng[0] + rng[1]) / 2
+            if value >> shift & 1:
+                rng[0] = mid
+            else:
+                rng[1] = mid
+            even = not even
+    return (lat_range[0] + lat_range[1]) / 2, (lon_range[0] + lon_range[1]) / 2
+
+
+def snap(lat: float, lon: float, mode: str, precision: float) -> Cell:
+    """
+    Maps a coordinate to the cell it falls into.
+    mode "grid":    fixed grid, `precision` is the cell size in degrees (e.g. 0.05)
+    mode "geohash": `precision` is the number of geohash characters (e.g. 5)
+    mode "off":     no snapping, every coordinate is its own cell
+    """
+    if mode == "grid":
+        row = math.floor(lat / precision)
+        col = math.floor(lon / precision)
+        center_lat = min(90.0, (row + 0.5) * precision)
+        center_lon = ((col + 0.5) * precision + 180.0) % 360.0 - 180.0
+        return f"g{precision}:{row}:{col}", round(center_lat, 6), round(center_lon, 6)
+    if mode == "geohash":
+        geohash = geohash_encode(lat, lon, int(precision))
+        center_lat, center_lon = geohash_center(geohash)
+        return geohash, round(center_lat, 6), round(center_lon, 6)
+    if mode == "off":
+        return f"{lat}:{lon}", lat, lon
+    raise ValueError(f"Unknown snapping mode: {mode}")
+
+
+def distance_km(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
+    """Great-circle (haversine) distance"""
+    phi1, phi2 = math.radians(lat1), math.radians(lat2)
+    dphi = phi2 - phi1
+    dlambda = math.radians(lon2 - lon1)
+    a = math.sin(dphi / 2) ** 2 + math.cos(phi1) * math.cos(phi2) * math.sin(dlambda / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * math.asin(math.sqrt(a))
@@ -1,13 +1,29 @@
+import asyncio
 import os
+from contextlib import asynccontextmanager
+from typing import List, Literal
 import httpx
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Query, Request
 from fastapi.middleware.cors import CORSMiddleware
 from dotenv import load_dotenv
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 
 load_dotenv()
 
-app = FastAPI()
+# Imported after load_dotenv() so the upstream settings can come from .env
+from upstream import (
+    FORECAST_BASE_URL, WEATHER_BASE_URL, call_upstream, create_upstream_client, upstream_breaker
+)
+from geo_grid import snap
+from weather_cache import TTLCache
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    app.state.http_client = create_upstream_client()
+    yield
+    await app.state.http_client.aclose()
+
+app = FastAPI(lifespan=lifespan)
 
 origins = ["http://localhost:3000"]
 app.add_middleware(
@@ -20,33 +36,54 @@ app.add_middleware(
 
 API_KEY = os.getenv("OPENWEATHER_API_KEY")
 print(f"Loaded API_KEY: {API_KEY}")  # Debug print to verify key
-WEATHER_BASE_URL = "https://api.openweathermap.org/data/2.5/weather"
-FORECAST_BASE_URL = "https://api.openweathermap.org/data/2.5/forecast"
+
+# Current weather changes every few minutes, the forecast much more slowly
+WEATHER_CACHE_TTL = float(os.getenv("WEATHER_CACHE_TTL", "300"))
+FORECAST_CACHE_TTL = float(os.getenv("FORECAST_CACHE_TTL", "1800"))
+WEATHER_CACHE_SIZE = int(os.getenv("WEATHER_CACHE_SIZE", "10000"))
+# Degrade mode: when the upstream fails (5xx, 429, timeouts, open circuit) the
+# last known good response is served, marked "stale": true, for up to
+# WEATHER_STALE_TTL seconds after it expired, or when the refresh takes longer
+# than WEATHER_STALE_AFTER seconds. Entries that expired less than
+# WEATHER_REVALIDATE_WINDOW seconds ago are served stale at once and refreshed
+# in the background.
+WEATHER_STALE_TTL = float(os.getenv("WEATHER_STALE_TTL", "86400"))
+WEATHER_STALE_AFTER = float(os.getenv("WEATHER_STALE_AFTER", "1"))
+WEATHER_REVALIDATE_WINDOW = float(os.getenv("WEATHER_REVALIDATE_WINDOW", "60"))
+
+def is_upstream_failure(error: BaseException) -> bool:
+    return isinstance(error, HTTPException) and (error.status_code >= 500 or error.status_code == 429)
+
+weather_cache = TTLCache(
+    max_entries=WEATHER_CACHE_SIZE,
+    stale_ttl=WEATHER_STALE_TTL,
+    revalidate_window=WEATHER_REVALIDATE_WINDOW,
+    serve_stale_on=is_upstream_failure,
+    stale_after=WEATHER_STALE_AFTER,
+)
+
+Units = Literal["metric", "imperial", "standard"]
+
+# Coordinate snapping for /api/weather/coords: "grid" (cell size in degrees),
+# "geohash" (number of characters) or "off". See bench_geo_grid.py for the
+# hit-ratio / accuracy trade-off of each precision.
+GEO_SNAP_MODE = os.getenv("GEO_SNAP_MODE", "grid")
+GEO_SNAP_PRECISION = float(os.getenv("GEO_SNAP_PRECISION", "5" if GEO_SNAP_MODE == "geohash" else "0.05"))
+
+WEATHER_BATCH_CONCURRENCY = int(os.getenv("WEATHER_BATCH_CONCURRENCY", "50"))
+WEATHER_BATCH_MAX_ITEMS = 500
 
 class Coords(BaseModel):
     lat: float
     lon: float
 
-@app.get("/api/weather/{city}")
-async def get_weather(city: str):
-    if not API_KEY:
-        raise HTTPException(status_code=500, detail="API key is not configured")
-    params = {
-        "q": city,
-        "appid": API_KEY,
-        "units": "metric",
-        "lang": "ru"
-    }
-    async with httpx.AsyncClient() as client:
-        response = await client.get(WEATHER_BASE_URL, params=params)
-    if response.status_code == 401:
-        raise HTTPException(status_code=401, detail="Invalid OpenWeatherMap API key")
-    if response.status_code == 404:
-        raise HTTPException(status_code=404, detail="City not found")
-    if response.status_code != 200:
-        error_detail = response.json().get("message", "Error fetching weather data")
-        raise HTTPException(status_code=response.status_code, detail=error_detail)
-    data = response.json()
+class WeatherBatchRequest(BaseModel):
+    cities: List[str] = Field(default=[], max_length=WEATHER_BATCH_MAX_ITEMS)
+    coords: List[Coords] = Field(default=[], max_length=WEATHER_BATCH_MAX_ITEMS)
+    units: Units = "metric"
+    lang: str = Field(default="ru", max_length=8)
+
+def summarize_weather(data: dict) -> dict:
     return {
         "city_name": data["name"],
         "temperature": data["main"]["temp"],
@@ -54,26 +91,7 @@ async def get_weather(city: str):
         "icon": data["weather"][0]["icon"]
     }
 
-@app.get("/api/forecast/{city}")
-async def get_forecast(city: str):
-    if not API_KEY:
-        raise HTTPException(status_code=500, detail="API key is not configured")
-    params = {
-        "q": city,
-        "appid": API_KEY,
-        "units": "metric",
-        "lang": "ru"
-    }
-    async with httpx.AsyncClient() as client:
-        response = await client.get(FORECAST_BASE_URL, params=params)
-    if response.status_code == 401:
-        raise HTTPException(status_code=401, detail="Invalid OpenWeatherMap API key")
-    if response.status_code == 404:
-        raise HTTPException(status_code=404, detail="City not found")
-    if response.status_code != 200:
-        error_detail = response.json().get("message", "Error fetching forecast data")
-        raise HTTPException(status_code=response.status_code, detail=error_detail)
-    data = response.json()
+def summarize_forecast(data: dict) -> dict:
     forecast_list = []
     for entry in data["list"]:
         if "12:00:00" in entry["dt_txt"]:
@@ -88,30 +106,111 @@ async def get_forecast(city: str):
         "forecast": forecast_list[:5]
     }
 
+async def cached_lookup(key: tuple, ttl: float, fetch) -> dict:
+    value, stale = await weather_cache.get_or_fetch(key, ttl, fetch)
+    return {**value, "stale": True} if stale else value
+
+def cache_key(kind: str, city: str, units: str, lang: str) -> tuple:
+    # "  New   York" and "new york" are the same lookup upstream, so they share an entry
+    return (kind, " ".join(city.split()).casefold(), units, lang.lower())
+
+async def fetch_weather(client: httpx.AsyncClient, city: str, units: str, lang: str) -> dict:
+    async def fetch():
+        data = await call_upstream(
+            client, WEATHER_BASE_URL, {"q": city, "units": units, "lang": lang}, API_KEY
+        )
+        return summarize_weather(data)
+    return await cached_lookup(
+        cache_key("weather", city, units, lang), WEATHER_CACHE_TTL, fetch
+    )
+
+async def fetch_forecast(client: httpx.AsyncClient, city: str, units: str, lang: str) -> dict:
+    async def fetch():
+        data = await call_upstream(
+            client,
+            FORECAST_BASE_URL,
+            {"q": city, "units": units, "lang": lang},
+            API_KEY,
+            error_detail="Error fetching forecast data",
+        )
+        return summarize_forecast(data)
+    return await cached_lookup(
+        cache_key("forecast", city, units, lang), FORECAST_CACHE_TTL, fetch
+    )
+
+@app.get("/api/weather/{city}")
+async def get_weather(
+    city: str,
+    request: Request,
+    units: Units = "metric",
+    lang: str = Query(default="ru", max_length=8),
+):
+    return await fetch_weather(request.app.state.http_client, city, units, lang)
+
+@app.get("/api/forecast/{city}")
+async def get_forecast(
+    city: str,
+    request: Request,
+    units: Units = "metric",
+    lang: str = Query(default="ru", max_length=8),
+):
+    return await fetch_forecast(request.app.state.http_client, city, units, lang)
+
+async def fetch_weather_by_coords(client: httpx.AsyncClient, lat: float, lon: float, units: str, lang: str) -> dict:
+    # GPS jitter makes raw coordinates unique, so look up the center of the
+    # surrounding grid cell instead: nearby users then share one cache entry
+    cell, cell_lat, cell_lon = snap(lat, lon, GEO_SNAP_MODE, GEO_SNAP_PRECISION)
+
+    async def fetch():
+        data = await call_upstream(
+            client,
+            WEATHER_BASE_URL,
+            {"lat": cell_lat, "lon": cell_lon, "units": units, "lang": lang},
+            API_KEY,
+            not_found_detail="Location not found",
+        )
+        return summarize_weather(data)
+    return await cached_lookup(("coords", cell, units, lang), WEATHER_CACHE_TTL, fetch)
+
 @app.post("/api/weather/coords")
-async def get_weather_by_coords(coords: Coords):
-    if not API_KEY:
-        raise HTTPException(status_code=500, detail="API key is not configured")
-    params = {
-        "lat": coords.lat,
-        "lon": coords.lon,
-        "appid": API_KEY,
-        "units": "metric",
-        "lang": "ru"
-    }
-    async with httpx.AsyncClient() as client:
-        response = await client.get(WEATHER_BASE_URL, params=params)
-    if response.status_code == 401:
-        raise HTTPException(status_code=401, detail="Invalid OpenWeatherMap API key")
-    if response.status_code == 404:
-        raise HTTPException(status_code=404, detail="Location not found")
-    if response.status_code != 200:
-        error_detail = response.json().get("message", "Error fetching weather data")
-        raise HTTPException(status_code=response.status_code, detail=error_detail)
-    data = response.json()
-    return {
-        "city_name": data["name"],
-        "temperature": data["main"]["temp"],
-        "description": data["weather"][0]["description"],
-        "icon": data["weather"][0]["icon"]
-    }
\ No newline at end of file
+async def get_weather_by_coords(coords: Coords, request: Request):
+    return await fetch_weather_by_coords(request.app.state.http_client, coords.lat, coords.lon, "metric", "ru")
+
+@app.post("/api/weather/batch")
+async def get_weather_batch(batch: WeatherBatchRequest, request: Request):
+    """
+    Fetches current weather for many locations concurrently (at most
+    WEATHER_BATCH_CONCURRENCY upstream calls at a time). A failing location
+    gets an "error" entry instead of failing the whole batch; results keep the
+    request order: cities first, then coordinates.
+    """
+    client = request.app.state.http_client
+    semaphore = asyncio.Semaphore(WEATHER_BATCH_CONCURRENCY)
+
+    async def run(item: dict, fetch) -> dict:
+        async with semaphore:
+            try:
+                item["weather"] = await fetch
+            except HTTPException as e:
+                item["error"] = {"status": e.status_code, "detail": e.detail}
+            except Exception as e:
+                item["error"] = {"status": 502, "detail": f"Error fetching weather data: {e}"}
+        return item
+
+    tasks = [
+        run({"city": city}, fetch_weather(client, city, batch.units, batch.lang))
+        for city in batch.cities
+    ] + [
+        run({"lat": coords.lat, "lon": coords.lon},
+            fetch_weather_by_coords(client, coords.lat, coords.lon, batch.units, batch.lang))
+        for coords in batch.coords
+    ]
+    return {"results": await asyncio.gather(*tasks)}
+
+@app.get("/api/cache/stats")
+async def get_cache_stats():
+    return weather_cache.stats()
+
+@app.get("/api/upstream/stats")
+async def get_upstream_stats():
+    return upstream_breaker.stats()
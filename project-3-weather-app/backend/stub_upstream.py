@@ -0,0 +1,146 @@
+"""
+Local stand-in for the OpenWeatherMap API, for offline development and benchmarks.
+
+    STUB_LATENCY_MS=50 uvicorn stub_upstream:app --port 9000
+    WEATHER_API_URL=http://127.0.0.1:9000/data/2.5 OPENWEATHER_API_KEY=stub fastapi dev main.py
+
+Answers /data/2.5/weather and /data/2.5/forecast with deterministic fake data
+after STUB_LATENCY_MS milliseconds. The city "nowhere" returns 404.
+
+Fault injection, to simulate brownouts: STUB_ERROR_RATE is the share of
+requests answered with 500, STUB_SLOW_RATE the share delayed by STUB_SLOW_MS
+instead of STUB_LATENCY_MS. Both can be changed at runtime with
+POST /_faults {"error_rate": 0.5, "slow_rate": 0.3, "slow_ms": 8000}.
+"""
+import asyncio
+import contextlib
+import datetime
+import os
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+import zlib
+from typing import Iterator, Optional
+
+from fastapi import FastAPI
+from fastapi.responses import JSONResponse
+from pydantic import BaseModel
+
+STUB_LATENCY_MS = float(os.getenv("STUB_LATENCY_MS", "50"))
+
+app = FastAPI()
+app.state.requests = 0
+
+
+class Faults(BaseModel):
+    error_rate: float = float(os.getenv("STUB_ERROR_RATE", "0"))
+    slow_rate: float = float(os.getenv("STUB_SLOW_RATE", "0"))
+    slow_ms: float = float(os.getenv("STUB_SLOW_MS", "5000"))
+
+
+app.state.faults = Faults()
+
+
+@app.post("/_faults")
+async def set_faults(faults: Faults):
+    app.state.faults = faults
+    return faults
+
+
+def fake_temperature(key: str) -> float:
+    return round(-20 + zlib.crc32(key.encode()) % 5000 / 100, 2)
+
+
+def location_name(q: Optional[str], lat: Optional[float], lon: Optional[float]) -> str:
+    return q if q else f"Point {lat:.2f},{lon:.2f}"
+
+
+async def simulate_upstream(q: Optional[str]) -> Optional[JSONResponse]:
+    app.state.requests += 1
+    faults = app.state.faults
+    slow = random.random() < faults.slow_rate
+    await asyncio.sleep((faults.slow_ms if slow else STUB_LATENCY_MS) / 1000)
+    if random.random() < faults.error_rate:
+        return JSONResponse({"cod": "500", "message": "internal error"}, status_code=500)
+    if q and q.lower() == "nowhere":
+        return JSONResponse({"cod": "404", "message": "city not found"}, status_code=404)
+    return None
+
+
+@app.get("/data/2.5/weather")
+async def weather(q: Optional[str] = None, lat: Optional[float] = None, lon: Optional[float] = None):
+    error = await simulate_upstream(q)
+    if error is not None:
+        return error
+    name = location_name(q, lat, lon)
+    return {
+        "name": name,
+        "main": {"temp": fake_temperature(name)},
+        "weather": [{"description": "ясно", "icon": "01d"}],
+    }
+
+
+@app.get("/data/2.5/forecast")
+async def forecast(q: Optional[str] = None, lat: Optional[float] = None, lon: Optional[float] = None):
+    error = await simulate_upstream(q)
+    if error is not None:
+        return error
+    name = location_name(q, lat, lon)
+    start = datetime.datetime(2024, 1, 1)
+    entries = []
+    for step in range(40):
+        moment = start + datetime.timedelta(hours=3 * step)
+        entries.append({
+            "dt_txt": moment.strftime("%Y-%m-%d %H:%M:%S"),
+            "main": {"temp": fake_temperature(f"{name}{step}")},
+            "weather": [{"description": "облачно", "icon": "03d"}],
+        })
+    return {"city": {"name": name}, "list": entries}
+
+
+@contextlib.contextmanager
+def serve_in_subprocess(tls: bool = False, **env: str) -> Iterator[str]:
+    """
+    Runs the stub with uvicorn in a child process (so it does not compete with
+    the benchmark for the GIL) and yields its base URL, ending in /data/2.5.
+    With tls=True a throwaway self-signed certificate is generated with the
+    openssl CLI, so clients must use verify=False. Extra keyword arguments are
+    passed to the stub as environment variables.
+    """
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        port = sock.getsockname()[1]
+
+    with tempfile.TemporaryDirectory() as cert_dir:
+        command = [sys.executable, "-m", "uvicorn", "stub_upstream:app",
+                   "--host", "127.0.0.1", "--port", str(port), "--log-level", "warning"]
+        if tls:
+            keyfile = os.path.join(cert_dir, "key.pem")
+            certfile = os.path.join(cert_dir, "cert.pem")
+            subprocess.run(
+                ["openssl", "req", "-x509", "-newkey", "rsa:2048", "-nodes", "-days", "1",
+                 "-subj", "/CN=127.0.0.1", "-keyout", keyfile, "-out", certfile],
+                check=True, capture_output=True,
+            )
+            command += ["--ssl-keyfile", keyfile, "--ssl-certfile", certfile]
+
+        process = subprocess.Popen(
+            command, cwd=os.path.dirname(os.path.abspath(__file__)), env={**os.environ, **env}
+        )
+        try:
+            deadline = time.monotonic() + 20
+            while True:
+                try:
+                    socket.create_connection(("127.0.0.1", port), timeout=0.2).close()
+                    break
+                except OSError:
+                    if process.poll() is not None or time.monotonic() > deadline:
+                        raise RuntimeError("Stub upstream failed to start")
+                    time.sleep(0.05)
+            yield f"{'https' if tls else 'http'}://127.0.0.1:{port}/data/2.5"
+        finally:
+            process.terminate()
+            process.wait()
@@ -0,0 +1,99 @@
+import os
+import time
+from typing import Optional
+
+import httpx
+from fastapi import HTTPException
+
+from circuit_breaker import CircuitBreaker, CircuitOpenError
+
+# Base URL is configurable so the app can be pointed at stub_upstream.py for offline benchmarks
+WEATHER_API_URL = os.getenv("WEATHER_API_URL", "https://api.openweathermap.org/data/2.5").rstrip("/")
+WEATHER_BASE_URL = f"{WEATHER_API_URL}/weather"
+FORECAST_BASE_URL = f"{WEATHER_API_URL}/forecast"
+
+UPSTREAM_MAX_CONNECTIONS = int(os.getenv("UPSTREAM_MAX_CONNECTIONS", "100"))
+UPSTREAM_MAX_KEEPALIVE = int(os.getenv("UPSTREAM_MAX_KEEPALIVE", "20"))
+UPSTREAM_KEEPALIVE_EXPIRY = float(os.getenv("UPSTREAM_KEEPALIVE_EXPIRY", "30"))
+UPSTREAM_CONNECT_TIMEOUT = float(os.getenv("UPSTREAM_CONNECT_TIMEOUT", "3"))
+UPSTREAM_TIMEOUT = float(os.getenv("UPSTREAM_TIMEOUT", "5"))
+UPSTREAM_HTTP2 = os.getenv("UPSTREAM_HTTP2", "").lower() in ("1", "true", "yes")
+
+# Circuit breaker: stop calling the upstream while it is failing or browning out
+upstream_breaker = CircuitBreaker(
+    window=int(os.getenv("BREAKER_WINDOW", "20")),
+    min_calls=int(os.getenv("BREAKER_MIN_CALLS", "10")),
+    failure_rate=float(os.getenv("BREAKER_FAILURE_RATE", "0.5")),
+    slow_call_seconds=float(os.getenv("BREAKER_SLOW_CALL_SECONDS", "2")),
+    open_seconds=float(os.getenv("BREAKER_OPEN_SECONDS", "15")),
+    probe_calls=int(os.getenv("BREAKER_PROBE_CALLS", "2")),
+    enabled=os.getenv("BREAKER_ENABLED", "1").lower() not in ("0", "false", "no"),
+)
+
+
+def create_upstream_client(**client_options) -> httpx.AsyncClient:
+    """
+    One client for the whole app lifetime: TCP/TLS connections are pooled and reused.
+    Extra keyword arguments are passed to httpx.AsyncClient (e.g. verify=False for a stub).
+    """
+    http2 = UPSTREAM_HTTP2
+    if http2:
+        try:
+            import h2  # noqa: F401  (installed with `pip install httpx[http2]`)
+        except ImportError:
+            print("UPSTREAM_HTTP2 is set but the 'h2' package is missing, falling back to HTTP/1.1")
+            http2 = False
+    return httpx.AsyncClient(
+        http2=http2,
+        limits=httpx.Limits(
+            max_connections=UPSTREAM_MAX_CONNECTIONS,
+            max_keepalive_connections=UPSTREAM_MAX_KEEPALIVE,
+            keepalive_expiry=UPSTREAM_KEEPALIVE_EXPIRY,
+        ),
+        timeout=httpx.Timeout(UPSTREAM_TIMEOUT, connect=UPSTREAM_CONNECT_TIMEOUT),
+        **client_options,
+    )
+
+
+async def call_upstream(
+    client: httpx.AsyncClient,
+    url: str,
+    params: dict,
+    api_key: Optional[str],
+    not_found_detail: str = "City not found",
+    error_detail: str = "Error fetching weather data",
+) -> dict:
+    """GETs an OpenWeatherMap endpoint and maps its error statuses to HTTPException."""
+    if not api_key:
+        raise HTTPException(status_code=500, detail="API key is not configured")
+    params = {**params, "appid": api_key}
+    try:
+        upstream_breaker.before_call()
+    except CircuitOpenError:
+        raise HTTPException(status_code=503, detail="Weather service is temporarily unavailable")
+
+    start = time.monotonic()
+    try:
+        response = await client.get(url, params=params)
+    except httpx.TimeoutException:
+        upstream_breaker.record(False, time.monotonic() - start)
+        raise HTTPException(status_code=504, detail="Weather service timed out")
+    except httpx.HTTPError:
+        upstream_breaker.record(False, time.monotonic() - start)
+        raise HTTPException(status_code=502, detail="Weather service is unavailable")
+    # 401/404 are answers about our request, not signs of an unhealthy upstream
+    upstream_breaker.record(
+        response.status_code < 500 and response.status_code != 429, time.monotonic() - start
+    )
+
+    if response.status_code == 401:
+        raise HTTPException(status_code=401, detail="Invalid OpenWeatherMap API key")
+    if response.status_code == 404:
+        raise HTTPException(status_code=404, detail=not_found_detail)
+    if response.status_code != 200:
+        try:
+            detail = response.json().get("message", error_detail)
+        except ValueError:
+            detail = error_detail
+        raise HTTPException(status_code=response.status_code, detail=detail)
+    return response.json()
@@ -0,0 +1,113 @@
+import asyncio
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional, Tuple
+
+
+class TTLCache:
+    """
+    In-process response cache with per-entry TTL, bounded size (LRU eviction)
+    and single-flight: concurrent misses for the same key share one fetch.
+    Failed fetches are not cached.
+
+    Expired entries are kept for up to `stale_ttl` seconds as a last known good
+    value. An entry that expired less than `revalidate_window` seconds ago is
+    served stale at once while it is refreshed in the background
+    (stale-while-revalidate). An older one is only served if the refresh fails
+    with an error accepted by `serve_stale_on` (stale-if-error), or takes longer
+    than `stale_after` seconds (the refresh then continues in the background).
+    """
+
+    def __init__(
+        self,
+        max_entries: int = 10_000,
+        stale_ttl: float = 0.0,
+        revalidate_window: float = 0.0,
+        serve_stale_on: Optional[Callable[[BaseException], bool]] = None,
+        stale_after: Optional[float] = None,
+    ) -> None:
+        self.max_entries = max_entries
+        self.stale_ttl = stale_ttl
+        self.revalidate_window = revalidate_window
+        self.serve_stale_on = serve_stale_on
+        self.stale_after = stale_after
+        self._entries: "OrderedDict[Hashable, Tuple[float, Any]]" = OrderedDict()
+        self._inflight: Dict[Hashable, asyncio.Future] = {}
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.stale = 0
+        self.evictions = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def set(self, key: Hashable, value: Any, ttl: float) -> None:
+        self._entries[key] = (time.monotonic() + ttl, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    async def get_or_fetch(
+        self, key: Hashable, ttl: float, fetch: Callable[[], Awaitable[Any]]
+    ) -> Tuple[Any, bool]:
+        """Returns (value, is_stale)."""
+        entry = self._entries.get(key)
+        expired_for = 0.0
+        if entry is not None:
+            expires_at, value = entry
+            expired_for = time.monotonic() - expires_at
+            if expired_for < 0:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return value, False
+            if expired_for > self.stale_ttl:
+                del self._entries[key]
+                entry = None
+
+        inflight = self._inflight.get(key)
+        if inflight is not None:
+            self.coalesced += 1
+        else:
+            self.misses += 1
+            inflight = asyncio.ensure_future(fetch())
+            self._inflight[key] = inflight
+            inflight.add_done_callback(lambda task: self._finish(key, ttl, task))
+
+        if entry is not None and expired_for <= self.revalidate_window:
+            self.stale += 1
+            return entry[1], True
+
+        # shield: one caller disconnecting (or giving up) must not cancel the fetch others wait on
+        waiting = asyncio.shield(inflight)
+        try:
+            if entry is not None and self.stale_after is not None:
+                return await asyncio.wait_for(waiting, self.stale_after), False
+            return await waiting, False
+        except asyncio.TimeoutError:
+            if entry is None:
+                raise
+            self.stale += 1
+            return entry[1], True
+        except Exception as e:
+            if entry is not None and self.serve_stale_on is not None and self.serve_stale_on(e):
+                self.stale += 1
+                return entry[1], True
+            raise
+
+    def _finish(self, key: Hashable, ttl: float, task: asyncio.Future) -> None:
+        self._inflight.pop(key, None)
+        if not task.cancelled() and task.exception() is None:
+            self.set(key, task.result(), ttl)
+
+    def stats(self) -> dict:
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "coalesced": self.coalesced,
+            "stale": self.stale,
+            "evictions": self.evictions,
+            "size": len(self._entries),
+            "inflight": len(self._inflight),
+        }
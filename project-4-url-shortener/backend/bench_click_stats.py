@@ -0,0 +1,77 @@
+"""
+Memory use and record() cost of ClickStats for many active links, compared
+with a naive per-link dict of {minute: clicks}.
+
+    python bench_click_stats.py [--links N] [--clicks-per-link N] [--hours H]
+
+Every link gets `clicks-per-link` clicks spread over the last `hours` hours,
+so all three rings of each link are in use. Each variant runs in its own
+process; memory is the growth of its peak RSS, so it includes the
+code -> slot index and all object overhead.
+"""
+import argparse
+import multiprocessing
+import resource
+import time
+from collections import defaultdict
+
+from click_stats import ClickStats
+
+
+def peak_rss() -> int:
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024  # ru_maxrss is KiB on Linux
+
+
+def click_times(args):
+    now = time.time()
+    step = args.hours * 3600 / args.clicks_per_link
+    return [now - args.hours * 3600 + k * step for k in range(args.clicks_per_link)]
+
+
+def build_compact(codes, args):
+    stats = ClickStats()
+    for t in click_times(args):
+        for code in codes:
+            stats.record(code, now=t)
+    return stats
+
+
+def build_naive(codes, args):
+    per_link = defaultdict(dict)
+    for t in click_times(args):
+        minute = int(t // 60)
+        for code in codes:
+            buckets = per_link[code]
+            buckets[minute] = buckets.get(minute, 0) + 1
+    return per_link
+
+
+def run(label: str, build, args) -> None:
+    codes = [f"{i:08x}" for i in range(args.links)]
+    base = peak_rss()
+    started = time.perf_counter()
+    kept = build(codes, args)
+    elapsed = time.perf_counter() - started
+    used = peak_rss() - base
+    clicks = args.links * args.clicks_per_link
+    print(f"{label:<20} {used / 2**20:8.1f} MiB  {used / args.links:6.0f} B/link  "
+          f"{clicks / elapsed:10,.0f} clicks/s", flush=True)
+    del kept
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--links", type=int, default=1_000_000)
+    parser.add_argument("--clicks-per-link", type=int, default=20)
+    parser.add_argument("--hours", type=float, default=24.0)
+    args = parser.parse_args()
+
+    print(f"{args.links:,} links, {args.clicks_per_link} clicks each over {args.hours:g}h")
+    for label, build in (("ClickStats (rings)", build_compact), ("dict per link", build_naive)):
+        p = multiprocessing.Process(target=run, args=(label, build, args))
+        p.start()
+        p.join()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,170 @@
+"""
+Redirect latency with inline click writes vs. the write-behind ClickCounter,
+with and without competing write load on the database, plus a check that
+clicks counted by several uvicorn workers all end up in the database.
+
+    python bench_clicks.py [--requests N] [--links N]
+
+Latency runs go through the app in-process (httpx ASGITransport). The write
+load is a separate process inserting rows into the same SQLite file in small
+transactions, so inline click UPDATEs have to wait for the write lock.
+"""
+import argparse
+import asyncio
+import multiprocessing
+import os
+import random
+import signal
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+import httpx
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+CONCURRENCY = 20
+PORT = 8766
+
+
+class InlineClicks:
+    """The old behaviour: one store write per redirect."""
+
+    def __init__(self, store) -> None:
+        self.store = store
+
+    def record(self, short_code: str) -> None:
+        self.store.add_clicks(short_code)
+
+    def forget(self, short_code: str) -> None:
+        pass
+
+    def start(self) -> None:
+        pass
+
+    async def close(self) -> None:
+        pass
+
+
+def populate(db_path: str, links: int) -> None:
+    from storage import SQLiteLinkStore
+
+    store = SQLiteLinkStore(db_path)
+    now = time.time()
+    store.conn.execute("BEGIN")
+    store.conn.executemany(
+        "INSERT OR IGNORE INTO links (short_code, long_url, created_at, expires_at) VALUES (?, ?, ?, ?)",
+        ((f"c{i:06d}", f"https://example.com/{i}", now, now + 86400) for i in range(links)),
+    )
+    store.conn.execute("COMMIT")
+    store.close()
+
+
+def write_load(db_path: str, stop) -> None:
+    from storage import SQLiteLinkStore
+
+    conn = SQLiteLinkStore(db_path).conn
+    i = 0
+    while not stop.is_set():
+        conn.execute("BEGIN IMMEDIATE")
+        for _ in range(50):
+            conn.execute(
+                "INSERT OR IGNORE INTO links (short_code, long_url, created_at, expires_at) VALUES (?, ?, ?, ?)",
+                (f"w{os.getpid()}-{i}", "https://example.com/load", time.time(), time.time() + 86400),
+            )
+            i += 1
+        conn.execute("COMMIT")
+
+
+async def measure(main, requests: int, links: int) -> list:
+    latencies = []
+    transport = httpx.ASGITransport(app=main.app)
+    async with main.lifespan(main.app), httpx.AsyncClient(transport=transport, base_url="http://app") as client:
+        remaining = requests
+
+        async def worker() -> None:
+            nonlocal remaining
+            while remaining > 0:
+                remaining -= 1
+                start = time.perf_counter()
+                response = await client.get(f"/c{random.randrange(links):06d}", follow_redirects=False)
+                latencies.append((time.perf_counter() - start) * 1000)
+                assert response.status_code == 307, response.status_code
+
+        await asyncio.gather(*(worker() for _ in range(CONCURRENCY)))
+    return sorted(latencies)
+
+
+def latency_runs(db_path: str, requests: int, links: int) -> None:
+    import main
+    from click_counter import ClickCounter
+
+    for under_load in (False, True):
+        for label in ("inline", "write-behind"):
+            main.click_counter = InlineClicks(main.link_store) if label == "inline" else ClickCounter(main.link_store)
+            stop = multiprocessing.Event()
+            loader = multiprocessing.Process(target=write_load, args=(db_path, stop)) if under_load else None
+            if loader:
+                loader.start()
+            try:
+                latencies = asyncio.run(measure(main, requests, links))
+            finally:
+                if loader:
+                    stop.set()
+                    loader.join()
+            print(f"  {label:<13} {'write load' if under_load else 'idle':<10} "
+                  f"p50 {statistics.median(latencies):6.2f}ms  p99 {latencies[int(len(latencies) * 0.99) - 1]:7.2f}ms  "
+                  f"max {latencies[-1]:7.2f}ms")
+
+
+def multi_worker_check(db_path: str, links: int, workers: int = 4, redirects: int = 3000) -> None:
+    from storage import SQLiteLinkStore
+
+    store = SQLiteLinkStore(db_path)
+    (before,) = store.conn.execute("SELECT SUM(clicks) FROM links").fetchone()
+    env = dict(os.environ, SHORTENER_DB_PATH=db_path, SHORTENER_CLICK_FLUSH_SECONDS="30")
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--port", str(PORT), "--workers", str(workers),
+         "--log-level", "warning", "--no-access-log"],
+        cwd=HERE, env=env,
+    )
+    try:
+        with httpx.Client(base_url=f"http://127.0.0.1:{PORT}") as client:
+            deadline = time.monotonic() + 60
+            while True:
+                try:
+                    client.get("/docs")
+                    break
+                except httpx.TransportError:
+                    if time.monotonic() > deadline:
+                        raise
+                    time.sleep(0.2)
+            for _ in range(redirects):
+                client.get(f"/c{random.randrange(links):06d}", follow_redirects=False)
+    finally:
+        # Flush interval is 30s, so the clicks can only reach the database via the shutdown flush
+        server.send_signal(signal.SIGINT)
+        server.wait()
+    (after,) = store.conn.execute("SELECT SUM(clicks) FROM links").fetchone()
+    print(f"  {workers} workers, {redirects} redirects -> {after - before} clicks stored after shutdown")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--requests", type=int, default=5000)
+    parser.add_argument("--links", type=int, default=10_000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, "links.db")
+        os.environ["SHORTENER_DB_PATH"] = db_path
+        populate(db_path, args.links)
+        print(f"redirect latency, {args.requests} requests, concurrency {CONCURRENCY}:")
+        latency_runs(db_path, args.requests, args.links)
+        print("click merge across workers:")
+        multi_worker_check(db_path, args.links)
+
+
+if __name__ == "__main__":
+    main()
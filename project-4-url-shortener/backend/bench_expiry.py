@@ -0,0 +1,88 @@
+"""
+Cost of the expiry sweep and memory it gives back, on a synthetic set of
+in-memory links (MemoryLinkStore, min-heap of deadlines).
+
+    python bench_expiry.py [--links N] [--batch N] [--expire-share F]
+
+Links get deadlines spread uniformly over 7 days. The clock is then moved so
+that `expire-share` of them are past due and everything expired is swept in
+batches, the way ExpirySweeper does. Reported: the longest a single batch
+holds the event loop, total sweep time, and RSS before/after. CPython rarely
+hands freed small objects back to the OS, so the benchmark then creates as
+many new links as were swept: if the freed memory is reused, RSS barely
+grows. For comparison it also times one pass of the naive approach (scan
+every link for expired ones), which has to be repeated on every sweep even
+when nothing expired.
+"""
+import argparse
+import gc
+import os
+import random
+import statistics
+import time
+
+from storage import MemoryLinkStore
+
+HORIZON = 7 * 86400
+
+
+def rss() -> int:
+    with open("/proc/self/statm") as f:
+        return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--links", type=int, default=10_000_000)
+    parser.add_argument("--batch", type=int, default=1000)
+    parser.add_argument("--expire-share", type=float, default=0.5)
+    args = parser.parse_args()
+
+    rng = random.Random(1)
+    store = MemoryLinkStore()
+    base_rss = rss()
+    started = time.perf_counter()
+    for i in range(args.links):
+        # Distinct code and URL per link, like real data
+        store.create(f"{i:08x}", f"https://example.com/page/{i}", 0.0, rng.uniform(0, HORIZON))
+    print(f"{args.links:,} links created in {time.perf_counter() - started:.1f}s, "
+          f"RSS +{(rss() - base_rss) / 2**20:,.0f} MiB")
+
+    now = HORIZON * args.expire_share
+    started = time.perf_counter()
+    naive = sum(1 for link in store._links.values() if link.expires_at <= now)
+    print(f"naive full scan: {time.perf_counter() - started:.2f}s per sweep (finds {naive:,} expired)")
+
+    started = time.perf_counter()
+    store.delete_expired(0.0, args.batch)
+    print(f"heap sweep with nothing due: {(time.perf_counter() - started) * 1e6:.1f}us")
+
+    before = rss()
+    batch_ms = []
+    expired = 0
+    started = time.perf_counter()
+    while True:
+        batch_started = time.perf_counter()
+        codes = store.delete_expired(now, args.batch)
+        batch_ms.append((time.perf_counter() - batch_started) * 1000)
+        expired += len(codes)
+        if len(codes) < args.batch:
+            break
+    elapsed = time.perf_counter() - started
+    gc.collect()
+    batch_ms.sort()
+    print(f"heap sweep: {expired:,} links in {len(batch_ms):,} batches of {args.batch}, {elapsed:.1f}s total "
+          f"({expired / elapsed:,.0f} links/s)")
+    print(f"  per batch: p50 {statistics.median(batch_ms):.2f}ms  p99 {batch_ms[int(len(batch_ms) * 0.99) - 1]:.2f}ms  "
+          f"max {batch_ms[-1]:.2f}ms")
+    after = rss()
+    print(f"  RSS {before / 2**20:,.0f} MiB -> {after / 2**20:,.0f} MiB, {len(store._links):,} links left")
+
+    for i in range(expired):
+        store.create(f"n{i:08x}", f"https://example.com/new/{i}", now, now + rng.uniform(0, HORIZON))
+    print(f"refill with {expired:,} new links: RSS +{(rss() - after) / 2**20:,.0f} MiB "
+          f"(vs +{(before - base_rss) * expired / args.links / 2**20:,.0f} MiB for that many links on a fresh heap)")
+
+
+if __name__ == "__main__":
+    main()
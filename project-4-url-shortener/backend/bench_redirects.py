@@ -0,0 +1,115 @@
+"""
+Redirects per second against a SQLite store holding 1M links, with 1, 4 and 8
+uvicorn workers sharing the same database file.
+
+    python bench_redirects.py [--links N] [--seconds S] [--workers 1 4 8] [--clients C]
+
+The database is populated once (bench_links.db next to this script, reused if
+it already holds enough links). Load comes from C client processes, each
+requesting random codes from a hot set of 50k links (80% of requests) and the
+full key space (20%), so both cache hits and misses are exercised.
+"""
+import argparse
+import multiprocessing
+import os
+import random
+import sqlite3
+import subprocess
+import sys
+import time
+
+import httpx
+
+from storage import SQLiteLinkStore
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+DB_PATH = os.path.join(HERE, "bench_links.db")
+PORT = 8765
+HOT_LINKS = 50_000
+
+
+def code_for(i: int) -> str:
+    return f"b{i:07d}"
+
+
+def populate(links: int) -> None:
+    store = SQLiteLinkStore(DB_PATH)
+    (count,) = store.conn.execute("SELECT COUNT(*) FROM links").fetchone()
+    if count >= links:
+        return
+    print(f"populating {links:,} links...")
+    now = time.time()
+    conn: sqlite3.Connection = store.conn
+    conn.execute("BEGIN")
+    conn.executemany(
+        "INSERT OR IGNORE INTO links (short_code, long_url, created_at, expires_at) VALUES (?, ?, ?, ?)",
+        ((code_for(i), f"https://example.com/page/{i}", now, now + 86400) for i in range(links)),
+    )
+    conn.execute("COMMIT")
+    store.close()
+
+
+def client(links: int, seconds: float, results) -> None:
+    rng = random.Random(os.getpid())
+    done = errors = 0
+    with httpx.Client(base_url=f"http://127.0.0.1:{PORT}", follow_redirects=False) as http:
+        deadline = time.monotonic() + seconds
+        while time.monotonic() < deadline:
+            i = rng.randrange(HOT_LINKS) if rng.random() < 0.8 else rng.randrange(links)
+            response = http.get(f"/{code_for(i)}")
+            done += 1
+            errors += response.status_code != 307
+    results.put((done, errors))
+
+
+def wait_until_up(timeout: float = 60.0) -> None:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            httpx.get(f"http://127.0.0.1:{PORT}/docs", timeout=1)
+            return
+        except httpx.TransportError:
+            time.sleep(0.2)
+    raise RuntimeError("server did not start")
+
+
+def run(workers: int, links: int, seconds: float, clients: int) -> None:
+    env = dict(os.environ, SHORTENER_STORAGE="sqlite", SHORTENER_DB_PATH=DB_PATH)
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--port", str(PORT),
+         "--workers", str(workers), "--log-level", "warning", "--no-access-log"],
+        cwd=HERE, env=env,
+    )
+    try:
+        wait_until_up()
+        results = multiprocessing.Queue()
+        procs = [multiprocessing.Process(target=client, args=(links, seconds, results)) for _ in range(clients)]
+        for p in procs:
+            p.start()
+        totals = [results.get() for _ in procs]
+        for p in procs:
+            p.join()
+    finally:
+        server.terminate()
+        server.wait()
+    done = sum(d for d, _ in totals)
+    errors = sum(e for _, e in totals)
+    print(f"{workers} worker(s): {done / seconds:8.0f} redirects/s  ({done:,} requests, {errors} errors)")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--links", type=int, default=1_000_000)
+    parser.add_argument("--seconds", type=float, default=15.0)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 4, 8])
+    parser.add_argument("--clients", type=int, default=8)
+    args = parser.parse_args()
+
+    populate(args.links)
+    print(f"{args.links:,} links, {args.clients} client processes, {os.cpu_count()} CPUs")
+    for workers in args.workers:
+        run(workers, args.links, args.seconds, args.clients)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,115 @@
+import asyncio
+import time
+from typing import Dict, Optional, Tuple
+
+from click_stats import click_periods
+from storage import LinkStore
+
+
+# --- Write-Behind Click Counter ---
+# Redirects only bump an in-memory counter. Accumulated deltas are written to
+# the store in one batch every `flush_interval` seconds, or sooner once
+# `flush_threshold` clicks are pending. The store applies them as
+# `clicks = clicks + delta`, so every worker process flushes its own buffer and
+# the totals add up in the shared database. Flushes run in a worker thread, so
+# a slow write never stalls the event loop that serves redirects.
+# Each click also counts towards its minute, hour and day bucket; those deltas
+# are flushed in the same write, so the time series in the store covers the
+# clicks of every worker, not just the one answering the stats request.
+class ClickCounter:
+    def __init__(self, store: LinkStore, flush_interval: float = 1.0, flush_threshold: int = 10_000) -> None:
+        self.store = store
+        self.flush_interval = flush_interval
+        self.flush_threshold = flush_threshold
+        self._pending: Dict[str, int] = {}
+        self._pending_clicks = 0
+        # short code -> {(granularity, bucket number): clicks}
+        self._buckets: Dict[str, Dict[Tuple[str, int], int]] = {}
+        self._wakeup: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+        self._stopping = False
+        self.flushes = 0
+        self.flushed_clicks = 0
+
+    def record(self, short_code: str, now: Optional[float] = None) -> None:
+        buckets = self._buckets.get(short_code)
+        if buckets is None:
+            buckets = self._buckets[short_code] = {}
+        for key in click_periods(time.time() if now is None else now):
+            buckets[key] = buckets.get(key, 0) + 1
+        self._pending[short_code] = self._pending.get(short_code, 0) + 1
+        self._pending_clicks += 1
+        if self._pending_clicks >= self.flush_threshold and self._wakeup is not None:
+            self._wakeup.set()
+
+    def pending(self, short_code: str) -> int:
+        """Clicks on this link not yet written to the store by this process."""
+        return self._pending.get(short_code, 0)
+
+    def pending_buckets(self, short_code: str) -> Dict[Tuple[str, int], int]:
+        """Per-bucket clicks on this link not yet written to the store by this process."""
+        return self._buckets.get(short_code, {})
+
+    def forget(self, short_code: str) -> None:
+        """Drops buffered clicks of a deleted link."""
+        self._pending_clicks -= self._pending.pop(short_code, 0)
+        self._buckets.pop(short_code, None)
+
+    def start(self) -> None:
+        self._stopping = False
+        self._wakeup = asyncio.Event()
+        self._task = asyncio.create_task(self._flush_loop())
+
+    async def _flush_loop(self) -> None:
+        while not self._stopping:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            try:
+                await self.flush()
+            except Exception as e:
+                # The deltas were put back; try again on the next tick
+                print(f"Click flush failed: {e}")
+
+    async def flush(self) -> None:
+        if not self._pending:
+            return
+        deltas, self._pending = self._pending, {}
+        buckets, self._buckets = self._buckets, {}
+        clicks, self._pending_clicks = self._pending_clicks, 0
+        try:
+            await asyncio.to_thread(self.store.add_clicks_many, deltas, buckets)
+        except Exception:
+            # Only a write that really failed is retried. On cancellation the
+            # thread keeps running and may still commit, so putting the deltas
+            # back could count the same clicks twice.
+            for short_code, delta in deltas.items():
+                self._pending[short_code] = self._pending.get(short_code, 0) + delta
+            for short_code, link_buckets in buckets.items():
+                pending = self._buckets.setdefault(short_code, {})
+                for key, delta in link_buckets.items():
+                    pending[key] = pending.get(key, 0) + delta
+            self._pending_clicks += clicks
+            raise
+        self.flushes += 1
+        self.flushed_clicks += clicks
+
+    async def close(self) -> None:
+        """Stops the background loop and writes out whatever is still buffered."""
+        if self._task is not None:
+            # Not cancel(): a flush in progress is allowed to finish first
+            self._stopping = True
+            self._wakeup.set()
+            await self._task
+            self._task = None
+        await self.flush()
+
+    def stats(self) -> dict:
+        return {
+            "pending_links": len(self._pending),
+            "pending_clicks": self._pending_clicks,
+            "flushes": self.flushes,
+            "flushed_clicks": self.flushed_clicks,
+        }
@@ -0,0 +1,135 @@
+import time
+from array import array
+from typing import Dict, List, Optional, Tuple
+
+# Bucket width in seconds for each granularity
+GRANULARITY_SECONDS = {"minute": 60, "hour": 3600, "day": 86400}
+
+
+def click_periods(now: float) -> List[Tuple[str, int]]:
+    """(granularity, bucket number) of every bucket a click at `now` counts towards."""
+    return [(granularity, int(now // seconds)) for granularity, seconds in GRANULARITY_SECONDS.items()]
+
+
+def bucket_periods(granularity: str, size: int, start: float, end: float, now: float) -> range:
+    """
+    Bucket numbers of `granularity` overlapping [start, end], clipped to the
+    `size` most recent buckets and to the present.
+    """
+    seconds = GRANULARITY_SECONDS[granularity]
+    current = int(now // seconds)
+    return range(max(int(start // seconds), current - size + 1), min(int(end // seconds), current) + 1)
+
+
+# --- Per-Link Click Time Series ---
+# Every link that has been clicked owns a fixed block of counters in one big
+# shared array: `minutes` per-minute buckets, then `hours` hourly and `days`
+# daily ones. Each part is a ring buffer indexed by `period % size`, so a link
+# never uses more than (minutes + hours + days) * 4 bytes of counters no matter
+# how much traffic it gets. A click is added to all three rings at once, which
+# is the roll-up: older traffic stays visible at a coarser granularity.
+# `_last` holds, per link and ring, the newest period written; slots between
+# it and a newer period are zeroed when the ring moves forward.
+# This is the in-process version used by MemoryLinkStore; SQLiteLinkStore keeps
+# the same rings in its click_buckets table so all workers share them.
+class ClickStats:
+    def __init__(self, minutes: int = 60, hours: int = 48, days: int = 30) -> None:
+        self._rings: Tuple[Tuple[str, int, int, int], ...] = (
+            ("minute", GRANULARITY_SECONDS["minute"], minutes, 0),
+            ("hour", GRANULARITY_SECONDS["hour"], hours, minutes),
+            ("day", GRANULARITY_SECONDS["day"], days, minutes + hours),
+        )
+        self.sizes = {"minute": minutes, "hour": hours, "day": days}
+        self._width = minutes + hours + days
+        self._index: Dict[str, int] = {}
+        self._free: List[int] = []
+        self._counts = array("I")
+        self._last = array("q")
+
+    def __len__(self) -> int:
+        return len(self._index)
+
+    def _ring(self, granularity: str) -> Tuple[int, int, int, int]:
+        for ring, (name, seconds, size, offset) in enumerate(self._rings):
+            if name == granularity:
+                return ring, seconds, size, offset
+        raise ValueError(f"Unknown granularity: {granularity}")
+
+    def _allocate(self, short_code: str) -> int:
+        if self._free:
+            slot = self._free.pop()
+            start = slot * self._width
+            self._counts[start:start + self._width] = array("I", bytes(4 * self._width))
+        else:
+            slot = len(self._counts) // self._width
+            self._counts.frombytes(bytes(4 * self._width))
+            self._last.extend((-1, -1, -1))
+        for ring in range(3):
+            self._last[slot * 3 + ring] = -1
+        self._index[short_code] = slot
+        return slot
+
+    def record(self, short_code: str, clicks: int = 1, now: Optional[float] = None) -> None:
+        if now is None:
+            now = time.time()
+        slot = self._index.get(short_code)
+        if slot is None:
+            slot = self._allocate(short_code)
+        for ring, (_, seconds, size, offset) in enumerate(self._rings):
+            self._add(slot, ring, size, offset, int(now // seconds), clicks)
+
+    def add(self, short_code: str, granularity: str, period: int, clicks: int) -> None:
+        """Adds clicks to one bucket (period = bucket start // bucket width)."""
+        slot = self._index.get(short_code)
+        if slot is None:
+            slot = self._allocate(short_code)
+        ring, _, size, offset = self._ring(granularity)
+        self._add(slot, ring, size, offset, period, clicks)
+
+    def _add(self, slot: int, ring: int, size: int, offset: int, period: int, clicks: int) -> None:
+        counts = self._counts
+        base = slot * self._width + offset
+        last = self._last[slot * 3 + ring]
+        if period > last:
+            # Zero the slots the ring skipped over since its last write
+            if last < 0 or period - last >= size:
+                counts[base:base + size] = array("I", bytes(4 * size))
+            else:
+                for p in range(last + 1, period + 1):
+                    counts[base + p % size] = 0
+            self._last[slot * 3 + ring] = period
+        elif last - period >= size:
+            return  # Older than anything this ring still holds
+        counts[base + period % size] += clicks
+
+    def remove(self, short_code: str) -> None:
+        slot = self._index.pop(short_code, None)
+        if slot is not None:
+            self._free.append(slot)
+
+    def retention(self, granularity: str) -> int:
+        """How far back (in seconds) this granularity reaches."""
+        _, seconds, size, _ = self._ring(granularity)
+        return seconds * size
+
+    def series(
+        self, short_code: str, granularity: str, start: float, end: float, now: Optional[float] = None
+    ) -> List[Tuple[int, int]]:
+        """
+        (bucket start as a Unix timestamp, clicks) for every bucket overlapping
+        [start, end], clipped to what the ring still holds and to the present.
+        """
+        if now is None:
+            now = time.time()
+        ring, seconds, size, offset = self._ring(granularity)
+        periods = bucket_periods(granularity, size, start, end, now)
+        slot = self._index.get(short_code)
+        if slot is None:
+            return [(p * seconds, 0) for p in periods]
+        base = slot * self._width + offset
+        last = self._last[slot * 3 + ring]
+        return [(p * seconds, self._counts[base + p % size] if last - size < p <= last else 0) for p in periods]
+
+    def memory_bytes(self) -> int:
+        """Bytes used by the counter arrays (the code -> slot index comes on top)."""
+        return self._counts.buffer_info()[1] * self._counts.itemsize + self._last.buffer_info()[1] * self._last.itemsize
@@ -0,0 +1,110 @@
+import hashlib
+from typing import Callable
+
+BASE62 = "0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz"
+CODE_LENGTH = 7
+CODE_SPACE = 62 ** CODE_LENGTH  # ~3.5e12 codes
+
+# The permutation is a Feistel network over 42-bit numbers (2^42 > 62^7)
+_HALF_BITS = 21
+_HALF_MASK = (1 << _HALF_BITS) - 1
+_ROUNDS = 4
+
+
+def encode_base62(number: int, length: int = CODE_LENGTH) -> str:
+    chars = []
+    while number:
+        number, digit = divmod(number, 62)
+        chars.append(BASE62[digit])
+    return "".join(reversed(chars)).rjust(length, BASE62[0])
+
+
+def decode_base62(code: str) -> int:
+    number = 0
+    for char in code:
+        number = number * 62 + BASE62.index(char)
+    return number
+
+
+class IdPermutation:
+    """
+    Keyed bijection of [0, CODE_SPACE): sequential IDs map to codes that look
+    random, yet two different IDs can never map to the same code. Values that
+    land outside the code space are fed through the network again
+    (cycle-walking), which keeps it a bijection of the smaller range.
+    """
+
+    def __init__(self, key: str) -> None:
+        digest = hashlib.sha256(key.encode()).digest()
+        self._round_keys = [int.from_bytes(digest[i * 4:(i + 1) * 4], "big") for i in range(_ROUNDS)]
+
+    def _round(self, half: int, round_key: int) -> int:
+        x = (half ^ round_key) * 0x9E3779B1 & 0xFFFFFFFF
+        x ^= x >> 15
+        x = x * 0x85EBCA6B & 0xFFFFFFFF
+        return (x ^ (x >> 13)) & _HALF_MASK
+
+    def _encrypt(self, value: int) -> int:
+        left, right = value >> _HALF_BITS, value & _HALF_MASK
+        for round_key in self._round_keys:
+            left, right = right, left ^ self._round(right, round_key)
+        return (left << _HALF_BITS) | right
+
+    def _decrypt(self, value: int) -> int:
+        left, right = value >> _HALF_BITS, value & _HALF_MASK
+        for round_key in reversed(self._round_keys):
+            left, right = right ^ self._round(left, round_key), left
+        return (left << _HALF_BITS) | right
+
+    def forward(self, value: int) -> int:
+        value = self._encrypt(value)
+        while value >= CODE_SPACE:
+            value = self._encrypt(value)
+        return value
+
+    def backward(self, value: int) -> int:
+        value = self._decrypt(value)
+        while value >= CODE_SPACE:
+            value = self._decrypt(value)
+        return value
+
+
+# --- Short-Code Allocator ---
+# Each worker leases a block of `lease_size` IDs from a counter shared by all
+# workers (see LinkStore.lease_ids) and hands them out one by one, so new codes
+# cost O(1) and never need a "does this code exist?" round trip. Two workers
+# never get overlapping blocks, and encoding is a bijection, so generated codes
+# cannot collide with each other. IDs lost in an unfinished block when a
+# worker stops are simply skipped.
+class CodeAllocator:
+    def __init__(self, lease_ids: Callable[[int], int], lease_size: int = 1000, key: str = "") -> None:
+        self._lease_ids = lease_ids
+        self.lease_size = lease_size
+        self._permutation = IdPermutation(key) if key else None
+        self._next = 0
+        self._end = 0
+        self.leases = 0
+
+    def next_id(self) -> int:
+        if self._next >= self._end:
+            self._next = self._lease_ids(self.lease_size)
+            self._end = self._next + self.lease_size
+            self.leases += 1
+        allocated = self._next
+        self._next += 1
+        return allocated
+
+    def encode(self, allocated: int) -> str:
+        if allocated >= CODE_SPACE:
+            raise RuntimeError("Short-code space exhausted")
+        if self._permutation is not None:
+            allocated = self._permutation.forward(allocated)
+        return encode_base62(allocated)
+
+    def decode(self, code: str) -> int:
+        """The ID a generated code was made from."""
+        value = decode_base62(code)
+        return self._permutation.backward(value) if self._permutation is not None else value
+
+    def next_code(self) -> str:
+        return self.encode(self.next_id())
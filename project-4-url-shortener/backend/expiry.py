@@ -0,0 +1,77 @@
+import asyncio
+import time
+from typing import Callable, List, Optional
+
+from storage import LinkStore
+
+
+# --- Background Expiry Sweeper ---
+# Expired links are deleted proactively instead of only when someone visits
+# them. Each pass asks the store for expired links in deadline order (a
+# min-heap in memory, an index on expires_at in SQLite) and deletes them in
+# batches of at most `batch_size`. Between batches the loop yields to the event
+# loop, so a large backlog of expired links never blocks request handling for
+# longer than one batch. `on_expired` gets the codes of every deleted batch.
+class ExpirySweeper:
+    def __init__(
+        self,
+        store: LinkStore,
+        on_expired: Optional[Callable[[List[str]], None]] = None,
+        interval: float = 5.0,
+        batch_size: int = 1000,
+    ) -> None:
+        self.store = store
+        self.on_expired = on_expired
+        self.interval = interval
+        self.batch_size = batch_size
+        self._task: Optional[asyncio.Task] = None
+        self.expired = 0
+        self.batches = 0
+        self.last_sweep_seconds = 0.0
+
+    def start(self) -> None:
+        self._task = asyncio.create_task(self._sweep_loop())
+
+    async def _sweep_loop(self) -> None:
+        while True:
+            try:
+                await self.sweep()
+            except Exception as e:
+                print(f"Expiry sweep failed: {e}")
+            await asyncio.sleep(self.interval)
+
+    async def sweep(self, now: Optional[float] = None) -> int:
+        """Deletes everything expired by `now`, one bounded batch at a time."""
+        started = time.perf_counter()
+        if now is None:
+            now = time.time()
+        total = 0
+        while True:
+            expired = await self.store.sweep_expired(now, self.batch_size)
+            if expired:
+                self.batches += 1
+                total += len(expired)
+                if self.on_expired is not None:
+                    self.on_expired(expired)
+            if len(expired) < self.batch_size:
+                break
+            await asyncio.sleep(0)  # Let requests run between batches
+        self.expired += total
+        self.last_sweep_seconds = time.perf_counter() - started
+        return total
+
+    async def close(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def stats(self) -> dict:
+        return {
+            "expired": self.expired,
+            "batches": self.batches,
+            "last_sweep_seconds": round(self.last_sweep_seconds, 4),
+        }
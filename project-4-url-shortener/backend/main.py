@@ -1,11 +1,79 @@
-import secrets
-import datetime
-from fastapi import FastAPI, HTTPException, Request
+import os
+import time
+from contextlib import asynccontextmanager
+from datetime import datetime, timezone
+from typing import Literal
+from fastapi import FastAPI, HTTPException, Query, Request
 from fastapi.responses import RedirectResponse
 from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel, HttpUrl
 
-app = FastAPI()
+from click_counter import ClickCounter
+from click_stats import GRANULARITY_SECONDS
+from code_allocator import CodeAllocator
+from expiry import ExpirySweeper
+from storage import create_link_store
+
+# Link storage: "sqlite" (default) survives restarts and is shared by all uvicorn
+# workers; "memory" is a per-process dict. Redirect lookups go through an
+# in-process LRU cache of SHORTENER_CACHE_SIZE links (0 disables it).
+SHORTENER_STORAGE = os.getenv("SHORTENER_STORAGE", "sqlite")
+SHORTENER_DB_PATH = os.getenv("SHORTENER_DB_PATH", "links.db")
+SHORTENER_CACHE_SIZE = int(os.getenv("SHORTENER_CACHE_SIZE", "100000"))
+
+# Per-link click time series, kept by the store so every worker's clicks count:
+# SHORTENER_STATS_MINUTES per-minute buckets, then hourly and daily ones. Keep
+# the sizes the same for the lifetime of the data (they decide the ring slots).
+SHORTENER_STATS_SIZES = {
+    "minute": int(os.getenv("SHORTENER_STATS_MINUTES", "60")),
+    "hour": int(os.getenv("SHORTENER_STATS_HOURS", "48")),
+    "day": int(os.getenv("SHORTENER_STATS_DAYS", "30")),
+}
+link_store = create_link_store(SHORTENER_STORAGE, SHORTENER_DB_PATH, SHORTENER_CACHE_SIZE, SHORTENER_STATS_SIZES)
+
+# Random codes come from ID blocks leased from the store (see code_allocator.py).
+# A secret key scrambles the IDs so codes are neither sequential nor possible to
+# enumerate. Without SHORTENER_CODE_KEY a random key is generated once and kept
+# in the store; a key set here must stay the same for the lifetime of the data,
+# and an empty one turns scrambling off.
+SHORTENER_CODE_KEY = os.getenv("SHORTENER_CODE_KEY")
+code_allocator = CodeAllocator(
+    link_store.lease_ids,
+    lease_size=int(os.getenv("SHORTENER_CODE_LEASE", "1000")),
+    key=link_store.code_key() if SHORTENER_CODE_KEY is None else SHORTENER_CODE_KEY,
+)
+
+# Clicks (and their time-series buckets) are buffered per worker and written in
+# batches (see click_counter.py)
+click_counter = ClickCounter(
+    link_store,
+    flush_interval=float(os.getenv("SHORTENER_CLICK_FLUSH_SECONDS", "1.0")),
+    flush_threshold=int(os.getenv("SHORTENER_CLICK_FLUSH_THRESHOLD", "10000")),
+)
+
+def forget_links(short_codes: list[str]) -> None:
+    """Drops per-link state kept in this worker once links are deleted."""
+    for short_code in short_codes:
+        click_counter.forget(short_code)
+
+# Expired links are deleted in the background, in batches of SHORTENER_SWEEP_BATCH
+expiry_sweeper = ExpirySweeper(
+    link_store,
+    on_expired=forget_links,
+    interval=float(os.getenv("SHORTENER_SWEEP_SECONDS", "5")),
+    batch_size=int(os.getenv("SHORTENER_SWEEP_BATCH", "1000")),
+)
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    click_counter.start()
+    expiry_sweeper.start()
+    yield
+    await expiry_sweeper.close()
+    await click_counter.close()  # Flush buffered clicks on graceful shutdown
+    link_store.close()
+
+app = FastAPI(lifespan=lifespan)
 
 # CORS configuration
 origins = ["http://localhost:3000"]
@@ -17,68 +85,131 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# In-memory database
-url_db = {}  # Structure: {short_code: {long_url: str, clicks: int, created_at: datetime}}
-
 # Pydantic models
 class URLCreate(BaseModel):
     long_url: HttpUrl
     custom_code: str | None = None  # Optional custom short code
+    ttl_seconds: int | None = None  # Optional lifetime, LINK_EXPIRATION_DAYS by default
 
 class URLResponse(BaseModel):
     short_url: str
     clicks: int
+    expires_at: datetime
+
+class ClickBucket(BaseModel):
+    start: datetime
+    clicks: int
+
+class LinkStats(BaseModel):
+    short_code: str
+    granularity: str
+    clicks: int  # Lifetime total
+    buckets: list[ClickBucket]
 
 # Constants
 LINK_EXPIRATION_DAYS = 7
+MIN_LINK_TTL_SECONDS = 60
+MAX_LINK_TTL_DAYS = 365
 
 @app.post("/api/shorten", response_model=URLResponse)
 async def create_short_url(url_data: URLCreate, request: Request):
     """Creates a short URL with an optional custom code."""
     long_url = str(url_data.long_url)
     custom_code = url_data.custom_code
+    ttl_seconds = LINK_EXPIRATION_DAYS * 86400 if url_data.ttl_seconds is None else url_data.ttl_seconds
+    if not (MIN_LINK_TTL_SECONDS <= ttl_seconds <= MAX_LINK_TTL_DAYS * 86400):
+        raise HTTPException(
+            status_code=400,
+            detail=f"ttl_seconds must be between {MIN_LINK_TTL_SECONDS} and {MAX_LINK_TTL_DAYS * 86400}",
+        )
+    created_at = time.time()
+    expires_at = created_at + ttl_seconds
 
     if custom_code:
         # Validate custom code (e.g., alphanumeric, 4-10 characters)
         if not (4 <= len(custom_code) <= 10 and custom_code.isalnum()):
             raise HTTPException(status_code=400, detail="Custom code must be 4-10 alphanumeric characters")
-        if custom_code in url_db:
+        # create() is atomic, so two workers cannot both claim the same code
+        if not link_store.create(custom_code, long_url, created_at, expires_at):
             raise HTTPException(status_code=409, detail="Custom code already in use")
         short_code = custom_code
     else:
-        # Generate random secure code
-        short_code = secrets.token_urlsafe(6)
-        while short_code in url_db:
-            short_code = secrets.token_urlsafe(6)
-
-    # Store URL with metadata
-    url_db[short_code] = {
-        "long_url": long_url,
-        "clicks": 0,
-        "created_at": datetime.datetime.utcnow()
-    }
+        # Generated codes never collide with each other; the retry only
+        # skips a code someone already took as their custom code
+        short_code = code_allocator.next_code()
+        while not link_store.create(short_code, long_url, created_at, expires_at):
+            short_code = code_allocator.next_code()
 
     # Form full short URL
     base_url = str(request.base_url).rstrip('/')
     short_url = f"{base_url}/{short_code}"
 
-    return {"short_url": short_url, "clicks": 0}
+    return {
+        "short_url": short_url,
+        "clicks": 0,
+        "expires_at": datetime.fromtimestamp(expires_at, timezone.utc),
+    }
 
 @app.get("/{short_code}")
 async def redirect_to_long_url(short_code: str):
     """Redirects to the long URL, increments clicks, and checks expiration."""
-    entry = url_db.get(short_code)
-    if not entry:
+    link = link_store.get_for_redirect(short_code)
+    if not link:
         raise HTTPException(status_code=404, detail="Short URL not found")
 
-    # Check expiration
-    created_at = entry["created_at"]
-    expiration_date = created_at + datetime.timedelta(days=LINK_EXPIRATION_DAYS)
-    if datetime.datetime.utcnow() > expiration_date:
-        del url_db[short_code]  # Remove expired link
-        raise HTTPException(status_code=404, detail="Short URL has expired")
+    # Check expiration (the sweeper may not have reached this link yet)
+    now = time.time()
+    if now >= link.expires_at:
+        if link_store.expire(short_code, now):  # Remove expired link
+            forget_links([short_code])
+            raise HTTPException(status_code=404, detail="Short URL has expired")
+        # A stale cached copy: another worker has re-created the code since
+        link = link_store.get_for_redirect(short_code)
+        if not link:
+            raise HTTPException(status_code=404, detail="Short URL not found")
 
-    # Increment click count
-    entry["clicks"] += 1
+    # Count the click; it reaches the store with the next batched flush
+    click_counter.record(short_code)
 
-    return RedirectResponse(url=entry["long_url"])
\ No newline at end of file
+    return RedirectResponse(url=link.long_url)
+
+def as_timestamp(value: datetime) -> float:
+    # Times without a timezone are taken as UTC
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return value.timestamp()
+
+@app.get("/api/links/{short_code}/stats", response_model=LinkStats)
+async def get_link_stats(
+    short_code: str,
+    start: datetime | None = Query(None, alias="from"),
+    end: datetime | None = Query(None, alias="to"),
+    granularity: Literal["minute", "hour", "day"] = "hour",
+):
+    """Click counts of one link per minute/hour/day between `from` and `to` (default: everything retained)."""
+    link = link_store.get(short_code)
+    if not link:
+        raise HTTPException(status_code=404, detail="Short URL not found")
+
+    now = time.time()
+    end_ts = as_timestamp(end) if end else now
+    start_ts = as_timestamp(start) if start else now - link_store.stats_retention(granularity)
+    if start_ts > end_ts:
+        raise HTTPException(status_code=400, detail="'from' must not be after 'to'")
+
+    # The store has every worker's flushed clicks; add what this worker still buffers
+    pending = click_counter.pending_buckets(short_code)
+    seconds = GRANULARITY_SECONDS[granularity]
+    buckets = [
+        {
+            "start": datetime.fromtimestamp(bucket_start, timezone.utc),
+            "clicks": clicks + pending.get((granularity, bucket_start // seconds), 0),
+        }
+        for bucket_start, clicks in link_store.click_series(short_code, granularity, start_ts, end_ts, now)
+    ]
+    return {
+        "short_code": short_code,
+        "granularity": granularity,
+        "clicks": link.clicks + click_counter.pending(short_code),
+        "buckets": buckets,
+    }
@@ -0,0 +1,447 @@
+import asyncio
+import heapq
+import os
+import secrets
+import sqlite3
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+from click_stats import GRANULARITY_SECONDS, ClickStats, bucket_periods
+
+# Buckets kept per link for each granularity (SHORTENER_STATS_MINUTES/HOURS/DAYS)
+DEFAULT_STATS_SIZES = {"minute": 60, "hour": 48, "day": 30}
+
+# short code -> {(granularity, bucket number): clicks}
+BucketDeltas = Dict[str, Dict[Tuple[str, int], int]]
+
+
+class Link(NamedTuple):
+    long_url: str
+    created_at: float  # Unix timestamp (UTC)
+    expires_at: float  # Unix timestamp (UTC)
+    clicks: int = 0
+
+
+# --- Storage Backends ---
+class LinkStore(ABC):
+    """Where short links live. Implementations must make create() atomic."""
+
+    @abstractmethod
+    def get(self, short_code: str) -> Optional[Link]:
+        ...
+
+    def get_for_redirect(self, short_code: str) -> Optional[Link]:
+        """Lookup for the redirect hot path; caching stores may serve it from memory."""
+        return self.get(short_code)
+
+    @abstractmethod
+    def create(self, short_code: str, long_url: str, created_at: float, expires_at: float) -> bool:
+        """Stores a new link. Returns False if the code is already taken."""
+
+    @abstractmethod
+    def delete(self, short_code: str) -> None:
+        ...
+
+    @abstractmethod
+    def expire(self, short_code: str, now: float) -> bool:
+        """
+        Deletes the link if it expired by `now`. Returns False if the code holds
+        a live link (it may have been re-created since the caller read it).
+        """
+
+    @abstractmethod
+    def add_clicks(self, short_code: str, clicks: int = 1) -> None:
+        ...
+
+    @abstractmethod
+    def delete_expired(self, now: float, limit: int) -> List[str]:
+        """Deletes up to `limit` links that expired by `now`, soonest first, and returns their codes."""
+
+    async def sweep_expired(self, now: float, limit: int) -> List[str]:
+        """delete_expired() for the background sweeper; stores doing disk I/O run it off the event loop."""
+        return self.delete_expired(now, limit)
+
+    def add_clicks_many(self, deltas: Dict[str, int], buckets: Optional[BucketDeltas] = None) -> None:
+        """
+        Applies several click increments at once, plus their per-bucket counts
+        for the time series (codes that no longer exist are skipped).
+        """
+        for short_code, clicks in deltas.items():
+            self.add_clicks(short_code, clicks)
+
+    @abstractmethod
+    def click_series(
+        self, short_code: str, granularity: str, start: float, end: float, now: float
+    ) -> List[Tuple[int, int]]:
+        """(bucket start as a Unix timestamp, clicks) for every retained bucket overlapping [start, end]."""
+
+    @abstractmethod
+    def stats_retention(self, granularity: str) -> int:
+        """How far back (in seconds) click_series() reaches for this granularity."""
+
+    @abstractmethod
+    def lease_ids(self, count: int) -> int:
+        """Reserves `count` consecutive link IDs for the caller and returns the first one."""
+
+    @abstractmethod
+    def code_key(self) -> str:
+        """Secret key that scrambles generated codes: random on first use, then kept with the links."""
+
+    def close(self) -> None:
+        pass
+
+
+class MemoryLinkStore(LinkStore):
+    """Plain dict: fast, but per-process and lost on restart."""
+
+    def __init__(self, stats_sizes: Optional[Dict[str, int]] = None) -> None:
+        sizes = stats_sizes or DEFAULT_STATS_SIZES
+        self._stats = ClickStats(minutes=sizes["minute"], hours=sizes["hour"], days=sizes["day"])
+        self._links: Dict[str, Link] = {}
+        # Min-heap of (expires_at, short_code). Deleted links are not removed
+        # from it; delete_expired() skips entries whose link is gone.
+        self._expiry: List[Tuple[float, str]] = []
+        self._next_id = 0
+        self._code_key = secrets.token_urlsafe(32)
+
+    def get(self, short_code: str) -> Optional[Link]:
+        return self._links.get(short_code)
+
+    def create(self, short_code: str, long_url: str, created_at: float, expires_at: float) -> bool:
+        if short_code in self._links:
+            return False
+        self._links[short_code] = Link(long_url, created_at, expires_at)
+        heapq.heappush(self._expiry, (expires_at, short_code))
+        return True
+
+    def delete(self, short_code: str) -> None:
+        self._links.pop(short_code, None)
+        self._stats.remove(short_code)
+
+    def expire(self, short_code: str, now: float) -> bool:
+        link = self._links.get(short_code)
+        if link is not None and link.expires_at > now:
+            return False
+        self.delete(short_code)
+        return True
+
+    def add_clicks(self, short_code: str, clicks: int = 1) -> None:
+        link = self._links.get(short_code)
+        if link is not None:
+            self._links[short_code] = link._replace(clicks=link.clicks + clicks)
+
+    def add_clicks_many(self, deltas: Dict[str, int], buckets: Optional[BucketDeltas] = None) -> None:
+        super().add_clicks_many(deltas)
+        for short_code, link_buckets in (buckets or {}).items():
+            if short_code in self._links:
+                for (granularity, period), clicks in link_buckets.items():
+                    self._stats.add(short_code, granularity, period, clicks)
+
+    def click_series(
+        self, short_code: str, granularity: str, start: float, end: float, now: float
+    ) -> List[Tuple[int, int]]:
+        return self._stats.series(short_code, granularity, start, end, now)
+
+    def stats_retention(self, granularity: str) -> int:
+        return self._stats.retention(granularity)
+
+    def delete_expired(self, now: float, limit: int) -> List[str]:
+        expired = []
+        heap = self._expiry
+        while heap and heap[0][0] <= now and len(expired) < limit:
+            expires_at, short_code = heapq.heappop(heap)
+            link = self._links.get(short_code)
+            # The code may have been deleted (and even reused) since it was pushed
+            if link is not None and link.expires_at == expires_at:
+                del self._links[short_code]
+                self._stats.remove(short_code)
+                expired.append(short_code)
+        return expired
+
+    def lease_ids(self, count: int) -> int:
+        first = self._next_id
+        self._next_id += count
+        return first
+
+    def code_key(self) -> str:
+        return self._code_key
+
+
+class SQLiteLinkStore(LinkStore):
+    """
+    SQLite database in WAL mode: survives restarts and can be shared by several
+    uvicorn worker processes (readers never block the writer and vice versa).
+    Each process opens its own connection on first use.
+    The click time series lives in click_buckets: per link and granularity a
+    ring of `size` rows keyed by slot = bucket number % size, like ClickStats.
+    Each row remembers which bucket it currently holds, so a click for a newer
+    bucket overwrites the old count instead of adding to it, and a link never
+    has more than minutes + hours + days rows.
+    """
+
+    def __init__(self, path: str, stats_sizes: Optional[Dict[str, int]] = None) -> None:
+        self.path = path
+        self.stats_sizes = stats_sizes or DEFAULT_STATS_SIZES
+        self._conn: Optional[sqlite3.Connection] = None
+        self._pid = 0
+
+    @property
+    def conn(self) -> sqlite3.Connection:
+        # A connection must not be shared across fork(), so reopen in each worker process
+        if self._conn is None or self._pid != os.getpid():
+            self._conn = self._connect()
+            self._pid = os.getpid()
+        return self._conn
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.path, isolation_level=None, check_same_thread=False, timeout=10)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS links ("
+            " short_code TEXT PRIMARY KEY,"
+            " long_url TEXT NOT NULL,"
+            " created_at REAL NOT NULL,"
+            " expires_at REAL NOT NULL,"
+            " clicks INTEGER NOT NULL DEFAULT 0"
+            ") WITHOUT ROWID"
+        )
+        # The expiry sweeper walks this index from the oldest deadline
+        conn.execute("CREATE INDEX IF NOT EXISTS links_expires_at ON links (expires_at)")
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS click_buckets ("
+            " short_code TEXT NOT NULL,"
+            " granularity TEXT NOT NULL,"
+            " slot INTEGER NOT NULL,"
+            " period INTEGER NOT NULL,"
+            " clicks INTEGER NOT NULL,"
+            " PRIMARY KEY (short_code, granularity, slot)"
+            ") WITHOUT ROWID"
+        )
+        # Shared ID counter for the short-code allocator
+        conn.execute("CREATE TABLE IF NOT EXISTS id_counter (name TEXT PRIMARY KEY, next_id INTEGER NOT NULL)")
+        conn.execute("INSERT OR IGNORE INTO id_counter (name, next_id) VALUES ('links', 0)")
+        conn.execute("CREATE TABLE IF NOT EXISTS settings (name TEXT PRIMARY KEY, value TEXT NOT NULL)")
+        return conn
+
+    def get(self, short_code: str) -> Optional[Link]:
+        row = self.conn.execute(
+            "SELECT long_url, created_at, expires_at, clicks FROM links WHERE short_code = ?", (short_code,)
+        ).fetchone()
+        return Link(*row) if row else None
+
+    def create(self, short_code: str, long_url: str, created_at: float, expires_at: float) -> bool:
+        # INSERT OR IGNORE is atomic, so two workers can never both claim the same code
+        cursor = self.conn.execute(
+            "INSERT OR IGNORE INTO links (short_code, long_url, created_at, expires_at) VALUES (?, ?, ?, ?)",
+            (short_code, long_url, created_at, expires_at),
+        )
+        return cursor.rowcount == 1
+
+    def delete(self, short_code: str) -> None:
+        # Link first: a flush running in between no longer finds it and adds no buckets
+        self.conn.execute("DELETE FROM links WHERE short_code = ?", (short_code,))
+        self.conn.execute("DELETE FROM click_buckets WHERE short_code = ?", (short_code,))
+
+    def expire(self, short_code: str, now: float) -> bool:
+        # Conditional, so a link another worker re-created under the code survives
+        cursor = self.conn.execute("DELETE FROM links WHERE short_code = ? AND expires_at <= ?", (short_code, now))
+        if cursor.rowcount == 1:
+            self.conn.execute("DELETE FROM click_buckets WHERE short_code = ?", (short_code,))
+            return True
+        return self.conn.execute("SELECT 1 FROM links WHERE short_code = ?", (short_code,)).fetchone() is None
+
+    def add_clicks(self, short_code: str, clicks: int = 1) -> None:
+        self.conn.execute("UPDATE links SET clicks = clicks + ? WHERE short_code = ?", (clicks, short_code))
+
+    def add_clicks_many(self, deltas: Dict[str, int], buckets: Optional[BucketDeltas] = None) -> None:
+        # Called from a flush thread: use a separate connection so the batch
+        # transaction never mixes with statements of the request path
+        conn = self._connect()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            conn.executemany(
+                "UPDATE links SET clicks = clicks + ? WHERE short_code = ?",
+                ((clicks, short_code) for short_code, clicks in deltas.items()),
+            )
+            # Same bucket: add. Newer bucket in the slot: replace. Older: already out of the ring.
+            conn.executemany(
+                "INSERT INTO click_buckets (short_code, granularity, slot, period, clicks)"
+                " SELECT ?, ?, ?, ?, ? WHERE EXISTS (SELECT 1 FROM links WHERE short_code = ?)"
+                " ON CONFLICT (short_code, granularity, slot) DO UPDATE SET"
+                "  clicks = CASE WHEN period = excluded.period THEN clicks + excluded.clicks"
+                "                WHEN period < excluded.period THEN excluded.clicks ELSE clicks END,"
+                "  period = MAX(period, excluded.period)",
+                (
+                    (short_code, granularity, period % self.stats_sizes[granularity], period, clicks, short_code)
+                    for short_code, link_buckets in (buckets or {}).items()
+                    for (granularity, period), clicks in link_buckets.items()
+                ),
+            )
+            conn.execute("COMMIT")
+        finally:
+            conn.close()
+
+    def click_series(
+        self, short_code: str, granularity: str, start: float, end: float, now: float
+    ) -> List[Tuple[int, int]]:
+        periods = bucket_periods(granularity, self.stats_sizes[granularity], start, end, now)
+        if not periods:
+            return []
+        counts = dict(self.conn.execute(
+            "SELECT period, clicks FROM click_buckets"
+            " WHERE short_code = ? AND granularity = ? AND period BETWEEN ? AND ?",
+            (short_code, granularity, periods[0], periods[-1]),
+        ).fetchall())
+        seconds = GRANULARITY_SECONDS[granularity]
+        return [(p * seconds, counts.get(p, 0)) for p in periods]
+
+    def stats_retention(self, granularity: str) -> int:
+        return GRANULARITY_SECONDS[granularity] * self.stats_sizes[granularity]
+
+    def delete_expired(self, now: float, limit: int) -> List[str]:
+        # Called from the sweeper thread, so it gets its own connection like
+        # add_clicks_many(). DELETE ... RETURNING is a single statement, so when
+        # every worker sweeps, each expired link is still deleted exactly once.
+        conn = self._connect()
+        try:
+            rows = conn.execute(
+                "DELETE FROM links WHERE short_code IN ("
+                " SELECT short_code FROM links WHERE expires_at <= ? ORDER BY expires_at LIMIT ?"
+                ") RETURNING short_code",
+                (now, limit),
+            ).fetchall()
+            conn.executemany("DELETE FROM click_buckets WHERE short_code = ?", rows)
+        finally:
+            conn.close()
+        return [short_code for (short_code,) in rows]
+
+    async def sweep_expired(self, now: float, limit: int) -> List[str]:
+        return await asyncio.to_thread(self.delete_expired, now, limit)
+
+    def lease_ids(self, count: int) -> int:
+        # One atomic UPDATE, so concurrent workers always get disjoint ranges
+        (end,) = self.conn.execute(
+            "UPDATE id_counter SET next_id = next_id + ? WHERE name = 'links' RETURNING next_id", (count,)
+        ).fetchone()
+        return end - count
+
+    def code_key(self) -> str:
+        # The first worker to get here stores its key; everyone then reads the same one
+        self.conn.execute(
+            "INSERT OR IGNORE INTO settings (name, value) VALUES ('code_key', ?)", (secrets.token_urlsafe(32),)
+        )
+        (key,) = self.conn.execute("SELECT value FROM settings WHERE name = 'code_key'").fetchone()
+        return key
+
+    def close(self) -> None:
+        if self._conn is not None and self._pid == os.getpid():
+            self._conn.close()
+        self._conn = None
+
+
+# --- Read Cache ---
+class CachedLinkStore(LinkStore):
+    """
+    Bounded LRU of (long_url, created_at, expires_at) in front of another
+    store, for the redirect hot path: a cache hit never touches the backend.
+    Only those fields are cached because they never change after creation;
+    the click count is always read from the backend. A link another worker
+    deleted may still be served from here until it expires, so callers check
+    expires_at themselves; expire() then re-checks against the backend, since
+    the code may have been re-created meanwhile.
+    """
+
+    def __init__(self, backend: LinkStore, max_entries: int = 100_000) -> None:
+        self.backend = backend
+        self.max_entries = max_entries
+        self._cache: "OrderedDict[str, Link]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get_for_redirect(self, short_code: str) -> Optional[Link]:
+        """Like get(), but may return a cached copy whose `clicks` is out of date."""
+        link = self._cache.get(short_code)
+        if link is not None:
+            self._cache.move_to_end(short_code)
+            self.hits += 1
+            return link
+        self.misses += 1
+        link = self.backend.get(short_code)
+        if link is not None:
+            self._remember(short_code, link)
+        return link
+
+    def _remember(self, short_code: str, link: Link) -> None:
+        self._cache[short_code] = link
+        self._cache.move_to_end(short_code)
+        if len(self._cache) > self.max_entries:
+            self._cache.popitem(last=False)
+
+    def get(self, short_code: str) -> Optional[Link]:
+        return self.backend.get(short_code)
+
+    def create(self, short_code: str, long_url: str, created_at: float, expires_at: float) -> bool:
+        created = self.backend.create(short_code, long_url, created_at, expires_at)
+        if created:
+            self._remember(short_code, Link(long_url, created_at, expires_at))
+        return created
+
+    def delete(self, short_code: str) -> None:
+        self._cache.pop(short_code, None)
+        self.backend.delete(short_code)
+
+    def expire(self, short_code: str, now: float) -> bool:
+        # The cached copy may be stale either way: drop it, the backend decides
+        self._cache.pop(short_code, None)
+        return self.backend.expire(short_code, now)
+
+    def add_clicks(self, short_code: str, clicks: int = 1) -> None:
+        self.backend.add_clicks(short_code, clicks)
+
+    def add_clicks_many(self, deltas: Dict[str, int], buckets: Optional[BucketDeltas] = None) -> None:
+        self.backend.add_clicks_many(deltas, buckets)
+
+    def click_series(
+        self, short_code: str, granularity: str, start: float, end: float, now: float
+    ) -> List[Tuple[int, int]]:
+        return self.backend.click_series(short_code, granularity, start, end, now)
+
+    def stats_retention(self, granularity: str) -> int:
+        return self.backend.stats_retention(granularity)
+
+    def delete_expired(self, now: float, limit: int) -> List[str]:
+        expired = self.backend.delete_expired(now, limit)
+        self._evict(expired)
+        return expired
+
+    async def sweep_expired(self, now: float, limit: int) -> List[str]:
+        expired = await self.backend.sweep_expired(now, limit)
+        self._evict(expired)  # Back on the event loop, so no other thread touches the LRU
+        return expired
+
+    def _evict(self, short_codes: List[str]) -> None:
+        for short_code in short_codes:
+            self._cache.pop(short_code, None)
+
+    def lease_ids(self, count: int) -> int:
+        return self.backend.lease_ids(count)
+
+    def code_key(self) -> str:
+        return self.backend.code_key()
+
+    def close(self) -> None:
+        self.backend.close()
+
+
+def create_link_store(
+    kind: str, db_path: str, cache_size: int, stats_sizes: Optional[Dict[str, int]] = None
+) -> LinkStore:
+    if kind == "memory":
+        backend: LinkStore = MemoryLinkStore(stats_sizes)
+    elif kind == "sqlite":
+        backend = SQLiteLinkStore(db_path, stats_sizes)
+    else:
+        raise ValueError(f"Unknown storage backend: {kind}")
+    return CachedLinkStore(backend, max_entries=cache_size) if cache_size > 0 else backend
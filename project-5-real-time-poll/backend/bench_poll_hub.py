@@ -0,0 +1,100 @@
+"""
+Рассылка результатов через PollHub против опроса сервера раз в 3 секунды.
+
+    python bench_poll_hub.py [--subscribers N] [--votes-per-second N] [--seconds S]
+
+N подписчиков одного опроса читают поток PollHub.subscribe() в этом же
+процессе (без сети), пока голоса идут с заданной частотой. Считаются
+рассылки, доставленные сообщения и время, за которое одна рассылка доходит
+до всех подписчиков. Для сравнения меряется стоимость одного
+GET /api/poll/{id} через приложение и пересчитывается на N / 3 запросов в
+секунду, которые давал бы setInterval(fetchPollData, 3000).
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+import httpx
+
+
+async def run_hub(main, subscribers: int, votes_per_second: int, seconds: float) -> None:
+    hub = main.poll_hub
+    poll = main.poll_store.polls["default"]
+    received = 0
+    last_received = {}
+
+    async def subscriber() -> None:
+        nonlocal received
+        async for message in hub.subscribe("default"):
+            received += 1
+            last_received[hub.publishes] = time.perf_counter()
+
+    tasks = [asyncio.create_task(subscriber()) for _ in range(subscribers)]
+    await asyncio.sleep(0.5)  # Все подписались и получили начальное состояние
+    received = 0
+
+    publish_times = {}
+    original_publish = hub._publish
+
+    def timed_publish(poll_id, channel):
+        original_publish(poll_id, channel)
+        publish_times[hub.publishes] = time.perf_counter()
+
+    hub._publish = timed_publish
+    started = time.perf_counter()
+    cpu_started = time.process_time()
+    votes = 0
+    while time.perf_counter() - started < seconds:
+        poll["options"]["fastapi"]["votes"] += 1
+        hub.notify("default")
+        votes += 1
+        await asyncio.sleep(1 / votes_per_second)
+    await asyncio.sleep(hub.interval * 2)
+    cpu = time.process_time() - cpu_started
+    for task in tasks:
+        task.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
+
+    fanout_ms = [(last_received[n] - publish_times[n]) * 1000 for n in publish_times if n in last_received]
+    print(f"PollHub: {subscribers:,} subscribers, {votes:,} votes in {seconds:g}s")
+    print(f"  {len(publish_times)} publishes ({len(publish_times) / seconds:.1f}/s), {received:,} messages delivered")
+    print(f"  fan-out to all subscribers: p50 {statistics.median(fanout_ms):.1f}ms  max {max(fanout_ms):.1f}ms")
+    print(f"  CPU {cpu:.2f}s for {seconds:g}s ({cpu / seconds:.0%} of one core, votes included)")
+
+
+async def run_polling(main, subscribers: int) -> None:
+    transport = httpx.ASGITransport(app=main.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://app") as client:
+        requests = 2000
+        cpu_started = time.process_time()
+        for _ in range(requests):
+            await client.get("/api/poll/default")
+        per_request = (time.process_time() - cpu_started) / requests
+    rate = subscribers / 3
+    print(f"polling every 3s: {rate:,.0f} GET/s x {per_request * 1000:.2f}ms CPU = "
+          f"{rate * per_request:.1f} cores (in-process, before any network cost)")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--subscribers", type=int, default=20_000)
+    parser.add_argument("--votes-per-second", type=int, default=500)
+    parser.add_argument("--seconds", type=float, default=10.0)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        os.environ["POLLS_DATA_FILE"] = os.path.join(tmp, "polls.json")
+        os.environ["POLLS_LOG_DIR"] = os.path.join(tmp, "polls_log")
+        sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+        import main as app_main
+
+        asyncio.run(run_hub(app_main, args.subscribers, args.votes_per_second, args.seconds))
+        asyncio.run(run_polling(app_main, args.subscribers))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+"""
+Список опросов: старый GET /api/polls (все опросы со всеми вариантами) против
+страницы кратких сведений по курсору.
+
+    python bench_poll_listing.py [--polls N] [--limit N]
+
+Опросы создаются в хранилище "log" во временном каталоге, голоса
+распределены неравномерно. Старый ответ меряется через модель, как он был
+(Dict[str, PollResponse]), новый — через приложение (httpx ASGITransport).
+Отдельно меряется, сколько стоит голосу поддержка индекса популярности.
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+from typing import Dict
+
+import httpx
+from pydantic import BaseModel
+
+from bench_vote_log import make_polls
+
+
+def timed(fn, repeat: int) -> float:
+    times = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - started)
+    return statistics.median(times) * 1000
+
+
+async def bench_pages(main, limit: int) -> None:
+    transport = httpx.ASGITransport(app=main.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://app") as client:
+        for sort in ("recent", "popular"):
+            latencies = []
+            cursor = None
+            size = 0
+            for _ in range(200):
+                params = {"sort": sort, "limit": limit, **({"cursor": cursor} if cursor else {})}
+                started = time.perf_counter()
+                response = await client.get("/api/polls", params=params)
+                latencies.append((time.perf_counter() - started) * 1000)
+                size = len(response.content)
+                cursor = response.json()["next_cursor"]
+            print(f"GET /api/polls?sort={sort}&limit={limit}: p50 {statistics.median(latencies):.2f}ms, "
+                  f"{size / 1024:.1f} KiB per page")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--polls", type=int, default=100_000)
+    parser.add_argument("--limit", type=int, default=20)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        os.environ["POLLS_STORAGE"] = "log"
+        os.environ["POLLS_DATA_FILE"] = os.path.join(tmp, "polls.json")
+        os.environ["POLLS_LOG_DIR"] = os.path.join(tmp, "polls_log")
+        sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+        import main as app_main
+        from poll_index import PollIndex
+
+        polls = make_polls(args.polls)
+        for i, poll in enumerate(polls.values()):
+            poll["created_at"] = f"2025-01-01T00:00:00.{i:06d}"
+            poll["options"]["option_0"]["votes"] = int(random.paretovariate(1.2))
+        store = app_main.poll_store
+        store.polls.update(polls)
+        started = time.perf_counter()
+        store.index = PollIndex(store.polls.values())
+        print(f"{args.polls:,} polls, index built in {(time.perf_counter() - started) * 1000:.0f}ms")
+
+        # Старый ответ: весь словарь через Dict[str, PollResponse]
+        class OldPollsListResponse(BaseModel):
+            polls: Dict[str, app_main.PollResponse]
+
+        def old_listing() -> bytes:
+            return json.dumps(OldPollsListResponse(polls=store.polls).model_dump()).encode()
+
+        old_ms = timed(old_listing, 5)
+        print(f"old GET /api/polls: {old_ms:.0f}ms, {len(old_listing()) / 1024 / 1024:.1f} MiB per response")
+
+        asyncio.run(bench_pages(app_main, args.limit))
+
+        poll_ids = list(store.polls)
+        votes = 100_000
+        started = time.perf_counter()
+        for _ in range(votes):
+            store.index.vote(random.choice(poll_ids))
+        per_vote = (time.perf_counter() - started) / votes
+        print(f"index upkeep per vote: {per_vote * 1e6:.1f}µs")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,138 @@
+"""
+Пропускная способность голосования с общим SQLite-хранилищем при 1/4/8
+воркерах uvicorn и проверка, что ни один голос не потерян.
+
+    python bench_vote_counters.py [--workers 1 4 8] [--clients N] [--connections N] [--seconds S] [--polls N]
+
+Сервер запускается с POLLS_STORAGE=sqlite на свежей базе. Клиенты — отдельные
+процессы, каждый держит несколько keep-alive соединений и голосует в
+случайных опросах. После прогона сумма голосов в базе
+сравнивается с числом успешных ответов. Для сравнения тот же прогон делается
+с хранилищем "log" (память + журнал) при нескольких воркерах: там каждый
+процесс считает свои голоса, и GET разных воркеров показывает разные итоги.
+"""
+import argparse
+import asyncio
+import multiprocessing
+import os
+import random
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import time
+
+import httpx
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+PORT = 8792
+
+
+def client(poll_ids: list, seconds: float, connections: int, results) -> None:
+    rng = random.Random(os.getpid())
+    ok = failed = 0
+
+    async def connection(http: httpx.AsyncClient, deadline: float) -> None:
+        nonlocal ok, failed
+        while time.monotonic() < deadline:
+            response = await http.post(f"/api/poll/vote/{rng.choice(poll_ids)}/option_{rng.randrange(4)}")
+            if response.status_code == 200:
+                ok += 1
+            else:
+                failed += 1
+
+    async def run() -> None:
+        limits = httpx.Limits(max_connections=connections)
+        async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{PORT}", limits=limits) as http:
+            deadline = time.monotonic() + seconds
+            await asyncio.gather(*(connection(http, deadline) for _ in range(connections)))
+
+    asyncio.run(run())
+    results.put((ok, failed))
+
+
+def start_server(workers: int, env: dict) -> subprocess.Popen:
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--port", str(PORT), "--workers", str(workers),
+         "--log-level", "warning", "--no-access-log"],
+        cwd=HERE, env=env,
+    )
+    deadline = time.monotonic() + 60
+    while True:
+        try:
+            httpx.get(f"http://127.0.0.1:{PORT}/api/poll/default", timeout=1)
+            return server
+        except httpx.TransportError:
+            if time.monotonic() > deadline:
+                server.terminate()
+                raise
+            time.sleep(0.2)
+
+
+def run(storage: str, workers: int, clients: int, connections: int, seconds: float, polls: int) -> None:
+    with tempfile.TemporaryDirectory() as tmp:
+        env = dict(
+            os.environ,
+            POLLS_STORAGE=storage,
+            POLLS_DB_PATH=os.path.join(tmp, "polls.db"),
+            POLLS_DATA_FILE=os.path.join(tmp, "polls.json"),
+            POLLS_LOG_DIR=os.path.join(tmp, "polls_log"),
+        )
+        server = start_server(workers, env)
+        try:
+            with httpx.Client(base_url=f"http://127.0.0.1:{PORT}") as http:
+                poll_ids = [
+                    http.post("/api/poll/create", json={"question": f"Q{i}", "options": ["a", "b", "c", "d"]}).json()["id"]
+                    for i in range(polls)
+                ]
+            results = multiprocessing.Queue()
+            procs = [multiprocessing.Process(target=client, args=(poll_ids, seconds, connections, results)) for _ in range(clients)]
+            for p in procs:
+                p.start()
+            totals = [results.get() for _ in procs]
+            for p in procs:
+                p.join()
+            ok = sum(o for o, _ in totals)
+            failed = sum(f for _, f in totals)
+
+            if storage == "sqlite":
+                (stored,) = sqlite3.connect(env["POLLS_DB_PATH"]).execute(
+                    "SELECT SUM(votes) FROM poll_options WHERE poll_id != 'default'"
+                ).fetchone()
+                check = f"{stored:,} votes stored"
+            else:
+                # Разные соединения попадают на разные воркеры; опрос, созданный
+                # в одном воркере, в остальных вообще не существует (404)
+                seen = set()
+                for _ in range(20):
+                    with httpx.Client(base_url=f"http://127.0.0.1:{PORT}") as http:
+                        response = http.get(f"/api/poll/{poll_ids[0]}")
+                    if response.status_code == 404:
+                        seen.add("404")
+                    else:
+                        seen.add(str(sum(option["votes"] for option in response.json()["options"].values())))
+                check = f"poll 0 as seen by different connections: {', '.join(sorted(seen))}"
+        finally:
+            server.terminate()
+            server.wait()
+    print(f"{storage:<6} {workers} worker(s): {ok / seconds:7,.0f} votes/s  ({ok:,} ok, {failed} failed; {check})")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 4, 8])
+    parser.add_argument("--clients", type=int, default=4)
+    parser.add_argument("--connections", type=int, default=16, help="keep-alive connections per client process")
+    parser.add_argument("--seconds", type=float, default=10.0)
+    parser.add_argument("--polls", type=int, default=100)
+    args = parser.parse_args()
+
+    print(f"{args.clients} client processes x {args.connections} connections, "
+          f"{args.seconds:g}s per run, {os.cpu_count()} CPUs")
+    for workers in args.workers:
+        run("sqlite", workers, args.clients, args.connections, args.seconds, args.polls)
+    run("log", max(args.workers), args.clients, args.connections, args.seconds, args.polls)
+
+
+if __name__ == "__main__":
+    main()
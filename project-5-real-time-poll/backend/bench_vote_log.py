@@ -0,0 +1,97 @@
+"""
+Голосов в секунду при 10k опросах: старый способ (перезапись всего
+polls.json на каждый голос) против журнала голосов с group commit.
+
+    python bench_vote_log.py [--polls N] [--votes N]
+
+Журнал меряется через приложение (httpx ASGITransport) с одним клиентом и
+с 64 параллельными. Данные пишутся во временный каталог.
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+
+import httpx
+
+
+def make_polls(count: int) -> dict:
+    return {
+        f"poll-{i}": {
+            "id": f"poll-{i}",
+            "question": f"Вопрос номер {i}?",
+            "options": {f"option_{k}": {"label": f"Вариант {k}", "votes": 0} for k in range(4)},
+            "created_at": "2025-01-01T00:00:00",
+        }
+        for i in range(count)
+    }
+
+
+def bench_rewrite(polls: dict, votes: int, path: str) -> None:
+    data = {"polls": polls}
+    started = time.perf_counter()
+    for _ in range(votes):
+        poll = polls[f"poll-{random.randrange(len(polls))}"]
+        poll["options"]["option_0"]["votes"] += 1
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(data, f, ensure_ascii=False, indent=2)
+    elapsed = time.perf_counter() - started
+    print(f"rewrite polls.json:   {votes / elapsed:8,.0f} votes/s  ({elapsed / votes * 1000:.1f}ms per vote)")
+
+
+async def bench_log(main, poll_count: int, votes: int, concurrency: int) -> None:
+    latencies = []
+    transport = httpx.ASGITransport(app=main.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://app") as client:
+        remaining = votes
+
+        async def worker() -> None:
+            nonlocal remaining
+            while remaining > 0:
+                remaining -= 1
+                poll_id = f"poll-{random.randrange(poll_count)}"
+                start = time.perf_counter()
+                response = await client.post(f"/api/poll/vote/{poll_id}/option_{random.randrange(4)}")
+                latencies.append((time.perf_counter() - start) * 1000)
+                assert response.status_code == 200
+
+        started = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        elapsed = time.perf_counter() - started
+    latencies.sort()
+    print(f"vote log, {concurrency:2} clients: {votes / elapsed:8,.0f} votes/s  "
+          f"p50 {statistics.median(latencies):.2f}ms  p99 {latencies[int(len(latencies) * 0.99) - 1]:.2f}ms")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--polls", type=int, default=10_000)
+    parser.add_argument("--votes", type=int, default=5000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        os.environ["POLLS_DATA_FILE"] = os.path.join(tmp, "polls.json")
+        os.environ["POLLS_LOG_DIR"] = os.path.join(tmp, "polls_log")
+        print(f"{args.polls:,} polls")
+        bench_rewrite(make_polls(args.polls), min(args.votes, 200), os.path.join(tmp, "rewrite.json"))
+
+        sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+        import main as app_main
+
+        async def run() -> None:
+            async with app_main.lifespan(app_main.app):
+                # Через create(), чтобы опросы попали и в журнал, и в индекс списка
+                await asyncio.gather(*(app_main.poll_store.create(poll) for poll in make_polls(args.polls).values()))
+                for concurrency in (1, 64):
+                    await bench_log(app_main, args.polls, args.votes, concurrency)
+
+        asyncio.run(run())
+
+
+if __name__ == "__main__":
+    main()
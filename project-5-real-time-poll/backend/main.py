@@ -1,13 +1,28 @@
-from fastapi import FastAPI, HTTPException
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, HTTPException, Query, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, StreamingResponse
 from pydantic import BaseModel
-from typing import Dict, List
-import json
+from typing import Dict, List, Literal, Optional
 import os
 import uuid
 from datetime import datetime
 
-app = FastAPI()
+from poll_hub import PollHub
+from poll_index import cursor_key, decode_cursor, encode_cursor
+from poll_store import create_poll_store
+from vote_log import VoteLogError
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    poll_hub.start()
+    yield
+    await poll_hub.close()
+    await poll_store.close()
+
+
+app = FastAPI(lifespan=lifespan)
 
 # --- Настройка CORS ---
 origins = ["http://localhost:3000"]
@@ -19,49 +34,53 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# --- Файл для сохранения данных ---
-DATA_FILE = "polls.json"
+# --- Хранилище данных ---
+# "log" (по умолчанию): опросы в памяти, polls.json — снимок, polls_log/ — журнал
+#   изменений после него. Только для одного воркера.
+# "sqlite": polls.db в режиме WAL, общий для нескольких воркеров uvicorn.
+POLLS_STORAGE = os.getenv("POLLS_STORAGE", "log")
+DATA_FILE = os.getenv("POLLS_DATA_FILE", "polls.json")
+LOG_DIR = os.getenv("POLLS_LOG_DIR", "polls_log")
+SNAPSHOT_EVERY = int(os.getenv("POLLS_SNAPSHOT_EVERY", "100000"))
+DB_PATH = os.getenv("POLLS_DB_PATH", "polls.db")
 
 
 # --- Инициализация данных ---
-def load_polls_data():
-    """Загружает данные опросов из файла"""
-    if os.path.exists(DATA_FILE):
-        try:
-            with open(DATA_FILE, 'r', encoding='utf-8') as f:
-                return json.load(f)
-        except (json.JSONDecodeError, FileNotFoundError):
-            pass
-
-    # Возвращаем данные по умолчанию
+def default_polls():
+    """Опросы по умолчанию, если сохранённых данных ещё нет"""
     return {
-        "polls": {
-            "default": {
-                "id": "default",
-                "question": "Ваш любимый фреймворк для бэкенда?",
-                "options": {
-                    "fastapi": {"label": "FastAPI", "votes": 0},
-                    "django": {"label": "Django", "votes": 0},
-                    "flask": {"label": "Flask", "votes": 0},
-                    "nodejs": {"label": "Node.js (Express)", "votes": 0}
-                },
-                "created_at": datetime.now().isoformat()
-            }
+        "default": {
+            "id": "default",
+            "question": "Ваш любимый фреймворк для бэкенда?",
+            "options": {
+                "fastapi": {"label": "FastAPI", "votes": 0},
+                "django": {"label": "Django", "votes": 0},
+                "flask": {"label": "Flask", "votes": 0},
+                "nodejs": {"label": "Node.js (Express)", "votes": 0}
+            },
+            "created_at": datetime.now().isoformat()
         }
     }
 
 
-def save_polls_data():
-    """Сохраняет данные опросов в файл"""
-    try:
-        with open(DATA_FILE, 'w', encoding='utf-8') as f:
-            json.dump(polls_data, f, ensure_ascii=False, indent=2)
-    except Exception as e:
-        print(f"Ошибка при сохранении данных: {e}")
+# Загружаем данные при старте
+poll_store = create_poll_store(POLLS_STORAGE, default_polls, DATA_FILE, LOG_DIR, SNAPSHOT_EVERY, DB_PATH)
+
+# Живые результаты: не больше POLLS_PUSH_RATE рассылок в секунду на опрос.
+# С SQLite голоса приходят и через другие воркеры, поэтому хаб ещё и сам
+# проверяет опросы с подписчиками
+PUSH_RATE = float(os.getenv("POLLS_PUSH_RATE", "2"))
+poll_hub = PollHub(
+    get_poll=poll_store.get,
+    max_rate=PUSH_RATE,
+    watch_interval=1.0 / PUSH_RATE if POLLS_STORAGE == "sqlite" else None,
+)
 
 
-# Загружаем данные при старте
-polls_data = load_polls_data()
+@app.exception_handler(VoteLogError)
+async def vote_log_error_handler(request: Request, exc: VoteLogError):
+    # Журнал остановился после неудачной записи: изменения не принимаются до перезапуска
+    return JSONResponse(status_code=503, content={"detail": "Poll storage is unavailable"})
 
 
 # --- Pydantic модели ---
@@ -82,24 +101,65 @@ class CreatePollRequest(BaseModel):
     options: List[str]
 
 
+class PollSummary(BaseModel):
+    id: str
+    question: str
+    total_votes: int
+    created_at: str
+
+
 class PollsListResponse(BaseModel):
-    polls: Dict[str, PollResponse]
+    polls: List[PollSummary]
+    next_cursor: Optional[str] = None
 
 
 # --- Эндпоинты API ---
 
 @app.get("/api/polls", response_model=PollsListResponse)
-async def get_all_polls():
-    """Возвращает все опросы"""
-    return {"polls": polls_data["polls"]}
+async def get_all_polls(
+    sort: Literal["recent", "popular"] = "recent",
+    limit: int = Query(20, ge=1, le=100),
+    cursor: Optional[str] = None,
+):
+    """
+    Список опросов по страницам: только id, вопрос, сумма голосов и дата.
+    Следующая страница — тот же запрос с cursor=next_cursor из ответа.
+    """
+    after = None
+    if cursor:
+        try:
+            after = decode_cursor(sort, cursor)
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Invalid cursor")
+
+    # Берём на один опрос больше, чтобы узнать, есть ли следующая страница
+    summaries = poll_store.summaries(sort, limit + 1, after)
+    next_cursor = None
+    if len(summaries) > limit:
+        summaries = summaries[:limit]
+        next_cursor = encode_cursor(cursor_key(sort, summaries[-1]))
+    return {"polls": summaries, "next_cursor": next_cursor}
 
 
 @app.get("/api/poll/{poll_id}", response_model=PollResponse)
 async def get_poll_data(poll_id: str = "default"):
     """Возвращает данные конкретного опроса"""
-    if poll_id not in polls_data["polls"]:
+    poll = poll_store.get(poll_id)
+    if poll is None:
         raise HTTPException(status_code=404, detail="Poll not found")
-    return polls_data["polls"][poll_id]
+    return poll
+
+
+@app.get("/api/poll/{poll_id}/events")
+async def subscribe_poll(poll_id: str):
+    """Server-Sent Events: текущие результаты опроса, затем обновления по мере голосования"""
+    if poll_store.get(poll_id) is None:
+        raise HTTPException(status_code=404, detail="Poll not found")
+    return StreamingResponse(
+        poll_hub.subscribe(poll_id),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
 
 
 @app.post("/api/poll/create", response_model=PollResponse)
@@ -122,8 +182,7 @@ async def create_poll(poll_request: CreatePollRequest):
         "created_at": datetime.now().isoformat()
     }
 
-    polls_data["polls"][poll_id] = new_poll
-    save_polls_data()
+    await poll_store.create(new_poll)
 
     return new_poll
 
@@ -131,16 +190,14 @@ async def create_poll(poll_request: CreatePollRequest):
 @app.post("/api/poll/vote/{poll_id}/{option_key}", response_model=PollResponse)
 async def cast_vote(poll_id: str, option_key: str):
     """Принимает голос за один из вариантов в конкретном опросе"""
-    if poll_id not in polls_data["polls"]:
-        raise HTTPException(status_code=404, detail="Poll not found")
-
-    poll = polls_data["polls"][poll_id]
-    if option_key not in poll["options"]:
+    poll = await poll_store.vote(poll_id, option_key)
+    if poll is None:
+        # Голос не засчитан: выясняем, чего именно нет
+        if poll_store.get(poll_id) is None:
+            raise HTTPException(status_code=404, detail="Poll not found")
         raise HTTPException(status_code=404, detail="Option not found")
 
-    poll["options"][option_key]["votes"] += 1
-    save_polls_data()
-
+    poll_hub.notify(poll_id)
     return poll
 
 
@@ -0,0 +1,130 @@
+import asyncio
+import json
+import time
+from typing import AsyncIterator, Callable, Dict, Optional
+
+
+class PollChannel:
+    """Подписчики одного опроса и последнее разосланное состояние"""
+
+    def __init__(self) -> None:
+        self.subscribers = 0
+        self.version = 0
+        self.payload = b""
+        self.last_publish = 0.0
+        self.timer: Optional[asyncio.TimerHandle] = None
+        self.heartbeat_timer: Optional[asyncio.TimerHandle] = None
+        # set() + clear() будит всех ждущих подписчиков разом
+        self.wakeup = asyncio.Event()
+
+
+# --- Хаб рассылки результатов опросов (Server-Sent Events) ---
+# Голос только помечает опрос как изменённый. Не чаще `max_rate` раз в секунду
+# на опрос хаб один раз сериализует текущие результаты в готовое SSE-сообщение
+# и будит всех подписчиков этого опроса. Каждый подписчик отправляет последнее
+# состояние, которое застал: если клиент медленный, промежуточные версии просто
+# пропускаются (coalescing), а очередь сообщений ни у кого не растёт.
+class PollHub:
+    def __init__(
+        self,
+        get_poll: Callable[[str], Optional[dict]],
+        max_rate: float = 2.0,
+        heartbeat: float = 15.0,
+        watch_interval: Optional[float] = None,
+    ) -> None:
+        self._get_poll = get_poll
+        self.interval = 1.0 / max_rate
+        self.heartbeat = heartbeat
+        # Голоса, принятые другими воркерами, notify() здесь не вызывают: при общем
+        # хранилище хаб раз в `watch_interval` сам проверяет опросы с подписчиками
+        self.watch_interval = watch_interval
+        self._channels: Dict[str, PollChannel] = {}
+        self._watch_task: Optional[asyncio.Task] = None
+        self.publishes = 0
+
+    def start(self) -> None:
+        if self.watch_interval is not None:
+            self._watch_task = asyncio.create_task(self._watch_loop())
+
+    async def _watch_loop(self) -> None:
+        while True:
+            await asyncio.sleep(self.watch_interval)
+            for poll_id, channel in list(self._channels.items()):
+                try:
+                    if channel.timer is None and self._encode(poll_id) != channel.payload:
+                        self.notify(poll_id)
+                except Exception as e:
+                    print(f"Ошибка при проверке опроса {poll_id}: {e}")
+
+    async def close(self) -> None:
+        if self._watch_task is not None:
+            self._watch_task.cancel()
+            try:
+                await self._watch_task
+            except asyncio.CancelledError:
+                pass
+            self._watch_task = None
+
+    def _encode(self, poll_id: str) -> bytes:
+        poll = self._get_poll(poll_id)
+        return b"data: " + json.dumps(poll, ensure_ascii=False).encode() + b"\n\n"
+
+    def notify(self, poll_id: str) -> None:
+        """Опрос изменился. Рассылка — сразу или по истечении интервала с прошлой"""
+        channel = self._channels.get(poll_id)
+        if channel is None or channel.timer is not None:
+            return  # Никто не подписан или рассылка уже запланирована
+        delay = max(0.0, channel.last_publish + self.interval - time.monotonic())
+        loop = asyncio.get_running_loop()
+        channel.timer = loop.call_later(delay, self._publish, poll_id, channel)
+
+    def _publish(self, poll_id: str, channel: PollChannel) -> None:
+        channel.timer = None
+        channel.last_publish = time.monotonic()
+        channel.payload = self._encode(poll_id)
+        channel.version += 1
+        channel.wakeup.set()
+        channel.wakeup.clear()
+        self.publishes += 1
+
+    def _heartbeat(self, channel: PollChannel) -> None:
+        # Подписчики, для которых версия не изменилась, отправят ping
+        channel.wakeup.set()
+        channel.wakeup.clear()
+        channel.heartbeat_timer = asyncio.get_running_loop().call_later(self.heartbeat, self._heartbeat, channel)
+
+    async def subscribe(self, poll_id: str) -> AsyncIterator[bytes]:
+        """Поток SSE-сообщений: сначала текущее состояние, потом обновления"""
+        channel = self._channels.get(poll_id)
+        if channel is None:
+            channel = self._channels[poll_id] = PollChannel()
+            channel.payload = self._encode(poll_id)
+            channel.heartbeat_timer = asyncio.get_running_loop().call_later(
+                self.heartbeat, self._heartbeat, channel
+            )
+        channel.subscribers += 1
+        try:
+            seen = channel.version
+            yield self._encode(poll_id)
+            while True:
+                if channel.version == seen:
+                    await channel.wakeup.wait()
+                if channel.version == seen:
+                    yield b": ping\n\n"  # Держим соединение живым через прокси
+                    continue
+                seen = channel.version
+                yield channel.payload
+        finally:
+            channel.subscribers -= 1
+            if channel.subscribers == 0 and self._channels.get(poll_id) is channel:
+                if channel.timer is not None:
+                    channel.timer.cancel()
+                channel.heartbeat_timer.cancel()
+                del self._channels[poll_id]
+
+    def stats(self) -> dict:
+        return {
+            "polls": len(self._channels),
+            "subscribers": sum(channel.subscribers for channel in self._channels.values()),
+            "publishes": self.publishes,
+        }
@@ -0,0 +1,98 @@
+import base64
+import json
+from bisect import bisect_left, bisect_right, insort
+from typing import Dict, Iterable, List, Optional, Tuple
+
+
+# --- Индекс опросов для постраничного списка ---
+# Два отсортированных списка ключей, которые обновляются по одному элементу:
+#   recent  — (created_at, id) по возрастанию, страница берётся с конца;
+#   popular — (-total_votes, id) по возрастанию, страница берётся с начала.
+# Голос передвигает один ключ в popular (bisect + сдвиг списка), поэтому
+# выдача страницы — это bisect по курсору и срез, без сортировки всех опросов.
+class PollIndex:
+    def __init__(self, polls: Iterable[dict] = ()) -> None:
+        self._polls: Dict[str, dict] = {}
+        self._totals: Dict[str, int] = {}
+        self._recent: List[Tuple[str, str]] = []
+        self._popular: List[Tuple[int, str]] = []
+        for poll in polls:
+            self._polls[poll["id"]] = poll
+            self._totals[poll["id"]] = sum(option["votes"] for option in poll["options"].values())
+        # Один раз при старте — полная сортировка, дальше только точечные вставки
+        self._recent = sorted((poll["created_at"], poll_id) for poll_id, poll in self._polls.items())
+        self._popular = sorted((-total, poll_id) for poll_id, total in self._totals.items())
+
+    def __len__(self) -> int:
+        return len(self._polls)
+
+    def add(self, poll: dict) -> None:
+        poll_id = poll["id"]
+        if poll_id in self._polls:
+            return
+        total = sum(option["votes"] for option in poll["options"].values())
+        self._polls[poll_id] = poll
+        self._totals[poll_id] = total
+        insort(self._recent, (poll["created_at"], poll_id))
+        insort(self._popular, (-total, poll_id))
+
+    def vote(self, poll_id: str) -> None:
+        """Ещё один голос в опросе: ключ переезжает на новое место в popular"""
+        total = self._totals[poll_id]
+        i = bisect_left(self._popular, (-total, poll_id))
+        del self._popular[i]
+        self._totals[poll_id] = total + 1
+        insort(self._popular, (-total - 1, poll_id))
+
+    def _summary(self, poll_id: str) -> dict:
+        poll = self._polls[poll_id]
+        return {
+            "id": poll_id,
+            "question": poll["question"],
+            "total_votes": self._totals[poll_id],
+            "created_at": poll["created_at"],
+        }
+
+    def page(self, sort: str, limit: int, after: Optional[tuple] = None) -> List[dict]:
+        """
+        Следующие `limit` опросов после курсора `after` — ключа последнего
+        опроса предыдущей страницы: (created_at, id) для recent,
+        (total_votes, id) для popular.
+        """
+        if sort == "recent":
+            end = len(self._recent) if after is None else bisect_left(self._recent, tuple(after))
+            keys = self._recent[max(0, end - limit):end]
+            return [self._summary(poll_id) for _, poll_id in reversed(keys)]
+        if sort == "popular":
+            start = 0 if after is None else bisect_right(self._popular, (-after[0], after[1]))
+            return [self._summary(poll_id) for _, poll_id in self._popular[start:start + limit]]
+        raise ValueError(f"Unknown sort: {sort}")
+
+
+# --- Курсор ---
+# Непрозрачная для клиента строка с ключом последнего опроса страницы.
+# В отличие от offset, курсор не сбивается, когда опросы создаются или
+# двигаются по популярности между запросами страниц.
+def cursor_key(sort: str, summary: dict) -> tuple:
+    if sort == "recent":
+        return (summary["created_at"], summary["id"])
+    return (summary["total_votes"], summary["id"])
+
+
+def encode_cursor(key: tuple) -> str:
+    return base64.urlsafe_b64encode(json.dumps(list(key)).encode()).decode().rstrip("=")
+
+
+def decode_cursor(sort: str, cursor: str) -> tuple:
+    """Ключ из курсора; ValueError, если строка испорчена или от другой сортировки"""
+    try:
+        key = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+    except (ValueError, TypeError) as e:
+        raise ValueError("Invalid cursor") from e
+    first_type = str if sort == "recent" else int
+    if (
+        not isinstance(key, list) or len(key) != 2
+        or type(key[0]) is not first_type or not isinstance(key[1], str)
+    ):
+        raise ValueError("Invalid cursor")
+    return tuple(key)
@@ -0,0 +1,280 @@
+import asyncio
+import os
+import sqlite3
+import threading
+from abc import ABC, abstractmethod
+from typing import Any, Callable, Dict, List, Optional
+
+from poll_index import PollIndex
+from vote_log import VoteLog
+
+Poll = Dict[str, Any]
+
+
+# --- Хранилища опросов ---
+class PollStore(ABC):
+    """Где живут опросы и счётчики голосов"""
+
+    @abstractmethod
+    def get(self, poll_id: str) -> Optional[Poll]:
+        ...
+
+    @abstractmethod
+    async def create(self, poll: Poll) -> None:
+        ...
+
+    @abstractmethod
+    async def vote(self, poll_id: str, option_key: str) -> Optional[Poll]:
+        """Засчитывает голос и возвращает опрос с новыми результатами (None, если варианта нет)"""
+
+    @abstractmethod
+    def summaries(self, sort: str, limit: int, after: Optional[tuple] = None) -> List[dict]:
+        """Страница кратких сведений об опросах (см. PollIndex.page)"""
+
+    async def close(self) -> None:
+        pass
+
+
+class LogPollStore(PollStore):
+    """
+    Опросы в памяти процесса + журнал голосов на диске (vote_log.py).
+    Быстро, но только для одного воркера: у каждого процесса своя копия.
+    """
+
+    def __init__(
+        self,
+        snapshot_path: str,
+        log_dir: str,
+        initial_polls: Callable[[], Dict[str, Poll]],
+        snapshot_every: int = 100_000,
+    ) -> None:
+        self.log = VoteLog(snapshot_path, log_dir, dump_state=self._copy_polls, snapshot_every=snapshot_every)
+        self.polls: Dict[str, Poll] = self.log.load(initial_polls)
+        self.index = PollIndex(self.polls.values())
+
+    def _copy_polls(self) -> Dict[str, Poll]:
+        """Копия опросов для снимка: дальше голоса меняют оригинал, пока копия пишется в фоне"""
+        return {
+            poll_id: {**poll, "options": {key: dict(option) for key, option in poll["options"].items()}}
+            for poll_id, poll in self.polls.items()
+        }
+
+    def get(self, poll_id: str) -> Optional[Poll]:
+        return self.polls.get(poll_id)
+
+    async def create(self, poll: Poll) -> None:
+        # Сначала журнал: изменение, которое он отклонил, не применяется и в памяти
+        self.log.append(["p", poll])
+        self.polls[poll["id"]] = poll
+        self.index.add(poll)
+        await self.log.commit()
+
+    async def vote(self, poll_id: str, option_key: str) -> Optional[Poll]:
+        poll = self.polls.get(poll_id)
+        if poll is None or option_key not in poll["options"]:
+            return None
+        # Дописываем одну строку в журнал вместо перезаписи всего polls.json
+        self.log.append(["v", poll_id, option_key])
+        poll["options"][option_key]["votes"] += 1
+        self.index.vote(poll_id)
+        await self.log.commit()
+        return poll
+
+    def summaries(self, sort: str, limit: int, after: Optional[tuple] = None) -> List[dict]:
+        return self.index.page(sort, limit, after)
+
+    async def close(self) -> None:
+        await self.log.close()  # Дописываем журнал и дожидаемся снимка
+
+
+class SQLitePollStore(PollStore):
+    """
+    SQLite в режиме WAL: один файл на все воркеры uvicorn. Голос — это
+    `UPDATE ... SET votes = votes + 1`, атомарный при любом числе процессов,
+    а опрос читается одним SELECT, поэтому результаты всегда согласованы.
+    Сумма голосов опроса хранится в polls.total_votes и обновляется в той же
+    транзакции, что и вариант: по ней и по created_at построены индексы для
+    постраничного списка. Соединение открывается в каждом процессе и потоке своё.
+    Запись (голос, новый опрос) идёт в потоке: BEGIN IMMEDIATE при конкуренции
+    воркеров ждёт блокировку до 10 с, и цикл событий со всеми SSE-потоками
+    воркера всё это время стоял бы.
+    """
+
+    def __init__(self, path: str, initial_polls: Callable[[], Dict[str, Poll]]) -> None:
+        self.path = path
+        self._local = threading.local()
+        self._conns: List[sqlite3.Connection] = []
+        self._conns_lock = threading.Lock()
+        self._pid = 0
+        self._initial_polls = initial_polls
+
+    @property
+    def conn(self) -> sqlite3.Connection:
+        # Соединение нельзя переносить через fork() и делить между потоками
+        # (транзакции перемешаются), поэтому своё в каждом воркере и потоке
+        if self._pid != os.getpid():
+            self._local = threading.local()
+            self._conns = []
+            self._pid = os.getpid()
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = self._local.conn = self._connect()
+            with self._conns_lock:
+                self._conns.append(conn)
+        return conn
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.path, isolation_level=None, check_same_thread=False, timeout=10)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS polls ("
+            " id TEXT PRIMARY KEY,"
+            " question TEXT NOT NULL,"
+            " created_at TEXT NOT NULL,"
+            " total_votes INTEGER NOT NULL DEFAULT 0"
+            ")"
+        )
+        columns = {row[1] for row in conn.execute("PRAGMA table_info(polls)")}
+        if "total_votes" not in columns:
+            # База, созданная до появления списка опросов: добавляем колонку и считаем суммы
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                if "total_votes" not in {row[1] for row in conn.execute("PRAGMA table_info(polls)")}:
+                    conn.execute("ALTER TABLE polls ADD COLUMN total_votes INTEGER NOT NULL DEFAULT 0")
+                    conn.execute(
+                        "UPDATE polls SET total_votes ="
+                        " (SELECT COALESCE(SUM(votes), 0) FROM poll_options WHERE poll_id = polls.id)"
+                    )
+                conn.execute("COMMIT")
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+        conn.execute("CREATE INDEX IF NOT EXISTS polls_recent ON polls (created_at, id)")
+        conn.execute("CREATE INDEX IF NOT EXISTS polls_popular ON polls (total_votes DESC, id)")
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS poll_options ("
+            " poll_id TEXT NOT NULL,"
+            " option_key TEXT NOT NULL,"
+            " position INTEGER NOT NULL,"
+            " label TEXT NOT NULL,"
+            " votes INTEGER NOT NULL DEFAULT 0,"
+            " PRIMARY KEY (poll_id, option_key)"
+            ") WITHOUT ROWID"
+        )
+        if conn.execute("SELECT 1 FROM polls LIMIT 1").fetchone() is None:
+            for poll in self._initial_polls().values():
+                self._insert(conn, poll)
+        return conn
+
+    @staticmethod
+    def _insert(conn: sqlite3.Connection, poll: Poll) -> None:
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            # OR IGNORE: два воркера могут одновременно засеять пустую базу
+            conn.execute(
+                "INSERT OR IGNORE INTO polls (id, question, created_at, total_votes) VALUES (?, ?, ?, ?)",
+                (
+                    poll["id"],
+                    poll["question"],
+                    poll["created_at"],
+                    sum(option.get("votes", 0) for option in poll["options"].values()),
+                ),
+            )
+            conn.executemany(
+                "INSERT OR IGNORE INTO poll_options (poll_id, option_key, position, label, votes) VALUES (?, ?, ?, ?, ?)",
+                [
+                    (poll["id"], key, position, option["label"], option.get("votes", 0))
+                    for position, (key, option) in enumerate(poll["options"].items())
+                ],
+            )
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+
+    @staticmethod
+    def _assemble(rows) -> Dict[str, Poll]:
+        polls: Dict[str, Poll] = {}
+        for poll_id, question, created_at, key, label, votes in rows:
+            poll = polls.get(poll_id)
+            if poll is None:
+                poll = polls[poll_id] = {"id": poll_id, "question": question, "options": {}, "created_at": created_at}
+            poll["options"][key] = {"label": label, "votes": votes}
+        return polls
+
+    _SELECT = (
+        "SELECT p.id, p.question, p.created_at, o.option_key, o.label, o.votes"
+        " FROM polls p JOIN poll_options o ON o.poll_id = p.id"
+    )
+
+    def get(self, poll_id: str) -> Optional[Poll]:
+        rows = self.conn.execute(self._SELECT + " WHERE p.id = ? ORDER BY o.position", (poll_id,)).fetchall()
+        return self._assemble(rows).get(poll_id)
+
+    async def create(self, poll: Poll) -> None:
+        # self.conn берётся уже в потоке: там своё соединение
+        await asyncio.to_thread(lambda: self._insert(self.conn, poll))
+
+    async def vote(self, poll_id: str, option_key: str) -> Optional[Poll]:
+        return await asyncio.to_thread(self._vote, poll_id, option_key)
+
+    def _vote(self, poll_id: str, option_key: str) -> Optional[Poll]:
+        conn = self.conn
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            cursor = conn.execute(
+                "UPDATE poll_options SET votes = votes + 1 WHERE poll_id = ? AND option_key = ?", (poll_id, option_key)
+            )
+            if cursor.rowcount:
+                conn.execute("UPDATE polls SET total_votes = total_votes + 1 WHERE id = ?", (poll_id,))
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        if cursor.rowcount == 0:
+            return None
+        return self.get(poll_id)
+
+    def summaries(self, sort: str, limit: int, after: Optional[tuple] = None) -> List[dict]:
+        # Keyset-пагинация: SQLite идёт по индексу от курсора и читает только limit строк
+        if sort == "recent":
+            where, params = ("WHERE (created_at, id) < (?, ?)", tuple(after)) if after else ("", ())
+            order = "created_at DESC, id DESC"
+        elif sort == "popular":
+            where, params = ("WHERE total_votes <= ? AND (total_votes < ? OR id > ?)",
+                             (after[0], after[0], after[1])) if after else ("", ())
+            order = "total_votes DESC, id"
+        else:
+            raise ValueError(f"Unknown sort: {sort}")
+        rows = self.conn.execute(
+            f"SELECT id, question, total_votes, created_at FROM polls {where} ORDER BY {order} LIMIT ?",
+            params + (limit,),
+        ).fetchall()
+        return [
+            {"id": poll_id, "question": question, "total_votes": total_votes, "created_at": created_at}
+            for poll_id, question, total_votes, created_at in rows
+        ]
+
+    async def close(self) -> None:
+        if self._pid == os.getpid():
+            with self._conns_lock:
+                for conn in self._conns:
+                    conn.close()
+        self._local = threading.local()
+        self._conns = []
+
+
+def create_poll_store(
+    kind: str,
+    initial_polls: Callable[[], Dict[str, Poll]],
+    data_file: str,
+    log_dir: str,
+    snapshot_every: int,
+    db_path: str,
+) -> PollStore:
+    if kind == "log":
+        return LogPollStore(data_file, log_dir, initial_polls, snapshot_every=snapshot_every)
+    if kind == "sqlite":
+        return SQLitePollStore(db_path, initial_polls)
+    raise ValueError(f"Unknown poll storage: {kind}")
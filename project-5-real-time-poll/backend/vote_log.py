@@ -0,0 +1,229 @@
+import asyncio
+import json
+import os
+from typing import Any, Callable, Dict, List, Optional
+
+SEGMENT_PREFIX = "votes-"
+SEGMENT_SUFFIX = ".log"
+
+
+class VoteLogError(Exception):
+    """Запись в журнал не удалась; до перезапуска он больше не принимает изменений"""
+
+
+def _segment_name(number: int) -> str:
+    return f"{SEGMENT_PREFIX}{number:08d}{SEGMENT_SUFFIX}"
+
+
+def _fsync_dir(path: str) -> None:
+    """Делает durable создание/переименование/удаление файла в `path` (где это поддерживается)"""
+    try:
+        fd = os.open(path, os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
+
+
+# --- Журнал голосов со снимками ---
+# Каждое изменение дописывается в текущий сегмент журнала одной JSON-строкой:
+#   ["p", poll]                  новый опрос (целиком)
+#   ["v", poll_id, option_key]   голос
+# Обработчик ждёт commit(): fsync, который покрывает его строки. Пока идёт
+# один fsync, новые строки копятся и уходят следующим (group commit), так что
+# голос стоит одну дописанную строку, а не перезапись всех опросов.
+# Если запись не удалась, журнал больше не принимает изменений (VoteLogError),
+# а не пробует снова: часть пачки могла уже попасть на диск, а записи после
+# потерянной дали бы журнал, который не воспроизводится в верное состояние.
+# Данные на диске согласованы до сбоя; чтобы продолжить, нужен перезапуск.
+# После `snapshot_every` записей (проверяется в commit()) журнал переходит на
+# новый сегмент, а текущее состояние в фоне пишется в снимок (временный файл +
+# os.replace, так что сбой посреди записи не портит старый снимок). Когда снимок на диске,
+# покрытые им сегменты удаляются. При старте читается снимок и короткий хвост.
+class VoteLog:
+    def __init__(
+        self,
+        snapshot_path: str,
+        log_dir: str,
+        dump_state: Callable[[], Dict[str, Any]],
+        snapshot_every: int = 100_000,
+    ) -> None:
+        self.snapshot_path = snapshot_path
+        self.log_dir = log_dir
+        self.snapshot_every = snapshot_every
+        self._dump_state = dump_state
+        self._segment = 0
+        self._segment_lines = 0
+        self._file: Optional[Any] = None
+        self._error: Optional[VoteLogError] = None
+        # Закодированные строки (bytes) вперемешку с маркерами ротации (int):
+        # номер сегмента означает «закрыть текущий сегмент и продолжить в этом»
+        self._pending: List[Any] = []
+        self._waiters: List[asyncio.Future] = []
+        self._flush_task: Optional[asyncio.Task] = None
+        self._snapshot_task: Optional[asyncio.Future] = None
+        os.makedirs(log_dir, exist_ok=True)
+
+    # --- Запуск ---
+
+    def _segments(self) -> List[int]:
+        numbers = []
+        for name in os.listdir(self.log_dir):
+            if name.startswith(SEGMENT_PREFIX) and name.endswith(SEGMENT_SUFFIX):
+                numbers.append(int(name[len(SEGMENT_PREFIX):-len(SEGMENT_SUFFIX)]))
+        return sorted(numbers)
+
+    def load(self, initial_polls: Callable[[], Dict[str, Any]]) -> Dict[str, Any]:
+        """
+        Восстанавливает опросы из снимка (или `initial_polls()`, если снимка
+        ещё нет) и хвоста журнала, затем открывает новый сегмент.
+        """
+        polls = None
+        covered = 0
+        if os.path.exists(self.snapshot_path):
+            try:
+                with open(self.snapshot_path, "r", encoding="utf-8") as f:
+                    snapshot = json.load(f)
+                polls = snapshot["polls"]
+                covered = snapshot.get("segment", 0)  # polls.json старого формата — без журнала
+            except (json.JSONDecodeError, KeyError) as e:
+                print(f"Ошибка при чтении снимка опросов: {e}")
+
+        if polls is None:
+            polls = initial_polls()
+
+        segments = self._segments()
+        for number in segments:
+            if number > covered:
+                self._replay(os.path.join(self.log_dir, _segment_name(number)), polls)
+
+        self._segment = max([covered] + segments) + 1
+        self._file = open(os.path.join(self.log_dir, _segment_name(self._segment)), "ab")
+        _fsync_dir(self.log_dir)
+        return polls
+
+    @staticmethod
+    def _replay(path: str, polls: Dict[str, Any]) -> None:
+        with open(path, "rb") as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    break  # Оборванная запись в конце сегмента: после неё ничего не подтверждалось
+                if record[0] == "p":
+                    polls[record[1]["id"]] = record[1]
+                elif record[0] == "v":
+                    option = polls.get(record[1], {}).get("options", {}).get(record[2])
+                    if option is not None:
+                        option["votes"] += 1
+
+    # --- Запись ---
+
+    def append(self, record: list) -> None:
+        """
+        Ставит запись в очередь. На диск она попадёт со следующим commit().
+        После неудачной записи бросает VoteLogError; вызывать до изменения
+        опросов, чтобы отклонённое изменение не применилось и в памяти.
+        """
+        if self._error is not None:
+            raise self._error
+        self._pending.append(json.dumps(record, ensure_ascii=False).encode() + b"\n")
+        self._segment_lines += 1
+
+    async def commit(self) -> None:
+        """
+        Ждёт, пока все добавленные до сих пор записи не будут fsync-нуты.
+        Вызывать, когда добавленные изменения уже применены к опросам.
+        """
+        if self._error is not None:
+            raise self._error
+        # Снимок запускается здесь, а не в append(): там последняя запись ещё
+        # не применена, и снимок пропустил бы её, а её сегмент всё равно удалится
+        if self._segment_lines >= self.snapshot_every and self._snapshot_task is None:
+            self._start_snapshot()
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        if self._flush_task is None:
+            self._flush_task = asyncio.create_task(self._flush_loop())
+        await waiter
+
+    async def _flush_loop(self) -> None:
+        try:
+            while self._waiters:
+                batch, self._pending = self._pending, []
+                waiters, self._waiters = self._waiters, []
+                try:
+                    await asyncio.to_thread(self._write_batch, batch)
+                except Exception as e:
+                    self._error = VoteLogError(f"Ошибка записи журнала голосов: {e}")
+                    # Записи, добавленные тем временем, уже нельзя писать после потерянных
+                    self._pending = []
+                    waiters += self._waiters
+                    self._waiters = []
+                    for waiter in waiters:
+                        if not waiter.done():
+                            waiter.set_exception(self._error)
+                    break
+                for waiter in waiters:
+                    waiter.set_result(None)
+        finally:
+            self._flush_task = None
+
+    def _write_batch(self, batch: List[Any]) -> None:
+        for item in batch:
+            if isinstance(item, int):
+                self._file.flush()
+                os.fsync(self._file.fileno())
+                self._file.close()
+                self._file = open(os.path.join(self.log_dir, _segment_name(item)), "ab")
+            else:
+                self._file.write(item)
+        self._file.flush()
+        os.fsync(self._file.fileno())
+
+    # --- Снимки ---
+
+    def _start_snapshot(self) -> None:
+        # Ротация и копия состояния делаются вместе, без await между ними,
+        # поэтому снимок содержит ровно записи сегментов <= covered (к моменту
+        # commit() все они уже применены)
+        covered = self._segment
+        self._segment += 1
+        self._segment_lines = 0
+        self._pending.append(self._segment)
+        polls = self._dump_state()
+        loop = asyncio.get_running_loop()
+        self._snapshot_task = loop.run_in_executor(None, self._write_snapshot, covered, polls)
+        self._snapshot_task.add_done_callback(self._snapshot_done)
+
+    def _snapshot_done(self, future: asyncio.Future) -> None:
+        self._snapshot_task = None
+        if future.exception() is not None:
+            print(f"Ошибка при сохранении снимка опросов: {future.exception()}")
+
+    def _write_snapshot(self, covered: int, polls: Dict[str, Any]) -> None:
+        tmp_path = self.snapshot_path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"segment": covered, "polls": polls}, f, ensure_ascii=False, separators=(",", ":"))
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.snapshot_path)
+        _fsync_dir(os.path.dirname(os.path.abspath(self.snapshot_path)))
+        # Снимок на диске — покрытые им сегменты больше не нужны
+        for number in self._segments():
+            if number <= covered:
+                os.remove(os.path.join(self.log_dir, _segment_name(number)))
+
+    async def close(self) -> None:
+        """Дописывает оставшиеся записи и дожидается идущего снимка"""
+        if self._pending and self._error is None:
+            await self.commit()
+        if self._snapshot_task is not None:
+            await self._snapshot_task
+        if self._file is not None:
+            self._file.close()
+            self._file = None
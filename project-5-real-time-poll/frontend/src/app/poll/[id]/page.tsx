@@ -35,10 +35,12 @@ export default function PollPage() {
       const response = await axios.get(`${API_URL}/poll/${pollId}`);
       setPollData(response.data);
       setLoading(false);
+      return true;
     } catch (error) {
       console.error("Failed to fetch poll data:", error);
       setError('Не удалось загрузить опрос');
       setLoading(false);
+      return false;
     }
   };
 
@@ -50,13 +52,31 @@ export default function PollPage() {
     }
   }, [pollId]);
 
-  // Основной эффект для поллинга
+  // Основной эффект: загружаем опрос и подписываемся на живые результаты (SSE).
+  // Сервер сам присылает обновления, не чаще нескольких раз в секунду.
   useEffect(() => {
-    if (pollId) {
-      fetchPollData();
-      const intervalId = setInterval(fetchPollData, 3000);
-      return () => clearInterval(intervalId);
-    }
+    if (!pollId) return;
+
+    let source: EventSource | null = null;
+    let cancelled = false;
+
+    fetchPollData().then((found) => {
+      // На несуществующий опрос не подписываемся: EventSource переподключался бы бесконечно
+      if (!found || cancelled) return;
+      source = new EventSource(`${API_URL}/poll/${pollId}/events`);
+      source.onmessage = (event) => {
+        setPollData(JSON.parse(event.data));
+      };
+      source.onerror = (error) => {
+        // EventSource переподключается сам
+        console.error("Poll updates connection lost:", error);
+      };
+    });
+
+    return () => {
+      cancelled = true;
+      source?.close();
+    };
   }, [pollId]);
 
   const handleVote = async (optionKey: string) => {
@@ -0,0 +1,117 @@
+"""
+Превью для галереи: пропускная способность DerivativeStore (пул процессов)
+против уменьшения прямо в цикле событий, задержка цикла событий в обоих
+случаях, склейка одновременных запросов и отдача из дискового кэша.
+
+    python bench_derivatives.py [--images N] [--width W] [--height H] [--workers N]
+
+Фотографии генерируются (крупные пятна + мелкий шум, JPEG q90) во временном каталоге.
+Пока идёт работа, отдельная задача каждые 10 мс проверяет, насколько
+опаздывает цикл событий, — так видно, что остальные запросы не ждут Pillow.
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+from PIL import Image
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from derivatives import DerivativeStore, parse_variant, render  # noqa: E402
+
+
+def make_photo(path: str, width: int, height: int, seed: int) -> None:
+    # Крупные пятна (видны и на превью) + мелкий шум (раздувает оригинал, как на фото)
+    coarse = [Image.effect_noise((width // 64, height // 64), 60 + seed % 20).resize((width, height), Image.BICUBIC)
+              for _ in range(3)]
+    fine = Image.effect_noise((width, height), 30)
+    photo = Image.merge("RGB", [Image.blend(band, fine, 0.3) for band in coarse])
+    photo.save(path, "JPEG", quality=90)
+
+
+async def watch_loop_lag(lags: list, stop: asyncio.Event) -> None:
+    while not stop.is_set():
+        started = time.perf_counter()
+        await asyncio.sleep(0.01)
+        lags.append((time.perf_counter() - started - 0.01) * 1000)
+
+
+async def measure(label: str, work, count: int) -> None:
+    lags: list = []
+    stop = asyncio.Event()
+    watcher = asyncio.create_task(watch_loop_lag(lags, stop))
+    started = time.perf_counter()
+    await work()
+    elapsed = time.perf_counter() - started
+    stop.set()
+    await watcher
+    lags.sort()
+    p99 = lags[int(len(lags) * 0.99) - 1] if lags else 0.0
+    print(f"{label:<28} {count / elapsed:6.1f} images/s  event loop lag p99 {p99:6.1f}ms  max {max(lags or [0]):6.1f}ms")
+
+
+async def run(source_dir: str, names: list, workers: int, tmp: str) -> None:
+    variant = "thumb.webp"
+    max_side, fmt = parse_variant(variant)
+
+    # Как было бы без пула: Pillow прямо в обработчике
+    inline_dir = os.path.join(tmp, "inline")
+    os.makedirs(inline_dir)
+
+    async def inline() -> None:
+        for name in names:
+            render(os.path.join(source_dir, name), os.path.join(inline_dir, name + ".webp"), max_side, fmt)
+            await asyncio.sleep(0)
+
+    await measure("inline, on the event loop", inline, len(names))
+
+    store = DerivativeStore(lambda name: os.path.join(source_dir, name), os.path.join(tmp, "derived"), workers=workers)
+    store.start()
+    try:
+        await measure(f"process pool ({workers} workers)",
+                      lambda: asyncio.gather(*(store.get(name, variant) for name in names)), len(names))
+
+        # 100 одновременных запросов одного ещё не готового варианта
+        before = store.rendered
+        await asyncio.gather(*(store.get(names[0], "medium.webp") for _ in range(100)))
+        print(f"100 concurrent requests for one variant: {store.rendered - before} render, "
+              f"{store.deduplicated} joined the pending one")
+
+        # Повторные запросы — из дискового кэша
+        hits = 20_000
+        started = time.perf_counter()
+        for i in range(hits):
+            await store.get(names[i % len(names)], variant)
+        elapsed = time.perf_counter() - started
+        print(f"cached variant lookup: {elapsed / hits * 1e6:.1f}µs")
+    finally:
+        await store.close()
+
+    original = statistics.mean(os.path.getsize(os.path.join(source_dir, name)) for name in names)
+    thumb = statistics.mean(os.path.getsize(store.path(name, variant)) for name in names)
+    print(f"average original {original / 2**20:.1f} MiB -> {variant} {thumb / 1024:.1f} KiB")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--images", type=int, default=40)
+    parser.add_argument("--width", type=int, default=4000)
+    parser.add_argument("--height", type=int, default=3000)
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        source_dir = os.path.join(tmp, "images")
+        os.makedirs(source_dir)
+        names = [f"photo-{i}.jpg" for i in range(args.images)]
+        for i, name in enumerate(names):
+            make_photo(os.path.join(source_dir, name), args.width, args.height, i)
+        print(f"{args.images} JPEG photos {args.width}x{args.height}, {os.cpu_count()} CPUs")
+        asyncio.run(run(source_dir, names, args.workers, tmp))
+
+
+if __name__ == "__main__":
+    main()
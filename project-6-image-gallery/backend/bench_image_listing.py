@@ -0,0 +1,100 @@
+"""
+Список галереи: прежний GET /api/images (listdir + isfile по каталогу и все
+URL одним ответом) против страницы из индекса images (image_store.py).
+
+    python bench_image_listing.py [--images N] [--limit N]
+
+Во временном каталоге создаются --images пустых файлов в одном каталоге, как
+в static/images/, и столько же строк в индексе. Для индекса меряются первая
+страница, страница из середины (по курсору) и полный проход всех страниц.
+"""
+import argparse
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+import uuid
+from collections import Counter
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from image_store import ImageStore, decode_cursor, encode_cursor  # noqa: E402
+
+
+def legacy_listing(image_dir: str) -> list:
+    # Тело прежнего обработчика
+    image_files = os.listdir(image_dir)
+    return [f"/static/images/{img}" for img in image_files if os.path.isfile(os.path.join(image_dir, img))]
+
+
+def indexed_page(store: ImageStore, limit: int, cursor: str = None) -> dict:
+    # Тело нового обработчика
+    from main import image_info
+    page = store.page(limit + 1, decode_cursor(cursor) if cursor else None)
+    next_cursor = encode_cursor(page[limit - 1]) if len(page) > limit else None
+    return {"images": [image_info(image) for image in page[:limit]], "next_cursor": next_cursor}
+
+
+def timed(fn, repeat: int) -> tuple:
+    latencies = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = fn()
+        latencies.append((time.perf_counter() - started) * 1000)
+    return statistics.median(latencies), len(json.dumps(result))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--images", type=int, default=500_000)
+    parser.add_argument("--limit", type=int, default=50)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        # main.py при импорте создаёт свои каталоги и базу в текущем каталоге
+        os.chdir(tmp)
+        image_dir = os.path.join(tmp, "images")
+        os.makedirs(image_dir)
+        store = ImageStore(os.path.join(tmp, "images.db"), os.path.join(tmp, "blobs"))
+
+        started = time.perf_counter()
+        rows = []
+        for i in range(args.images):
+            name = f"{uuid.uuid4()}.jpg"
+            open(os.path.join(image_dir, name), "wb").close()
+            rows.append((name, f"{i % (args.images // 2 or 1):064x}", "image/jpeg", 1_700_000_000 + i * 0.5, 4000, 3000))
+        conn = store.conn
+        conn.execute("BEGIN")
+        conn.executemany("INSERT INTO blobs (sha256, size, refcount) VALUES (?, 250000, ?)",
+                         Counter(row[1] for row in rows).items())
+        conn.executemany("INSERT INTO images (name, sha256, content_type, created_at, width, height) "
+                         "VALUES (?, ?, ?, ?, ?, ?)", rows)
+        conn.execute("COMMIT")
+        print(f"{args.images:,} files + index rows created in {time.perf_counter() - started:.0f}s")
+
+        middle = store.page(1, (rows[len(rows) // 2][3], rows[len(rows) // 2][0]))[0]
+        for label, fn, repeat in (
+            ("legacy: listdir + isfile, all URLs", lambda: legacy_listing(image_dir), 5),
+            (f"index: first page of {args.limit}", lambda: indexed_page(store, args.limit), 200),
+            (f"index: page of {args.limit} mid-gallery", lambda: indexed_page(store, args.limit, encode_cursor(middle)), 200),
+        ):
+            median, size = timed(fn, repeat)
+            print(f"{label:<40} {median:9.2f}ms  {size / 1024:9.1f} KiB")
+
+        started = time.perf_counter()
+        pages, seen, cursor = 0, 0, None
+        while True:
+            page = indexed_page(store, 200, cursor)
+            pages += 1
+            seen += len(page["images"])
+            cursor = page["next_cursor"]
+            if cursor is None:
+                break
+        print(f"index: walk all {seen:,} images in {pages:,} pages of 200: {time.perf_counter() - started:.1f}s "
+              f"({(time.perf_counter() - started) / pages * 1000:.2f}ms per page)")
+        store.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,178 @@
+"""
+Отдача оригиналов: прежнее монтирование StaticFiles против /static/images/<имя>
+из image_serving.py (immutable, строгий ETag, 304, Range).
+
+    python bench_image_serving.py [--connections N] [--small BYTES] [--large BYTES]
+
+Каждый вариант — отдельный процесс сервера во временном каталоге с одними и
+теми же файлами: в static/images/ для монтирования и в хранилище (image_store.py)
+для нового маршрута. Новый маршрут гоняется под uvicorn и, если установлен, под
+Granian — он поддерживает http.response.pathsend, и файл отдаёт сам сервер.
+Монтирование — приложение mount_app в этом файле.
+
+Клиент и сервер делят процессор, поэтому кроме req/s печатается процессорное
+время сервера на запрос (/proc/<pid>/stat). Замеры: полные GET маленького и большого файла, перепроверка по ETag (304),
+хвост большого файла через Range и повторный просмотр страницы галереи из
+--page изображений: сколько запросов и байт уходит, если браузер соблюдает
+Cache-Control (без него — перепроверка каждого изображения).
+"""
+import argparse
+import asyncio
+import importlib.util
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+import httpx
+from fastapi import FastAPI
+from fastapi.staticfiles import StaticFiles
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, HERE)
+from image_store import ImageStore  # noqa: E402
+
+PORT = 8796
+
+mount_app = FastAPI()
+mount_app.mount("/static", StaticFiles(directory="static", check_dir=False), name="static")
+
+
+def cpu_seconds(pid: int) -> float:
+    # utime + stime сервера и его дочерних процессов (воркеры Granian)
+    total = 0.0
+    for entry in os.listdir("/proc"):
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f"/proc/{entry}/stat") as f:
+                fields = f.read().rpartition(")")[2].split()
+        except OSError:
+            continue
+        if int(entry) == pid or int(fields[1]) == pid:
+            total += (int(fields[11]) + int(fields[12])) / os.sysconf("SC_CLK_TCK")
+    return total
+
+
+def wait_ready() -> None:
+    deadline = time.monotonic() + 30
+    while True:
+        try:
+            httpx.get(f"http://127.0.0.1:{PORT}/static/images/small-0.jpg", timeout=1)
+            return
+        except httpx.TransportError:
+            if time.monotonic() > deadline:
+                raise
+            time.sleep(0.2)
+
+
+async def hammer(client: httpx.AsyncClient, connections: int, requests: int, url: str, headers: dict) -> tuple:
+    received = 0
+    statuses = set()
+
+    async def worker(count: int) -> None:
+        nonlocal received
+        for _ in range(count):
+            response = await client.get(url, headers=headers)
+            statuses.add(response.status_code)
+            received += len(response.content)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker(requests // connections) for _ in range(connections)))
+    elapsed = time.perf_counter() - started
+    return requests // connections * connections / elapsed, received / elapsed, statuses
+
+
+async def page_views(client: httpx.AsyncClient, names: list, views: int) -> tuple:
+    # Кэш браузера: свежий ответ (max-age) не запрашивается вовсе, остальные перепроверяются
+    cache = {}
+    requests = received = 0
+    for _ in range(views):
+        for name in names:
+            entry = cache.get(name)
+            if entry is not None and entry["fresh_until"] > time.monotonic():
+                continue
+            headers = {"If-None-Match": entry["etag"]} if entry else {}
+            response = await client.get(f"/static/images/{name}", headers=headers)
+            requests += 1
+            received += len(response.content)
+            max_age = 0
+            for directive in response.headers.get("cache-control", "").split(","):
+                key, _, value = directive.strip().partition("=")
+                if key == "max-age":
+                    max_age = int(value)
+            cache[name] = {"etag": response.headers["etag"], "fresh_until": time.monotonic() + max_age}
+    return requests, received
+
+
+async def measure(label: str, args, names: list, pid: int) -> None:
+    limits = httpx.Limits(max_connections=args.connections)
+    async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{PORT}", limits=limits, timeout=60) as client:
+        etag = (await client.get("/static/images/small-0.jpg")).headers["etag"]
+        print(f"{label}:")
+        for title, url, requests, headers in (
+            (f"GET {args.small // 1000} KB", "/static/images/small-0.jpg", 2000, {}),
+            (f"GET {args.large // 1_000_000} MB", "/static/images/large.jpg", 200, {}),
+            ("revalidate (If-None-Match)", "/static/images/small-0.jpg", 4000, {"If-None-Match": etag}),
+            ("Range: last 64 KB of large", "/static/images/large.jpg", 2000, {"Range": "bytes=-65536"}),
+        ):
+            cpu = cpu_seconds(pid)
+            rate, throughput, statuses = await hammer(client, args.connections, requests, url, headers)
+            cpu = (cpu_seconds(pid) - cpu) / (requests // args.connections * args.connections)
+            print(f"  {title:<30} {rate:7.0f} req/s  {throughput / 2**20:7.1f} MiB/s  "
+                  f"server CPU {cpu * 1000:6.2f}ms/req  status {sorted(statuses)}")
+        requests, received = await page_views(client, names, args.views)
+        print(f"  {args.views} views of a {len(names)}-image page: {requests} requests, {received / 2**20:.1f} MiB")
+
+
+def run(label: str, command: list, tmp: str, args, names: list) -> None:
+    env = dict(os.environ, PYTHONPATH=HERE, GALLERY_EAGER_VARIANTS="", GALLERY_THUMBNAIL_WORKERS="1")
+    server = subprocess.Popen(command, cwd=tmp, env=env, stdout=subprocess.DEVNULL)
+    try:
+        wait_ready()
+        asyncio.run(measure(label, args, names, server.pid))
+    finally:
+        server.terminate()
+        server.wait()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--connections", type=int, default=32)
+    parser.add_argument("--small", type=int, default=200_000)
+    parser.add_argument("--large", type=int, default=5_000_000)
+    parser.add_argument("--page", type=int, default=50)
+    parser.add_argument("--views", type=int, default=10)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        # Одни и те же байты: в static/images/ для монтирования и в хранилище для
+        # нового маршрута (import_file перемещает файл, поэтому пишем дважды)
+        mount_dir = os.path.join(tmp, "mount")
+        mount_images = os.path.join(mount_dir, "static", "images")
+        os.makedirs(mount_images)
+        os.makedirs(os.path.join(tmp, "static", "images"))
+        store = ImageStore(os.path.join(tmp, "images.db"), os.path.join(tmp, "blobs"))
+        names = [f"small-{i}.jpg" for i in range(args.page)]
+        for name, size in [(name, args.small) for name in names] + [("large.jpg", args.large)]:
+            content = os.urandom(size)
+            for path in (os.path.join(mount_images, name), os.path.join(tmp, name)):
+                with open(path, "wb") as f:
+                    f.write(content)
+            store.import_file(os.path.join(tmp, name), name, "image/jpeg")
+        store.close()
+
+        uvicorn = [sys.executable, "-m", "uvicorn", "--port", str(PORT), "--log-level", "warning"]
+        run("StaticFiles mount (uvicorn)", uvicorn + ["bench_image_serving:mount_app"], mount_dir, args, names)
+        run("image route (uvicorn)", uvicorn + ["main:app"], tmp, args, names)
+        if importlib.util.find_spec("granian") is not None:
+            granian = [sys.executable, "-m", "granian", "--interface", "asgi", "--port", str(PORT),
+                       "--log-level", "warning", "main:app"]
+            run("image route (Granian, pathsend)", granian, tmp, args, names)
+        else:
+            print("granian is not installed: pathsend not measured")
+
+
+if __name__ == "__main__":
+    main()
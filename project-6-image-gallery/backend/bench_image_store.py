@@ -0,0 +1,131 @@
+"""
+Хранилище по содержимому (image_store.py): экономия места на повторных
+загрузках и время поиска изображения при 1M изображений.
+
+    python bench_image_store.py [--images N] [--uploads N] [--duplicates FRACTION]
+
+1. Экономия: --uploads загрузок по ~200 КБ через ImageStore.add, из них доля
+   --duplicates — повторные загрузки уже существующих файлов. Сравнивается
+   с прежней схемой (каждая загрузка — отдельный файл).
+2. Поиск: индекс на --images имён (20% — дубликаты) и настоящие пустые файлы
+   в ab/cd/ для каждого blob. Меряется имя -> путь -> stat, как при отдаче
+   /static/images/<имя>, против stat в одном плоском каталоге с тем же
+   числом файлов. Всё во временном каталоге.
+"""
+import argparse
+import hashlib
+import os
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import uuid
+from collections import Counter
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from image_store import ImageStore  # noqa: E402
+
+
+def du(path: str) -> int:
+    return int(subprocess.check_output(["du", "-sb", path]).split()[0])
+
+
+def bench_savings(tmp: str, uploads: int, duplicates: float) -> None:
+    store = ImageStore(os.path.join(tmp, "savings.db"), os.path.join(tmp, "savings-blobs"))
+    upload_dir = os.path.join(tmp, "savings-upload")
+    os.makedirs(upload_dir)
+    originals = []
+    flat_bytes = 0
+    started = time.perf_counter()
+    for i in range(uploads):
+        if originals and random.random() < duplicates:
+            content = random.choice(originals)
+        else:
+            content = os.urandom(random.randint(100_000, 300_000))
+            originals.append(content)
+        flat_bytes += len(content)
+        temp_path = os.path.join(upload_dir, f"{i}.part")
+        with open(temp_path, "wb") as f:
+            f.write(content)
+        store.add(f"{uuid.uuid4()}.jpg", temp_path, hashlib.sha256(content).hexdigest(), len(content), "image/jpeg")
+    elapsed = time.perf_counter() - started
+    stats = store.stats()
+    stored = du(store.blob_dir)
+    print(f"{uploads:,} uploads, {duplicates:.0%} re-uploads: {stats['blobs']:,} blobs, "
+          f"{stored / 2**20:.0f} MiB on disk vs {flat_bytes / 2**20:.0f} MiB flat "
+          f"({1 - stored / flat_bytes:.0%} saved), {uploads / elapsed:,.0f} adds/s")
+    store.close()
+
+
+def bench_lookup(tmp: str, count: int) -> None:
+    store = ImageStore(os.path.join(tmp, "lookup.db"), os.path.join(tmp, "lookup-blobs"))
+    flat_dir = os.path.join(tmp, "flat")
+    os.makedirs(flat_dir)
+
+    started = time.perf_counter()
+    blobs = []
+    names = []
+    rows = []
+    for i in range(count):
+        if blobs and random.random() < 0.2:
+            sha256 = random.choice(blobs)
+        else:
+            sha256 = hashlib.sha256(i.to_bytes(8, "little")).hexdigest()
+            blobs.append(sha256)
+        name = f"{uuid.uuid4()}.jpg"
+        names.append(name)
+        rows.append((name, sha256, "image/jpeg", float(i)))
+    conn = store.conn
+    conn.execute("BEGIN")
+    conn.executemany("INSERT INTO blobs (sha256, size, refcount) VALUES (?, 0, ?)", Counter(row[1] for row in rows).items())
+    conn.executemany("INSERT INTO images (name, sha256, content_type, created_at) VALUES (?, ?, ?, ?)", rows)
+    conn.execute("COMMIT")
+    for sha256 in blobs:
+        path = store.blob_path(sha256)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        open(path, "wb").close()
+    for name in names:
+        open(os.path.join(flat_dir, name), "wb").close()
+    print(f"{count:,} images / {len(blobs):,} blobs created in {time.perf_counter() - started:.0f}s")
+
+    sample = random.sample(names, min(count, 100_000))
+
+    def timed(fn) -> list:
+        latencies = []
+        for name in sample:
+            started = time.perf_counter()
+            fn(name)
+            latencies.append((time.perf_counter() - started) * 1e6)
+        latencies.sort()
+        return latencies
+
+    for label, fn in (
+        ("content-addressed: name -> sha -> stat", lambda name: os.stat(store.path(name))),
+        ("flat directory: stat", lambda name: os.stat(os.path.join(flat_dir, name))),
+    ):
+        latencies = timed(fn)
+        print(f"{label:<40} p50 {statistics.median(latencies):5.1f}µs  p99 {latencies[int(len(latencies) * 0.99)]:6.1f}µs")
+
+    for label, directory in (("flat directory", flat_dir), ("one shard (ab/cd/)", os.path.dirname(store.blob_path(blobs[0])))):
+        started = time.perf_counter()
+        entries = len(os.listdir(directory))
+        print(f"listdir {label}: {entries:,} entries in {(time.perf_counter() - started) * 1000:.1f}ms")
+    store.close()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--images", type=int, default=1_000_000)
+    parser.add_argument("--uploads", type=int, default=2000)
+    parser.add_argument("--duplicates", type=float, default=0.25)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        bench_savings(tmp, args.uploads, args.duplicates)
+        bench_lookup(tmp, args.images)
+
+
+if __name__ == "__main__":
+    main()
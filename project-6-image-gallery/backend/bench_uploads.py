@@ -0,0 +1,141 @@
+"""
+Память сервера при 100 одновременных загрузках по 5 МБ: старый upload_image
+(UploadFile, file.read() дважды) против потоковой загрузки из uploads.py.
+
+    python bench_uploads.py [--uploads N] [--size BYTES]
+
+Лимит потоковой загрузки поднимается до --size, чтобы было видно, что память
+на загрузку не зависит от размера файла (старый обработчик больше 5 МБ не примет).
+
+Каждый вариант запускается отдельным процессом uvicorn во временном каталоге.
+Пиковая память (VmHWM) берётся из /proc/<pid>/status сервера; от неё
+отнимается память сразу после старта. Старый обработчик — копия исходного
+кода, приложение legacy_app в этом файле. Целость проверяется по каждому
+возвращённому URL: файл ищется так же, как его отдаёт main.py, — в хранилище
+по SHA-256 (image_store.py), иначе в static/images/.
+"""
+import argparse
+import asyncio
+import hashlib
+import os
+import subprocess
+import sys
+import tempfile
+import time
+import uuid
+
+import aiofiles
+import httpx
+from fastapi import FastAPI, File, HTTPException, UploadFile
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, HERE)
+from image_store import ImageStore  # noqa: E402
+
+PORT = 8795
+
+legacy_app = FastAPI()
+
+
+@legacy_app.post("/api/upload")
+async def legacy_upload_image(file: UploadFile = File(...)):
+    if not file.content_type or not file.content_type.startswith("image/"):
+        raise HTTPException(status_code=400, detail="Uploaded file is not an image.")
+    MAX_SIZE = 5 * 1024 * 1024
+    content = await file.read()
+    if len(content) > MAX_SIZE:
+        raise HTTPException(status_code=400, detail="File size exceeds the maximum limit of 5MB.")
+    await file.seek(0)
+    os.makedirs("static/images/", exist_ok=True)
+    file_path = os.path.join("static/images/", f"{uuid.uuid4()}{os.path.splitext(file.filename)[1]}")
+    async with aiofiles.open(file_path, mode="wb") as out_file:
+        content = await file.read()
+        await out_file.write(content)
+    return {"url": f"/static/images/{os.path.basename(file_path)}"}
+
+
+def count_intact(tmp: str, responses: list, payload: bytes) -> int:
+    # Файл ищется как в image_path() из main.py: хранилище по SHA-256, затем старый каталог
+    store = None
+    if os.path.exists(os.path.join(tmp, "images.db")):
+        store = ImageStore(os.path.join(tmp, "images.db"), os.path.join(tmp, "blobs"))
+    expected = hashlib.sha256(payload).digest()
+    intact = 0
+    for response in responses:
+        if response.status_code != 200:
+            continue
+        name = os.path.basename(response.json()["url"])
+        path = (store.path(name) if store else None) or os.path.join(tmp, "static/images", name)
+        if os.path.isfile(path):
+            with open(path, "rb") as f:
+                intact += hashlib.sha256(f.read()).digest() == expected
+    if store:
+        store.close()
+    return intact
+
+
+def memory_kib(pid: int) -> dict:
+    values = {}
+    with open(f"/proc/{pid}/status") as f:
+        for line in f:
+            key, _, value = line.partition(":")
+            if key in ("VmRSS", "VmHWM"):
+                values[key] = int(value.split()[0])
+    return values
+
+
+async def upload_all(uploads: int, payload: bytes) -> tuple:
+    limits = httpx.Limits(max_connections=uploads)
+    async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{PORT}", limits=limits, timeout=300) as client:
+        async def one(i: int) -> httpx.Response:
+            return await client.post("/api/upload", files={"file": (f"photo-{i}.jpg", payload, "image/jpeg")})
+
+        started = time.perf_counter()
+        responses = await asyncio.gather(*(one(i) for i in range(uploads)))
+        return responses, time.perf_counter() - started
+
+
+def run(label: str, app: str, uploads: int, payload: bytes) -> None:
+    with tempfile.TemporaryDirectory() as tmp:
+        env = dict(os.environ, PYTHONPATH=HERE, GALLERY_MAX_UPLOAD_SIZE=str(max(len(payload), 5 * 1024 * 1024)))
+        server = subprocess.Popen(
+            [sys.executable, "-m", "uvicorn", app, "--port", str(PORT), "--log-level", "warning"],
+            cwd=tmp, env=env,
+        )
+        try:
+            deadline = time.monotonic() + 30
+            while True:
+                try:
+                    httpx.get(f"http://127.0.0.1:{PORT}/docs", timeout=1)
+                    break
+                except httpx.TransportError:
+                    if time.monotonic() > deadline:
+                        raise
+                    time.sleep(0.2)
+            baseline = memory_kib(server.pid)["VmRSS"]
+            responses, elapsed = asyncio.run(upload_all(uploads, payload))
+            peak = memory_kib(server.pid)["VmHWM"]
+        finally:
+            server.terminate()
+            server.wait()
+        ok = sum(response.status_code == 200 for response in responses)
+        intact = count_intact(tmp, responses, payload)
+    growth = (peak - baseline) / 1024
+    print(f"{label:<9} {ok}/{uploads} ok in {elapsed:.1f}s ({uploads * len(payload) / elapsed / 2**20:.0f} MiB/s), "
+          f"{intact} files intact, peak RSS +{growth:.0f} MiB ({growth * 1024 / uploads:.0f} KiB per upload)")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--uploads", type=int, default=100)
+    parser.add_argument("--size", type=int, default=5_000_000)
+    args = parser.parse_args()
+
+    payload = os.urandom(args.size)
+    print(f"{args.uploads} concurrent uploads x {args.size / 1e6:g} MB")
+    run("legacy", "bench_uploads:legacy_app", args.uploads, payload)
+    run("streaming", "main:app", args.uploads, payload)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,164 @@
+import asyncio
+import os
+from concurrent.futures import ProcessPoolExecutor
+from typing import Callable, Dict, Iterable, Optional, Tuple
+
+from PIL import Image, ImageOps, UnidentifiedImageError
+
+# Размер по длинной стороне и формат, в который перекодируется вариант
+SIZES = {"thumb": 256, "medium": 1024}
+FORMATS = {"jpg": "JPEG", "webp": "WEBP"}
+QUALITY = {"JPEG": 82, "WEBP": 80}
+
+
+class DerivativeError(Exception):
+    """Оригинал не удалось прочитать как изображение"""
+
+
+def parse_variant(variant: str) -> Tuple[int, str]:
+    """"thumb.webp" -> (256, "webp"); ValueError для неизвестного варианта"""
+    size, _, fmt = variant.partition(".")
+    if size not in SIZES or fmt not in FORMATS:
+        raise ValueError(f"Unknown variant: {variant}")
+    return SIZES[size], fmt
+
+
+def render(source: str, dest: str, max_side: int, fmt: str) -> int:
+    """
+    Уменьшает `source` до `max_side` по длинной стороне и сохраняет в `dest`.
+    Выполняется в процессе пула, поэтому всё нужное приходит аргументами.
+    """
+    temp_path = f"{dest}.{os.getpid()}.tmp"
+    try:
+        with Image.open(source) as img:
+            # JPEG декодируется сразу в уменьшенном масштабе (1/2, 1/4, 1/8) — в разы быстрее
+            img.draft("RGB", (max_side, max_side))
+            img = ImageOps.exif_transpose(img)
+            img.thumbnail((max_side, max_side), Image.Resampling.LANCZOS, reducing_gap=3.0)
+            pil_format = FORMATS[fmt]
+            if pil_format == "JPEG" and img.mode != "RGB":
+                # Прозрачность в JPEG не сохранить: кладём на белый фон
+                rgba = img.convert("RGBA")
+                img = Image.new("RGB", rgba.size, (255, 255, 255))
+                img.paste(rgba, mask=rgba.getchannel("A"))
+            elif pil_format == "WEBP" and img.mode not in ("RGB", "RGBA"):
+                img = img.convert("RGBA" if "A" in img.getbands() or "transparency" in img.info else "RGB")
+            img.save(temp_path, pil_format, quality=QUALITY[pil_format])
+    except (UnidentifiedImageError, OSError, ValueError) as e:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise DerivativeError(str(e)) from None
+    os.replace(temp_path, dest)
+    return os.path.getsize(dest)
+
+
+# --- Варианты изображений (превью, средний размер, WebP) ---
+# Уменьшение и перекодирование — чистая работа CPU, поэтому она идёт в
+# ProcessPoolExecutor, а не в цикле событий. Где лежит оригинал, говорит
+# `resolve_source(имя)`. Готовые варианты лежат на диске в
+# cache_dir/<размер>/<имя оригинала>.<формат>; имена оригиналов уникальны и не
+# меняются, так что наличие файла и есть проверка кэша. Одновременные запросы
+# одного и того же варианта ждут одну и ту же задачу в пуле.
+class DerivativeStore:
+    def __init__(
+        self,
+        resolve_source: Callable[[str], Optional[str]],
+        cache_dir: str,
+        workers: Optional[int] = None,
+        eager: Iterable[str] = (),
+    ) -> None:
+        self.resolve_source = resolve_source
+        self.cache_dir = cache_dir
+        self.workers = workers
+        self.eager = list(eager)
+        for variant in self.eager:
+            parse_variant(variant)
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._pending: Dict[Tuple[str, str], asyncio.Future] = {}
+        self.rendered = 0
+        self.cache_hits = 0
+        self.deduplicated = 0
+        for size in SIZES:
+            os.makedirs(os.path.join(cache_dir, size), exist_ok=True)
+
+    def start(self) -> None:
+        self._executor = ProcessPoolExecutor(max_workers=self.workers)
+
+    def path(self, filename: str, variant: str) -> str:
+        size, _, fmt = variant.partition(".")
+        return os.path.join(self.cache_dir, size, f"{filename}.{fmt}")
+
+    def _render(self, filename: str, variant: str, source: str) -> asyncio.Future:
+        key = (filename, variant)
+        future = self._pending.get(key)
+        if future is not None:
+            self.deduplicated += 1
+            return future
+        max_side, fmt = parse_variant(variant)
+        loop = asyncio.get_running_loop()
+        future = loop.run_in_executor(
+            self._executor, render, source, self.path(filename, variant), max_side, fmt,
+        )
+        self._pending[key] = future
+        future.add_done_callback(lambda f: self._finished(key, f))
+        return future
+
+    def _finished(self, key: Tuple[str, str], future: asyncio.Future) -> None:
+        self._pending.pop(key, None)
+        if future.cancelled():
+            return
+        error = future.exception()
+        if error is None:
+            self.rendered += 1
+        elif not isinstance(error, DerivativeError):
+            print(f"Ошибка при создании варианта {key[1]} для {key[0]}: {error}")
+
+    async def get(self, filename: str, variant: str) -> str:
+        """
+        Путь к готовому варианту; создаёт его при первом запросе.
+        ValueError — неизвестный вариант, FileNotFoundError — нет оригинала,
+        DerivativeError — оригинал не читается как изображение.
+        """
+        parse_variant(variant)
+        dest = self.path(filename, variant)
+        if os.path.exists(dest):
+            self.cache_hits += 1
+            return dest
+        source = self.resolve_source(filename)
+        if source is None or not os.path.isfile(source):
+            raise FileNotFoundError(filename)
+        # shield: если клиент ушёл, задача всё равно доделается для остальных
+        await asyncio.shield(self._render(filename, variant, source))
+        return dest
+
+    def schedule(self, filename: str) -> None:
+        """Сразу после загрузки: готовим варианты из `eager` в фоне, не дожидаясь"""
+        source = self.resolve_source(filename)
+        if source is None:
+            return
+        for variant in self.eager:
+            if not os.path.exists(self.path(filename, variant)):
+                self._render(filename, variant, source)
+
+    def remove(self, filename: str) -> None:
+        for size in SIZES:
+            for fmt in FORMATS:
+                try:
+                    os.remove(self.path(filename, f"{size}.{fmt}"))
+                except FileNotFoundError:
+                    pass
+
+    async def close(self) -> None:
+        if self._pending:
+            await asyncio.gather(*self._pending.values(), return_exceptions=True)
+        if self._executor is not None:
+            self._executor.shutdown()
+            self._executor = None
+
+    def stats(self) -> dict:
+        return {
+            "rendered": self.rendered,
+            "cache_hits": self.cache_hits,
+            "deduplicated": self.deduplicated,
+            "pending": len(self._pending),
+        }
@@ -0,0 +1,69 @@
+import os
+from email.utils import parsedate_to_datetime
+from typing import Optional
+
+from starlette.requests import Request
+from starlette.responses import FileResponse, Response
+
+# Имя изображения уникально и никогда не переиспользуется, байты под ним не
+# меняются — браузер и CDN могут держать его год и не перепроверять
+IMMUTABLE = "public, max-age=31536000, immutable"
+# Для файлов, про которые этого сказать нельзя: кэшировать, но каждый раз
+# перепроверять по ETag (ответ 304 без тела)
+REVALIDATE = "no-cache"
+
+
+class ImageResponse(FileResponse):
+    # Если сервер поддерживает расширение ASGI http.response.pathsend (Granian),
+    # FileResponse отдаёт ему путь, и файл уходит в сокет без Python. Uvicorn его
+    # не поддерживает: там каждый кусок — чтение в отдельном потоке и отдельный
+    # send, поэтому куски крупнее, чем 64 КБ по умолчанию
+    chunk_size = 1024 * 1024
+
+
+def etag_matches(if_none_match: str, etag: str) -> bool:
+    # If-None-Match сравнивается слабо: W/"x" совпадает с "x"
+    if if_none_match.strip() == "*":
+        return True
+    return any(tag.strip().removeprefix("W/") == etag for tag in if_none_match.split(","))
+
+
+def is_not_modified(request: Request, etag: str, mtime: float) -> bool:
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        # If-Modified-Since при этом не смотрим (RFC 9110, 13.2.2)
+        return etag_matches(if_none_match, etag)
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_modified_since is not None:
+        try:
+            return int(mtime) <= parsedate_to_datetime(if_modified_since).timestamp()
+        except (TypeError, ValueError):
+            return False
+    return False
+
+
+def file_response(
+    request: Request,
+    path: str,
+    media_type: Optional[str] = None,
+    etag: Optional[str] = None,
+    immutable: bool = False,
+) -> Response:
+    """
+    Отдаёт файл с валидаторами (ETag, Last-Modified), Cache-Control, ответом 304
+    на условный запрос и поддержкой Range (206, If-Range) из FileResponse.
+    `etag` — строгий ETag без кавычек (например, SHA-256 содержимого); без него
+    берётся ETag Starlette из времени изменения и размера.
+    FileNotFoundError, если файла нет.
+    """
+    # stat без перехода в поток: это одно обращение к метаданным, которые почти
+    # всегда уже в кэше ОС, а переход в поток дороже самого вызова
+    stat_result = os.stat(path)
+    headers = {"cache-control": IMMUTABLE if immutable else REVALIDATE}
+    if etag is not None:
+        headers["etag"] = f'"{etag}"'
+    response = ImageResponse(path, media_type=media_type, headers=headers, stat_result=stat_result)
+    if is_not_modified(request, response.headers["etag"], stat_result.st_mtime):
+        validators = {key: response.headers[key] for key in ("etag", "last-modified", "cache-control")}
+        return Response(status_code=304, headers=validators)
+    return response
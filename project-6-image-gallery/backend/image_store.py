@@ -0,0 +1,311 @@
+import argparse
+import base64
+import hashlib
+import json
+import mimetypes
+import os
+import sqlite3
+import time
+from collections import Counter
+from typing import List, NamedTuple, Optional, Tuple
+
+from PIL import Image
+
+
+class StoredImage(NamedTuple):
+    name: str
+    sha256: str
+    content_type: str
+    size: int
+    width: Optional[int]
+    height: Optional[int]
+    created_at: float
+
+
+def image_size(path: str) -> Tuple[Optional[int], Optional[int]]:
+    """Ширина и высота из заголовка файла (пиксели Pillow не декодирует); None, если не читается"""
+    try:
+        with Image.open(path) as img:
+            return img.size
+    except (OSError, ValueError):
+        return None, None
+
+
+# --- Хранилище изображений по содержимому ---
+# Байты лежат один раз на каждый SHA-256: blob_dir/ab/cd/abcd…, то есть
+# 65 536 подкаталогов вместо одного каталога на миллионы файлов. Публичное
+# имя (uuid + расширение, как и раньше) — это строка в images.db, которая
+# ссылается на blob; у blob есть счётчик ссылок, и файл удаляется, только
+# когда на него не ссылается ни одно имя. Все изменения идут в транзакции
+# BEGIN IMMEDIATE, поэтому несколько воркеров не разойдутся в счётчиках.
+# В той же базе — метаданные для списка галереи (размер, тип, ширина и
+# высота, время загрузки), так что список не трогает файловую систему.
+class ImageStore:
+    def __init__(self, db_path: str, blob_dir: str) -> None:
+        self.db_path = db_path
+        self.blob_dir = blob_dir
+        self._conn: Optional[sqlite3.Connection] = None
+        self._pid = 0
+        os.makedirs(blob_dir, exist_ok=True)
+
+    @property
+    def conn(self) -> sqlite3.Connection:
+        # Соединение нельзя переносить через fork(), поэтому открываем своё в каждом воркере
+        if self._conn is None or self._pid != os.getpid():
+            self._conn = self._connect()
+            self._pid = os.getpid()
+        return self._conn
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.db_path, isolation_level=None, check_same_thread=False, timeout=10)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS blobs ("
+            " sha256 TEXT PRIMARY KEY,"
+            " size INTEGER NOT NULL,"
+            " refcount INTEGER NOT NULL"
+            ") WITHOUT ROWID"
+        )
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS images ("
+            " name TEXT PRIMARY KEY,"
+            " sha256 TEXT NOT NULL REFERENCES blobs (sha256),"
+            " content_type TEXT NOT NULL,"
+            " width INTEGER,"
+            " height INTEGER,"
+            " created_at REAL NOT NULL"
+            ")"
+        )
+        columns = {row[1] for row in conn.execute("PRAGMA table_info(images)")}
+        if "width" not in columns:
+            # База, созданная до появления размеров: колонки добавляются пустыми,
+            # заполняет их `python image_store.py reconcile`
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                if "width" not in {row[1] for row in conn.execute("PRAGMA table_info(images)")}:
+                    conn.execute("ALTER TABLE images ADD COLUMN width INTEGER")
+                    conn.execute("ALTER TABLE images ADD COLUMN height INTEGER")
+                conn.execute("COMMIT")
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+        conn.execute("CREATE INDEX IF NOT EXISTS images_created_at ON images (created_at, name)")
+        return conn
+
+    def blob_path(self, sha256: str) -> str:
+        return os.path.join(self.blob_dir, sha256[:2], sha256[2:4], sha256)
+
+    def add(
+        self,
+        name: str,
+        temp_path: str,
+        sha256: str,
+        size: int,
+        content_type: str,
+        dimensions: Tuple[Optional[int], Optional[int]] = (None, None),
+    ) -> bool:
+        """
+        Сохраняет файл `temp_path` под публичным именем `name`. Если такие байты
+        уже есть, временный файл удаляется и растёт только счётчик ссылок.
+        Возвращает True, если содержимое оказалось дубликатом.
+        """
+        conn = self.conn
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = conn.execute("SELECT refcount FROM blobs WHERE sha256 = ?", (sha256,)).fetchone()
+            if row is None:
+                path = self.blob_path(sha256)
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                # Внутри транзакции: параллельный delete того же blob ждёт блокировку
+                os.replace(temp_path, path)
+                conn.execute("INSERT INTO blobs (sha256, size, refcount) VALUES (?, ?, 1)", (sha256, size))
+            else:
+                conn.execute("UPDATE blobs SET refcount = refcount + 1 WHERE sha256 = ?", (sha256,))
+            conn.execute(
+                "INSERT INTO images (name, sha256, content_type, width, height, created_at)"
+                " VALUES (?, ?, ?, ?, ?, ?)",
+                (name, sha256, content_type, *dimensions, time.time()),
+            )
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        if row is not None:
+            os.remove(temp_path)
+        return row is not None
+
+    _SELECT = (
+        "SELECT i.name, i.sha256, i.content_type, b.size, i.width, i.height, i.created_at"
+        " FROM images i JOIN blobs b ON b.sha256 = i.sha256"
+    )
+
+    def get(self, name: str) -> Optional[StoredImage]:
+        row = self.conn.execute(self._SELECT + " WHERE i.name = ?", (name,)).fetchone()
+        return StoredImage(*row) if row else None
+
+    def path(self, name: str) -> Optional[str]:
+        """Путь к байтам изображения по публичному имени"""
+        row = self.conn.execute("SELECT sha256 FROM images WHERE name = ?", (name,)).fetchone()
+        return self.blob_path(row[0]) if row else None
+
+    def page(self, limit: int, after: Optional[Tuple[float, str]] = None) -> List[StoredImage]:
+        """
+        Новые сверху. `after` — (created_at, name) последнего изображения
+        предыдущей страницы: SQLite идёт по индексу от него и читает limit строк.
+        """
+        where, params = (" WHERE (i.created_at, i.name) < (?, ?)", tuple(after)) if after else ("", ())
+        rows = self.conn.execute(
+            self._SELECT + where + " ORDER BY i.created_at DESC, i.name DESC LIMIT ?", params + (limit,)
+        ).fetchall()
+        return [StoredImage(*row) for row in rows]
+
+    def delete(self, name: str) -> bool:
+        """Удаляет имя; сам файл — только если это была последняя ссылка на него"""
+        conn = self.conn
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = conn.execute("DELETE FROM images WHERE name = ? RETURNING sha256", (name,)).fetchone()
+            if row is not None:
+                (refcount,) = conn.execute(
+                    "UPDATE blobs SET refcount = refcount - 1 WHERE sha256 = ? RETURNING refcount", row
+                ).fetchone()
+                if refcount == 0:
+                    conn.execute("DELETE FROM blobs WHERE sha256 = ?", row)
+                    try:
+                        os.remove(self.blob_path(row[0]))
+                    except FileNotFoundError:
+                        pass
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        return row is not None
+
+    def import_file(self, path: str, name: str, content_type: str) -> bool:
+        """Переносит уже лежащий на диске файл в хранилище (файл перемещается)"""
+        return self.add(name, path, file_sha256(path), os.path.getsize(path), content_type, image_size(path))
+
+    def stats(self) -> dict:
+        images, logical = self.conn.execute(
+            "SELECT COUNT(*), COALESCE(SUM(b.size), 0) FROM images i JOIN blobs b ON b.sha256 = i.sha256"
+        ).fetchone()
+        blobs, stored = self.conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM blobs").fetchone()
+        return {"images": images, "blobs": blobs, "logical_bytes": logical, "stored_bytes": stored}
+
+    def close(self) -> None:
+        if self._conn is not None and self._pid == os.getpid():
+            self._conn.close()
+        self._conn = None
+
+
+# Курсор списка — непрозрачная для клиента строка с (created_at, name) последнего
+# изображения страницы; в отличие от offset, не сбивается от новых загрузок
+def encode_cursor(image: StoredImage) -> str:
+    return base64.urlsafe_b64encode(json.dumps([image.created_at, image.name]).encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[float, str]:
+    """(created_at, name) из курсора; ValueError, если строка испорчена"""
+    try:
+        key = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+    except (ValueError, TypeError) as e:
+        raise ValueError("Invalid cursor") from e
+    if not isinstance(key, list) or len(key) != 2 or not isinstance(key[0], (int, float)) or not isinstance(key[1], str):
+        raise ValueError("Invalid cursor")
+    return float(key[0]), key[1]
+
+
+def file_sha256(path: str) -> str:
+    sha256 = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            sha256.update(chunk)
+    return sha256.hexdigest()
+
+
+def import_directory(store: ImageStore, directory: str) -> None:
+    """Переносит файлы из плоского каталога (старая схема static/images/) в хранилище"""
+    imported = duplicates = 0
+    for entry in os.scandir(directory):
+        if not entry.is_file() or entry.name.startswith("."):
+            continue
+        if store.get(entry.name) is not None:
+            continue
+        content_type = mimetypes.guess_type(entry.name)[0] or "application/octet-stream"
+        duplicates += store.import_file(entry.path, entry.name, content_type)
+        imported += 1
+    print(f"Imported {imported} files ({duplicates} duplicates): {store.stats()}")
+
+
+def reconcile(store: ImageStore, verify: bool = False) -> None:
+    """
+    Приводит индекс в соответствие с файлами в blob_dir: удаляет blob-файлы без
+    строк (остатки упавших загрузок) и строки без файлов, пересчитывает счётчики
+    ссылок, размеры и недостающие ширину/высоту. С `verify` ещё и сверяет SHA-256
+    каждого файла с его именем. Пока идёт сверка, загрузки и удаления ждут.
+    """
+    report = Counter()
+    conn = store.conn
+    # Каталог обходим под блокировкой записи: загрузка, закоммиченная между
+    # обходом и чтением индекса, выглядела бы как строка без файла
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        on_disk = {}
+        for shard, _, files in os.walk(store.blob_dir):
+            for name in files:
+                if len(name) == 64:
+                    on_disk[name] = os.path.join(shard, name)
+        known = set(sha256 for (sha256,) in conn.execute("SELECT sha256 FROM blobs"))
+        refs = Counter(sha256 for (sha256,) in conn.execute("SELECT sha256 FROM images"))
+        for sha256, path in list(on_disk.items()):
+            if sha256 not in known or (verify and file_sha256(path) != sha256):
+                os.remove(path)
+                del on_disk[sha256]
+                report["stray or corrupt files removed"] += 1
+        for sha256 in known | set(refs):
+            path = on_disk.get(sha256)
+            if path is None:
+                # Байтов нет: имена, которые на них ссылаются, отдать уже нечего
+                conn.execute("DELETE FROM images WHERE sha256 = ?", (sha256,))
+                conn.execute("DELETE FROM blobs WHERE sha256 = ?", (sha256,))
+                report["images without bytes removed"] += refs[sha256]
+            elif refs[sha256] == 0:
+                conn.execute("DELETE FROM blobs WHERE sha256 = ?", (sha256,))
+                os.remove(path)
+                report["unreferenced blobs removed"] += 1
+            else:
+                size = os.path.getsize(path)
+                cursor = conn.execute(
+                    "UPDATE blobs SET refcount = ?, size = ? WHERE sha256 = ? AND (refcount != ? OR size != ?)",
+                    (refs[sha256], size, sha256, refs[sha256], size),
+                )
+                if cursor.rowcount:
+                    report["blob counters fixed"] += 1
+        for name, sha256 in conn.execute("SELECT name, sha256 FROM images WHERE width IS NULL").fetchall():
+            width, height = image_size(store.blob_path(sha256))
+            if width is not None:
+                conn.execute("UPDATE images SET width = ?, height = ? WHERE name = ?", (width, height, name))
+                report["dimensions filled"] += 1
+        conn.execute("COMMIT")
+    except BaseException:
+        conn.execute("ROLLBACK")
+        raise
+    print(f"Reconciled: {dict(report) or 'nothing to fix'}; {store.stats()}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Обслуживание хранилища изображений")
+    parser.add_argument("--db", default=os.getenv("GALLERY_DB_PATH", "images.db"))
+    parser.add_argument("--blobs", default=os.getenv("GALLERY_BLOB_DIR", "blobs/"))
+    commands = parser.add_subparsers(dest="command", required=True)
+    import_command = commands.add_parser("import", help="перенести файлы из плоского каталога (static/images/)")
+    import_command.add_argument("directory", nargs="?", default="static/images/")
+    reconcile_command = commands.add_parser("reconcile", help="сверить индекс с файлами и починить")
+    reconcile_command.add_argument("--verify", action="store_true", help="пересчитать SHA-256 всех файлов")
+    args = parser.parse_args()
+
+    image_store = ImageStore(args.db, args.blobs)
+    if args.command == "import":
+        import_directory(image_store, args.directory)
+    reconcile(image_store, verify=getattr(args, "verify", False))
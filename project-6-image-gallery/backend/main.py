@@ -1,82 +1,228 @@
+import asyncio
 import os
 import uuid
-import aiofiles
-from fastapi import FastAPI, UploadFile, File, HTTPException
+from contextlib import asynccontextmanager
+from datetime import datetime, timezone
+from fastapi import FastAPI, HTTPException, Query, Request
 from fastapi.staticfiles import StaticFiles
 from fastapi.middleware.cors import CORSMiddleware
-from typing import List
+from pydantic import BaseModel
+from typing import List, Optional
 
-app = FastAPI()
+from derivatives import DerivativeError, DerivativeStore
+from image_serving import file_response
+from image_store import ImageStore, StoredImage, decode_cursor, encode_cursor, image_size
+from uploads import UploadError, receive_upload
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    derivatives.start()
+    yield
+    await derivatives.close()
+    images.close()
+
+
+app = FastAPI(lifespan=lifespan)
 
 # --- CORS ---
 origins = ["http://localhost:3000"]
 app.add_middleware(CORSMiddleware, allow_origins=origins, allow_credentials=True, allow_methods=["*"], allow_headers=["*"])
 
-# --- Путь для сохранения изображений ---
+# --- Хранилище изображений ---
+# Байты хранятся по SHA-256 в BLOB_DIR (ab/cd/<sha256>), одинаковые файлы —
+# один раз; имена, счётчики ссылок и метаданные для списка — в DB_PATH
+# (image_store.py). URL остаются прежними: /static/images/<имя>.
+DB_PATH = os.getenv("GALLERY_DB_PATH", "images.db")
+BLOB_DIR = os.getenv("GALLERY_BLOB_DIR", "blobs/")
+images = ImageStore(DB_PATH, BLOB_DIR)
+
+# Старая схема: файлы прямо в static/images/. Они по-прежнему отдаются и
+# удаляются, но в списке появятся после `python image_store.py import`
 IMAGE_DIR = "static/images/"
+# Недокачанные файлы: на том же диске, что и BLOB_DIR, чтобы переименование было атомарным
+UPLOAD_TMP_DIR = "upload_tmp/"
 os.makedirs(IMAGE_DIR, exist_ok=True)
+os.makedirs(UPLOAD_TMP_DIR, exist_ok=True)
+
+
+def legacy_path(filename: str) -> Optional[str]:
+    if os.path.basename(filename) != filename or filename.startswith("."):
+        return None
+    path = os.path.join(IMAGE_DIR, filename)
+    return path if os.path.isfile(path) else None
+
+
+def image_path(filename: str) -> Optional[str]:
+    """Где лежат байты изображения с данным публичным именем"""
+    return images.path(filename) or legacy_path(filename)
+
+
+# --- Уменьшенные копии ---
+# Превью и средний размер в JPEG и WebP: /api/images/<имя>/thumb.webp.
+# Создаются в пуле процессов при первом запросе (WebP-варианты — сразу после
+# загрузки, для сетки галереи) и хранятся в DERIVED_DIR
+DERIVED_DIR = os.getenv("GALLERY_DERIVED_DIR", "derived/")
+THUMBNAIL_WORKERS = int(os.getenv("GALLERY_THUMBNAIL_WORKERS", "0")) or None  # 0 — по числу CPU
+EAGER_VARIANTS = [v for v in os.getenv("GALLERY_EAGER_VARIANTS", "thumb.webp,medium.webp").split(",") if v]
+derivatives = DerivativeStore(image_path, DERIVED_DIR, workers=THUMBNAIL_WORKERS, eager=EAGER_VARIANTS)
+
+
+# --- Отдача оригиналов ---
+# Объявлено раньше монтирования /static. Изображения из хранилища кэшируются
+# навсегда (Cache-Control: immutable) со строгим ETag = SHA-256 содержимого;
+# старые файлы из static/images/ — с перепроверкой. Range, 304 и HEAD
+# поддерживаются (image_serving.py).
+@app.api_route("/static/images/{filename}", methods=["GET", "HEAD"])
+async def serve_image(filename: str, request: Request):
+    """Оригинал изображения по публичному имени"""
+    try:
+        stored = images.get(filename)
+        if stored is not None:
+            return file_response(request, images.blob_path(stored.sha256), stored.content_type,
+                                 etag=stored.sha256, immutable=True)
+        path = legacy_path(filename)
+        if path is not None:
+            return file_response(request, path)
+    except FileNotFoundError:
+        # Удалили между поиском и отдачей
+        pass
+    raise HTTPException(status_code=404, detail="Image not found.")
+
 
 # --- Раздача статических файлов ---
 # Это позволяет получать доступ к файлам по URL, например, http://localhost:8000/static/images/filename.jpg
 app.mount("/static", StaticFiles(directory="static"), name="static")
 
 
-@app.post("/api/upload")
-async def upload_image(file: UploadFile = File(...)):
-    # Проверка типа файла
-    if not file.content_type or not file.content_type.startswith("image/"):
-        raise HTTPException(status_code=400, detail="Uploaded file is not an image.")
+# --- Загрузка ---
+# Тело запроса разбирается потоком (uploads.py): в памяти держится не больше
+# одного куска, а лишние байты сверх лимита даже не дочитываются
+MAX_UPLOAD_SIZE = int(os.getenv("GALLERY_MAX_UPLOAD_SIZE", str(5 * 1024 * 1024)))
 
-    # Проверка наличия имени файла
-    if not file.filename:
-        raise HTTPException(status_code=400, detail="Uploaded file has no filename.")
+UPLOAD_REQUEST_BODY = {
+    "required": True,
+    "content": {
+        "multipart/form-data": {
+            "schema": {
+                "type": "object",
+                "properties": {"file": {"type": "string", "format": "binary"}},
+                "required": ["file"],
+            }
+        }
+    },
+}
 
-    MAX_SIZE = 5 * 1024 * 1024
-    content = await file.read()
-    if len(content) > MAX_SIZE:
-        raise HTTPException(status_code=400, detail="File size exceeds the maximum limit of 5MB.")
-    await file.seek(0)
 
+def unique_name(filename: str) -> str:
     # Создаем уникальное имя файла, чтобы избежать перезаписи
-    file_extension: str = os.path.splitext(file.filename)[1]
-    unique_filename = f"{uuid.uuid4()}{file_extension}"
-    file_path = os.path.join(IMAGE_DIR, unique_filename)
+    file_extension: str = os.path.splitext(filename)[1]
+    return f"{uuid.uuid4()}{file_extension}"
+
 
-    # Асинхронно сохраняем файл
+@app.post("/api/upload", openapi_extra={"requestBody": UPLOAD_REQUEST_BODY})
+async def upload_image(request: Request):
     try:
-        from aiofiles.threadpool.binary import AsyncBufferedIOBase  # type: ignore
-        async with aiofiles.open(file_path, mode='wb') as out_file:  # type: ignore
-            out_file: AsyncBufferedIOBase
-            content = await file.read()
-            await out_file.write(content)
+        upload = await receive_upload(request, UPLOAD_TMP_DIR, MAX_UPLOAD_SIZE)
+    except UploadError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error saving file: {e}")
 
+    filename = unique_name(upload.filename)
+    try:
+        # Ширина и высота — из заголовка файла, один раз при загрузке
+        dimensions = await asyncio.to_thread(image_size, upload.temp_path)
+        images.add(filename, upload.temp_path, upload.sha256, upload.size, upload.content_type, dimensions)
+    except Exception as e:
+        if os.path.exists(upload.temp_path):
+            os.remove(upload.temp_path)
+        raise HTTPException(status_code=500, detail=f"Error saving file: {e}")
+    derivatives.schedule(filename)
+
     # Возвращаем URL, по которому доступен файл
-    file_url = f"/static/images/{unique_filename}"
-    return {"url": file_url}
+    file_url = f"/static/images/{filename}"
+    return {"url": file_url, "size": upload.size, "sha256": upload.sha256}
+
+
+class ImageInfo(BaseModel):
+    url: str
+    name: str
+    size: int
+    content_type: str
+    width: Optional[int] = None
+    height: Optional[int] = None
+    uploaded_at: str
+
+
+class ImagesPage(BaseModel):
+    images: List[ImageInfo]
+    next_cursor: Optional[str] = None
+
+
+def image_info(image: StoredImage) -> dict:
+    return {
+        "url": f"/static/images/{image.name}",
+        "name": image.name,
+        "size": image.size,
+        "content_type": image.content_type,
+        "width": image.width,
+        "height": image.height,
+        "uploaded_at": datetime.fromtimestamp(image.created_at, timezone.utc).isoformat(),
+    }
+
 
+@app.get("/api/images", response_model=ImagesPage)
+async def get_images(cursor: Optional[str] = None, limit: int = Query(50, ge=1, le=200)):
+    """
+    Возвращает страницу изображений (новые сверху) из индекса, без обхода каталога.
+    Следующая страница — тот же запрос с cursor=next_cursor из ответа.
+    """
+    after = None
+    if cursor:
+        try:
+            after = decode_cursor(cursor)
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Invalid cursor.")
 
-@app.get("/api/images", response_model=List[str])
-async def get_images():
-    """Возвращает список URL всех загруженных изображений."""
+    # Берём на одно изображение больше, чтобы узнать, есть ли следующая страница
+    page = images.page(limit + 1, after)
+    next_cursor = encode_cursor(page[limit - 1]) if len(page) > limit else None
+    return {"images": [image_info(image) for image in page[:limit]], "next_cursor": next_cursor}
+
+
+@app.get("/api/images/{filename}/{variant}")
+async def get_image_variant(filename: str, variant: str, request: Request):
+    """Уменьшенная копия изображения: variant = thumb|medium + .jpg|.webp, например thumb.webp"""
+    if os.path.basename(filename) != filename or filename.startswith("."):
+        raise HTTPException(status_code=404, detail="Image not found.")
     try:
-        images = os.listdir(IMAGE_DIR)
-        # Фильтруем, чтобы случайно не отдать не-файлы
-        image_urls = [f"/static/images/{img}" for img in images if os.path.isfile(os.path.join(IMAGE_DIR, img))]
-        return image_urls
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Error reading image directory: {e}")
+        path = await derivatives.get(filename, variant)
+    except ValueError:
+        raise HTTPException(status_code=404, detail="Unknown image variant.")
+    except FileNotFoundError:
+        raise HTTPException(status_code=404, detail="Image not found.")
+    except DerivativeError:
+        raise HTTPException(status_code=415, detail="File cannot be decoded as an image.")
+    # Вариант неизменного оригинала тоже не меняется
+    try:
+        return file_response(request, path, "image/webp" if variant.endswith(".webp") else "image/jpeg", immutable=True)
+    except FileNotFoundError:
+        raise HTTPException(status_code=404, detail="Image not found.")
+
 
 @app.delete("/api/images/{filename}")
 async def delete_image(filename: str):
     """Удаляет изображение по имени файла."""
-    file_path = os.path.join(IMAGE_DIR, filename)
-    if not os.path.exists(file_path):
+    file_path = legacy_path(filename)
+    if images.get(filename) is None and file_path is None:
         raise HTTPException(status_code=404, detail="Image not found.")
 
     try:
-        os.remove(file_path)
+        # Байты удаляются, только если на них больше не ссылается ни одно имя
+        if not images.delete(filename):
+            os.remove(file_path)
+        derivatives.remove(filename)
         return {"detail": "Image deleted successfully."}
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error deleting image: {e}")
\ No newline at end of file
@@ -0,0 +1,167 @@
+import hashlib
+import os
+import uuid
+from dataclasses import dataclass
+from typing import Optional
+
+import aiofiles
+import aiofiles.os
+from python_multipart.exceptions import MultipartParseError
+from python_multipart.multipart import MultipartParser, parse_options_header
+from starlette.requests import ClientDisconnect, Request
+
+CHUNK_SIZE = 256 * 1024
+# Запас на границы и заголовки multipart сверх размера самого файла
+MULTIPART_OVERHEAD = 64 * 1024
+
+
+class UploadError(Exception):
+    """Загрузка отклонена: сообщение можно отдать клиенту как есть"""
+
+
+class UploadTooLarge(UploadError):
+    pass
+
+
+@dataclass
+class ReceivedUpload:
+    temp_path: str
+    filename: str
+    content_type: str
+    size: int
+    sha256: str
+
+
+class _FilePart:
+    """Состояние разбора: заголовки текущей части и байты файла, ещё не записанные на диск"""
+
+    def __init__(self, field: str, max_size: int) -> None:
+        self.field = field
+        self.max_size = max_size
+        self.headers: dict = {}
+        self._header_field = b""
+        self._header_value = b""
+        self.in_file = False
+        self.found = False
+        self.filename = ""
+        self.content_type = ""
+        self.size = 0
+        self.sha256 = hashlib.sha256()
+        self.pending = bytearray()
+        self.error: Optional[UploadError] = None
+
+    def on_part_begin(self) -> None:
+        self.headers = {}
+        self.in_file = False
+
+    def on_header_field(self, data: bytes, start: int, end: int) -> None:
+        self._header_field += data[start:end]
+
+    def on_header_value(self, data: bytes, start: int, end: int) -> None:
+        self._header_value += data[start:end]
+
+    def on_header_end(self) -> None:
+        self.headers[self._header_field.lower()] = self._header_value
+        self._header_field = b""
+        self._header_value = b""
+
+    def on_headers_finished(self) -> None:
+        _, options = parse_options_header(self.headers.get(b"content-disposition", b""))
+        if options.get(b"name", b"").decode("latin-1") != self.field or self.found:
+            return  # Остальные поля формы пропускаем
+        self.found = self.in_file = True
+        self.filename = options.get(b"filename", b"").decode("utf-8", "replace")
+        self.content_type = self.headers.get(b"content-type", b"").decode("latin-1").strip()
+        # Тип проверяем по заголовкам части, ещё до первого байта файла
+        if not self.content_type.startswith("image/"):
+            self.error = UploadError("Uploaded file is not an image.")
+        elif not self.filename:
+            self.error = UploadError("Uploaded file has no filename.")
+
+    def on_part_data(self, data: bytes, start: int, end: int) -> None:
+        if not self.in_file or self.error is not None:
+            return
+        self.size += end - start
+        if self.size > self.max_size:
+            self.error = UploadTooLarge(f"File size exceeds the maximum limit of {self.max_size // (1024 * 1024)}MB.")
+            return
+        chunk = data[start:end]
+        self.sha256.update(chunk)
+        self.pending += chunk
+
+    def on_part_end(self) -> None:
+        self.in_file = False
+
+
+# --- Потоковая загрузка ---
+# Тело запроса не собирается в памяти целиком: multipart разбирается по мере
+# поступления, байты файла пишутся во временный файл кусками по CHUNK_SIZE,
+# а размер и SHA-256 считаются на лету. Как только файл превысил лимит, чтение
+# прекращается. Готовый временный файл затем атомарно переименовывается на
+# место (image_store.py), так что недокачанный файл никогда не виден по URL.
+async def receive_upload(
+    request: Request,
+    temp_dir: str,
+    max_size: int,
+    field: str = "file",
+    chunk_size: int = CHUNK_SIZE,
+) -> ReceivedUpload:
+    """
+    Сохраняет файл из поля `field` формы multipart/form-data во временный
+    файл в `temp_dir`; переместить или удалить его — забота вызывающего.
+    Бросает UploadError. `temp_dir` должен быть на том же диске, что и
+    итоговое место файла, иначе переименование не атомарно.
+    """
+    content_type, params = parse_options_header(request.headers.get("content-type", ""))
+    boundary = params.get(b"boundary")
+    if content_type != b"multipart/form-data" or not boundary:
+        raise UploadError("Expected multipart/form-data.")
+    content_length = request.headers.get("content-length")
+    if content_length and content_length.isdigit() and int(content_length) > max_size + MULTIPART_OVERHEAD:
+        # Заведомо больше лимита — отказываем, не читая тело
+        raise UploadTooLarge(f"File size exceeds the maximum limit of {max_size // (1024 * 1024)}MB.")
+
+    part = _FilePart(field, max_size)
+    parser = MultipartParser(boundary, callbacks={
+        "on_part_begin": part.on_part_begin,
+        "on_header_field": part.on_header_field,
+        "on_header_value": part.on_header_value,
+        "on_header_end": part.on_header_end,
+        "on_headers_finished": part.on_headers_finished,
+        "on_part_data": part.on_part_data,
+        "on_part_end": part.on_part_end,
+    })
+
+    temp_path = os.path.join(temp_dir, f".upload-{uuid.uuid4().hex}.part")
+    try:
+        async with aiofiles.open(temp_path, "wb") as out_file:
+            async for chunk in request.stream():
+                try:
+                    parser.write(chunk)
+                except MultipartParseError:
+                    raise UploadError("Malformed multipart body.")
+                if part.error is not None:
+                    raise part.error
+                if len(part.pending) >= chunk_size:
+                    await out_file.write(part.pending)
+                    part.pending.clear()
+            parser.finalize()
+            if part.pending:
+                await out_file.write(part.pending)
+                part.pending.clear()
+        if not part.found:
+            raise UploadError(f"No '{field}' field in the form.")
+    except BaseException as e:
+        if await aiofiles.os.path.exists(temp_path):
+            await aiofiles.os.remove(temp_path)
+        if isinstance(e, ClientDisconnect):
+            raise UploadError("Client disconnected during upload.")
+        raise
+
+    return ReceivedUpload(
+        temp_path=temp_path,
+        filename=part.filename,
+        content_type=part.content_type,
+        size=part.size,
+        sha256=part.sha256.hexdigest(),
+    )
@@ -7,16 +7,35 @@ import Image from 'next/image';
 
 const API_URL = 'http://localhost:8000';
 
+// Плитки галереи грузят готовое превью (WebP, до 1024px), а не оригинал
+const thumbnailUrl = (imgUrl: string) => {
+  const filename = imgUrl.split('/').pop() ?? '';
+  return `${API_URL}/api/images/${filename}/medium.webp`;
+};
+
+interface ImageInfo {
+  url: string;
+  name: string;
+  size: number;
+  content_type: string;
+  width: number | null;
+  height: number | null;
+  uploaded_at: string;
+}
+
 export default function Home() {
   const [selectedFile, setSelectedFile] = useState<File | null>(null);
-  const [images, setImages] = useState<string[]>([]);
+  const [images, setImages] = useState<ImageInfo[]>([]);
+  const [nextCursor, setNextCursor] = useState<string | null>(null);
   const [error, setError] = useState('');
   const [uploading, setUploading] = useState(false);
 
-  const fetchImages = async () => {
+  // Без курсора — первая страница заново, с курсором — дописываем следующую
+  const fetchImages = async (cursor?: string) => {
     try {
-      const response = await axios.get(`${API_URL}/api/images`);
-      setImages(response.data);
+      const response = await axios.get(`${API_URL}/api/images`, { params: cursor ? { cursor } : {} });
+      setImages((prev) => (cursor ? [...prev, ...response.data.images] : response.data.images));
+      setNextCursor(response.data.next_cursor);
     } catch (err) {
       console.error('Failed to fetch images:', err);
       setError('Не удалось загрузить галерею.');
@@ -100,22 +119,19 @@ export default function Home() {
       </form>
 
       <div className="grid grid-cols-1 sm:grid-cols-2 md:grid-cols-3 lg:grid-cols-4 gap-4">
-        {images.map((imgUrl, index) => (
-          <div key={index} className="relative aspect-square rounded-lg overflow-hidden shadow-lg">
+        {images.map((image, index) => (
+          <div key={image.name} className="relative aspect-square rounded-lg overflow-hidden shadow-lg">
             <Image
-              src={
-                imgUrl.startsWith('http://') || imgUrl.startsWith('https://')
-                  ? imgUrl
-                  : `${API_URL}${imgUrl.startsWith('/') ? '' : '/'}${imgUrl}`
-              }
+              src={thumbnailUrl(image.url)}
               alt={`Uploaded image ${index + 1}`}
               fill
+              unoptimized
               className="object-cover"
               sizes="(max-width: 768px) 100vw, (max-width: 1200px) 50vw, 33vw"
               priority={index < 4}
             />
             <button
-              onClick={() => handleDeleteImage(imgUrl)}
+              onClick={() => handleDeleteImage(image.url)}
               className="absolute top-2 right-2 bg-red-500 text-white rounded-full p-2 hover:bg-red-600 shadow-lg z-10"
               title="Удалить изображение"
             >
@@ -127,6 +143,13 @@ export default function Home() {
         ))}
       </div>
 
+      {nextCursor && (
+        <div className="text-center mt-8">
+          <button onClick={() => fetchImages(nextCursor)} className="bg-gray-200 hover:bg-gray-300 text-gray-800 font-bold py-2 px-6 rounded">
+            Показать ещё
+          </button>
+        </div>
+      )}
     </main>
   );
-}
\ No newline at end of file
+}
\ No newline at end of file